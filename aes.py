@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+# AES-128 Encryption/Decryption Implementation
+# Command-line batch interface file
+#
+#   python -m aes encrypt --mode ctr --key-hex 000102... -i in.bin -o out.bin
+#   cat in.bin | python -m aes decrypt --mode cbc --key-hex 000102... > out.bin
+#
+# If no --iv-hex is given, encrypt generates a random IV and writes it as
+# the first 16 bytes of the output; decrypt then reads it back from the
+# first 16 bytes of the input.
+
+import argparse
+import os
+import sys
+import time
+
+import aes_modes
+from aes_key import expand_key
+from aes_tables import KEY_ROUNDS
+
+class _CountingReader:
+    """Wraps a binary file object and counts the bytes read from it."""
+
+    def __init__(self, f):
+        self._f = f
+        self.count = 0
+
+    def read(self, n=-1):
+        data = self._f.read(n)
+        self.count += len(data)
+        return data
+
+def _parse_hex(text, what, length=None):
+    try:
+        value = bytes.fromhex(text.replace(" ", ""))
+    except ValueError:
+        raise ValueError(f"{what} is not valid hex")
+    if length is not None and len(value) != length:
+        raise ValueError(f"{what} must be {length} bytes ({2 * length} hex characters), got {len(value)}")
+    return value
+
+def _read_exact(f, n):
+    data = b''
+    while len(data) < n:
+        more = f.read(n - len(data))
+        if not more:
+            break
+        data += more
+    return data
+
+def _open_input(path):
+    return sys.stdin.buffer if path == "-" else open(path, "rb")
+
+def _open_output(path):
+    return sys.stdout.buffer if path == "-" else open(path, "wb")
+
+def _positive_int(text):
+    try:
+        value = int(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid integer {text!r}")
+    if value < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {value}")
+    return value
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m aes",
+                                     description="Stream AES encryption/decryption (128, 192 or 256-bit keys) for files and pipes.")
+    # add_subparsers(required=True) needs Python 3.7
+    sub = parser.add_subparsers(dest="command")
+    sub.required = True
+    for command in ("encrypt", "decrypt"):
+        p = sub.add_parser(command, help=f"{command} a file or stdin")
+        p.add_argument("--mode", type=str.upper, choices=aes_modes.MODES, default="CBC",
+                       help="mode of operation (default: CBC)")
+        key = p.add_mutually_exclusive_group(required=True)
+        key.add_argument("--key-hex", help="16, 24 or 32-byte key as 32, 48 or 64 hex characters")
+        key.add_argument("--key-file", help="file holding the raw 16, 24 or 32-byte key")
+        p.add_argument("--iv-hex", help="16-byte IV/initial counter; default: random IV stored in the output")
+        p.add_argument("-i", "--input", default="-", help="input file (default: stdin)")
+        p.add_argument("-o", "--output", default="-", help="output file (default: stdout)")
+        p.add_argument("--no-padding", action="store_true", help="disable PKCS#7 padding for ECB/CBC")
+        p.add_argument("--chunk-size", type=int, default=aes_modes.DEFAULT_CHUNK_SIZE,
+                       help="bytes read per chunk (default: 1 MiB)")
+        p.add_argument("--workers", type=_positive_int, default=1,
+                       help="worker processes for parallel modes (ECB/CTR, and CBC decryption)")
+        p.add_argument("--stats", action="store_true", help="report throughput on stderr at the end")
+        p.add_argument("--profile", action="store_true",
+                       help="report per-stage timings on stderr at the end (Prometheus text format)")
+    return parser
+
+def _load_key(args):
+    if args.key_hex is not None:
+        key = _parse_hex(args.key_hex, "Key")
+        if len(key) not in KEY_ROUNDS:
+            raise ValueError(f"Key must be 16, 24 or 32 bytes (32, 48 or 64 hex characters), got {len(key)}")
+        return key
+    with open(args.key_file, "rb") as f:
+        key = f.read()
+    if len(key) not in KEY_ROUNDS:
+        raise ValueError(f"Key file must hold exactly 16, 24 or 32 bytes, got {len(key)}")
+    return key
+
+def run(args, stdin=None, stdout=None):
+    """Execute a parsed command. Returns (bytes read, bytes written)."""
+    aes_key = expand_key(_load_key(args))
+    encrypting = args.command == "encrypt"
+    mode = args.mode
+    if args.chunk_size <= 0 or args.chunk_size % 16 != 0:
+        raise ValueError("--chunk-size must be a positive multiple of 16")
+
+    src = stdin if stdin is not None else _open_input(args.input)
+    dst = stdout if stdout is not None else _open_output(args.output)
+    try:
+        reader = _CountingReader(src)
+        written = 0
+        iv = None
+        if mode != "ECB":
+            if args.iv_hex is not None:
+                iv = _parse_hex(args.iv_hex, "IV", 16)
+            elif encrypting:
+                iv = os.urandom(16)
+                dst.write(iv)
+                written += 16
+            else:
+                iv = _read_exact(reader, 16)
+                if len(iv) != 16:
+                    raise ValueError("Input too short to hold the 16-byte IV")
+
+        # aes_parallel (and multiprocessing) is only imported with --workers
+        parallel_modes = ()
+        if args.workers > 1:
+            import aes_parallel
+            parallel_modes = aes_parallel.PARALLEL_MODES if encrypting else aes_parallel.PARALLEL_DECRYPT_MODES
+        # The parallel ECB/CBC streams always pad; padding never applies to CTR
+        if mode in parallel_modes and (mode == "CTR" or not args.no_padding):
+            stream = aes_parallel.encrypt_stream if encrypting else aes_parallel.decrypt_stream
+            written += stream(reader, dst, aes_key, mode, iv, args.workers, args.chunk_size)
+        else:
+            stream = aes_modes.encrypt_stream if encrypting else aes_modes.decrypt_stream
+            padding = False if args.no_padding else None
+            written += stream(reader, dst, aes_key, mode, iv, padding, args.chunk_size)
+        dst.flush()
+        return reader.count, written
+    finally:
+        if src is not sys.stdin.buffer and src is not stdin:
+            src.close()
+        if dst is not sys.stdout.buffer and dst is not stdout:
+            dst.close()
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    profiler = None
+    if args.profile:
+        import aes_profiling
+        profiler = aes_profiling.enable(aes_profiling.Profiler())
+    start = time.perf_counter()
+    try:
+        bytes_in, bytes_out = run(args)
+    except (OSError, ValueError) as e:
+        print(f"aes: error: {e}", file=sys.stderr)
+        return 1
+    finally:
+        if profiler is not None:
+            aes_profiling.disable()
+    if profiler is not None:
+        sys.stderr.write(profiler.to_prometheus())
+    if args.stats:
+        elapsed = time.perf_counter() - start
+        rate = bytes_in / elapsed / 1e6 if elapsed > 0 else 0.0
+        print(f"aes: {args.command} {args.mode}: {bytes_in} bytes in, {bytes_out} bytes out, "
+              f"{elapsed:.3f} s, {rate:.2f} MB/s", file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
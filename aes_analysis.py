@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+# AES-128 Encryption/Decryption Implementation
+# Avalanche and diffusion analysis file
+#
+#   report = aes_analysis.avalanche(1 << 20)                 # plaintext bit flips
+#   report = aes_analysis.avalanche(1 << 20, "key", 32)      # AES-256 key bit flips
+#   print(report.format())
+#   aes_visualization.plot_avalanche(report, "avalanche.png")
+#
+# Every sample is a random (plaintext, key) pair. The pair is encrypted
+# once as is and once with each single input bit flipped, all in the same
+# vectorized pass of the batch engine, and the state differences after
+# every round are reduced into counters right away, so memory stays flat
+# however many samples are run.
+#
+# Bits are numbered as np.unpackbits numbers them: bit i is the bit with
+# value 0x80 >> (i % 8) of byte i // 8.
+
+import functools
+import math
+import operator
+import os
+
+import numpy as np
+
+import aes_batch
+from aes_tables import KEY_ROUNDS
+
+TARGETS = ("plaintext", "key")
+DEFAULT_SAMPLES = 1 << 14
+# Samples per vectorized pass. Each one becomes 1 + 128 (or 8 * key size)
+# blocks, so 32 samples keep the round temporaries small enough for the cache
+DEFAULT_CHUNK_SAMPLES = 32
+# Samples per job, the unit of work handed to a worker process
+JOB_SAMPLES = 1 << 14
+# Deviations from 1/2 are tested at this many standard errors: over the
+# 16K-32K cells of a round the largest is typically 4-4.7 by chance alone
+DEFAULT_Z = 5.0
+
+def flip_masks(nbytes):
+    """(8 * nbytes, nbytes) uint8 array whose row i has only bit i set."""
+    return np.packbits(np.eye(8 * nbytes, dtype=np.uint8), axis=1)
+
+def _binomial(n, p):
+    return np.array([math.comb(n, k) * p ** k * (1 - p) ** (n - k) for k in range(n + 1)])
+
+class AvalancheReport:
+    """
+    Counters of an avalanche run, indexed by round r = 0 (after the initial
+    AddRoundKey) .. Nr (the ciphertext):
+
+    flip_counts[r, i, j]      samples where flipping input bit i flipped bit j of the state
+    distance_counts[r, d]     (sample, input bit) pairs whose states differ in d bits
+    byte_counts[r, b]         pairs whose states differ in b of the 16 bytes
+    byte_value_counts[r, v]   difference bytes (state XOR flipped state) equal to v
+
+    Reports of the same target and key size can be merged with +.
+    """
+
+    def __init__(self, target, key_size, samples=0):
+        self.target = target
+        self.key_size = key_size
+        self.rounds = KEY_ROUNDS[key_size]
+        self.samples = samples
+        self.input_bits = 128 if target == "plaintext" else 8 * key_size
+        shape = (self.rounds + 1,)
+        self.flip_counts = np.zeros(shape + (self.input_bits, 128), dtype=np.int64)
+        self.distance_counts = np.zeros(shape + (129,), dtype=np.int64)
+        self.byte_counts = np.zeros(shape + (17,), dtype=np.int64)
+        self.byte_value_counts = np.zeros(shape + (256,), dtype=np.int64)
+
+    def add(self, r, diff):
+        """
+        Count the state differences of round r: diff is the (n, input bits,
+        16) XOR of each sample's state with its flipped states.
+        """
+        bits = np.unpackbits(diff, axis=-1)
+        # Narrow accumulators are several times faster to reduce into
+        self.flip_counts[r] += bits.sum(axis=0, dtype=np.uint16 if len(diff) < 1 << 16 else np.int64)
+        self.distance_counts[r] += np.bincount(bits.sum(axis=-1, dtype=np.uint8).ravel(), minlength=129)
+        self.byte_counts[r] += np.bincount((diff != 0).sum(axis=-1, dtype=np.uint8).ravel(), minlength=17)
+        self.byte_value_counts[r] += np.bincount(diff.ravel(), minlength=256)
+
+    def __add__(self, other):
+        if (other.target, other.key_size) != (self.target, self.key_size):
+            raise ValueError("Can only merge reports of the same target and key size")
+        merged = AvalancheReport(self.target, self.key_size, self.samples + other.samples)
+        for name in ("flip_counts", "distance_counts", "byte_counts", "byte_value_counts"):
+            setattr(merged, name, getattr(self, name) + getattr(other, name))
+        return merged
+
+    def _round(self, r):
+        return self.rounds if r is None else r
+
+    def probabilities(self, r=None):
+        """(input bits, 128) matrix of flip probabilities after round r (default: the ciphertext)."""
+        return self.flip_counts[self._round(r)] / max(self.samples, 1)
+
+    def mean_distance(self):
+        """Mean number of state bits flipped by one input bit flip, per round."""
+        return self.distance_counts @ np.arange(129) / np.maximum(self.distance_counts.sum(axis=1), 1)
+
+    def mean_changed_bytes(self):
+        """Mean number of state bytes changed by one input bit flip, per round."""
+        return self.byte_counts @ np.arange(17) / np.maximum(self.byte_counts.sum(axis=1), 1)
+
+    def sac_deviation(self, r=None):
+        """Largest |P(output bit flips) - 1/2| over all (input bit, output bit) pairs."""
+        return float(np.abs(self.probabilities(r) - 0.5).max())
+
+    def sac_bound(self, z=DEFAULT_Z):
+        """Deviation from 1/2 allowed by satisfies_sac(): z standard errors at this sample count."""
+        return z * 0.5 / math.sqrt(max(self.samples, 1))
+
+    def satisfies_sac(self, r=None, z=DEFAULT_Z):
+        """Strict avalanche criterion: every output bit flips with probability 1/2 (within sac_bound)."""
+        return self.sac_deviation(r) <= self.sac_bound(z)
+
+    def full_diffusion_round(self):
+        """First round after which every output bit depends on every input bit, or None."""
+        for r in range(self.rounds + 1):
+            if self.flip_counts[r].all():
+                return r
+        return None
+
+    def byte_chi_square(self, r=None):
+        """
+        Chi-square statistic of the nonzero difference bytes of round r
+        against the uniform distribution over 1..255 (254 degrees of
+        freedom, so about 254 for a random permutation).
+        """
+        observed = self.byte_value_counts[self._round(r), 1:]
+        expected = observed.sum() / 255
+        return float(((observed - expected) ** 2).sum() / expected) if expected else 0.0
+
+    def as_dict(self):
+        """Summary of the report as a JSON-serializable dict."""
+        return {
+            "target": self.target,
+            "key_size": self.key_size,
+            "samples": self.samples,
+            "full_diffusion_round": self.full_diffusion_round(),
+            "sac_bound": self.sac_bound(),
+            "rounds": [
+                {"round": r,
+                 "mean_distance": float(distance),
+                 "mean_changed_bytes": float(changed),
+                 "sac_deviation": self.sac_deviation(r),
+                 "satisfies_sac": self.satisfies_sac(r),
+                 "byte_chi_square": self.byte_chi_square(r)}
+                for r, (distance, changed) in enumerate(zip(self.mean_distance(), self.mean_changed_bytes()))
+            ],
+        }
+
+    def format(self):
+        """Human-readable table of the per-round figures."""
+        data = self.as_dict()
+        lines = [f"Avalanche of {self.target} bit flips, AES-{8 * self.key_size}, {self.samples:,} samples",
+                 f"{'round':>5}  {'bits flipped':>12}  {'bytes changed':>13}  {'max |p-1/2|':>11}  "
+                 f"{'SAC':>4}  {'byte chi2':>10}"]
+        for row in data["rounds"]:
+            lines.append(f"{row['round']:>5}  {row['mean_distance']:>12.3f}  {row['mean_changed_bytes']:>13.3f}  "
+                         f"{row['sac_deviation']:>11.5f}  {'yes' if row['satisfies_sac'] else 'no':>4}  "
+                         f"{row['byte_chi_square']:>10.1f}")
+        lines.append(f"Expected for a random permutation: 64 bits, {16 * 255 / 256:.3f} bytes, "
+                     f"|p-1/2| <= {data['sac_bound']:.5f}, chi2 about 254")
+        lines.append(f"Full diffusion after round {data['full_diffusion_round']}")
+        return "\n".join(lines)
+
+def expected_distance(bits=128):
+    """Hamming distance distribution of two random states: Binomial(bits, 1/2)."""
+    return _binomial(bits, 0.5)
+
+def expected_changed_bytes():
+    """Changed-byte count distribution of two random states: Binomial(16, 255/256)."""
+    return _binomial(16, 255 / 256)
+
+def _avalanche_job(samples, target, key_size, seed, chunk_samples):
+    # One job's samples from its own seed; top-level so it can run in a worker process
+    rng = np.random.default_rng(seed)
+    report = AvalancheReport(target, key_size, samples)
+    masks = flip_masks(16 if target == "plaintext" else key_size)
+    nr = report.rounds
+
+    for start in range(0, samples, chunk_samples):
+        n = min(chunk_samples, samples - start)
+        plaintexts = rng.integers(0, 256, (n, 16), dtype=np.uint8)
+        keys = rng.integers(0, 256, (n, key_size), dtype=np.uint8)
+        # (Nr+1, n, 16): one schedule per sample
+        round_keys = aes_batch.expand_keys(keys).transpose(1, 0, 2)
+        if target == "plaintext":
+            # (n, 128, 16) flipped plaintexts, each sample's key broadcast over them
+            flipped = aes_batch.encrypt_rounds(plaintexts[:, None] ^ masks, round_keys[:, :, None])
+        else:
+            # One schedule per flipped key: (Nr+1, n, key bits, 16)
+            flipped_keys = aes_batch.expand_keys((keys[:, None] ^ masks).reshape(-1, key_size))
+            flipped_keys = flipped_keys.reshape(n, -1, nr + 1, 16).transpose(2, 0, 1, 3)
+            flipped = aes_batch.encrypt_rounds(plaintexts[:, None], flipped_keys)
+        for r, (state, other) in enumerate(zip(aes_batch.encrypt_rounds(plaintexts, round_keys), flipped)):
+            report.add(r, state[:, None] ^ other)
+    return report
+
+def avalanche(samples=DEFAULT_SAMPLES, target="plaintext", key_size=16, seed=None,
+              workers=None, chunk_samples=DEFAULT_CHUNK_SAMPLES):
+    """
+    Run samples random (plaintext, key) pairs through the batch engine,
+    flipping every bit of the plaintext (target="plaintext") or of the key
+    (target="key") in turn, and return an AvalancheReport of the state
+    differences after every round.
+    The samples are split into jobs of JOB_SAMPLES, each drawn from its own
+    child of seed, and the jobs run in worker processes (default: one per
+    CPU), so a given seed gives the same report with any number of workers.
+    """
+    if target not in TARGETS:
+        raise ValueError(f"target must be one of {TARGETS}, got {target!r}")
+    if key_size not in KEY_ROUNDS:
+        raise ValueError(f"AES key must be 16, 24 or 32 bytes, got {key_size}")
+    if samples <= 0 or chunk_samples <= 0:
+        raise ValueError("samples and chunk_samples must be positive")
+    sizes = [min(JOB_SAMPLES, samples - start) for start in range(0, samples, JOB_SAMPLES)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    args = (sizes, [target] * len(sizes), [key_size] * len(sizes), seeds, [chunk_samples] * len(sizes))
+    workers = min(workers or os.cpu_count() or 1, len(sizes))
+    if workers <= 1:
+        reports = map(_avalanche_job, *args)
+        return functools.reduce(operator.add, reports)
+    from concurrent.futures import ProcessPoolExecutor
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return functools.reduce(operator.add, executor.map(_avalanche_job, *args))
+
+def main(argv=None):
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="Avalanche and diffusion analysis of AES with the batch engine.")
+    parser.add_argument("--samples", type=int, default=DEFAULT_SAMPLES,
+                        help=f"random (plaintext, key) pairs (default: {DEFAULT_SAMPLES})")
+    parser.add_argument("--target", choices=TARGETS, default="plaintext", help="bits to flip (default: plaintext)")
+    parser.add_argument("--key-size", type=int, choices=sorted(KEY_ROUNDS), default=16, help="key size in bytes")
+    parser.add_argument("--seed", type=int, help="random seed for a reproducible run")
+    parser.add_argument("--workers", type=int, help="worker processes (default: one per CPU)")
+    parser.add_argument("--plot", help="save the plots to this file (png, svg, pdf)")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    report = avalanche(args.samples, args.target, args.key_size, args.seed, args.workers)
+    print(report.format())
+    print(f"{time.perf_counter() - start:.1f} s")
+    if args.plot:
+        from aes_visualization import plot_avalanche
+        print(f"Plots saved to {plot_avalanche(report, args.plot)}")
+    return 0
+
+if __name__ == "__main__":
+    import sys
+    sys.exit(main())
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+# AES-128 Encryption/Decryption Implementation
+# asyncio streaming file
+
+import asyncio
+
+from aes_modes import BLOCK_SIZE, Encryptor, Decryptor
+
+# Bytes read from the underlying StreamReader per step
+DEFAULT_CHUNK_SIZE = 1 << 16
+# Chunks smaller than this are processed on the event loop itself: handing
+# them to the executor costs more than the cipher work
+EXECUTOR_MIN_BYTES = 1 << 10
+
+async def _run(executor, fn, data):
+    """Run fn(data) on executor (the loop's default thread pool if None)."""
+    if len(data) < EXECUTOR_MIN_BYTES:
+        return fn(data)
+    return await asyncio.get_running_loop().run_in_executor(executor, fn, data)
+
+class EncryptingWriter:
+    """
+    Wraps an asyncio StreamWriter: data passed to write() is encrypted on
+    the executor and written to the underlying stream, and every write
+    waits for drain(), so a slow peer slows the producer down instead of
+    growing the buffer. If no iv is given a random one is generated and,
+    with write_iv=True, sent as the first 16 bytes of the stream (what
+    DecryptingReader expects when it gets no iv).
+    """
+
+    def __init__(self, writer, key, mode="CBC", iv=None, padding=None, write_iv=True, executor=None):
+        self.writer = writer
+        self.executor = executor
+        send_iv = write_iv and iv is None and mode.upper() != "ECB"
+        self._cipher = Encryptor(key, mode, iv, padding)
+        self.iv = self._cipher.iv
+        self._lock = asyncio.Lock()
+        self._closed = False
+        if send_iv:
+            writer.write(self.iv)
+
+    async def write(self, data):
+        """Encrypt data and write it, waiting for the transport to drain."""
+        async with self._lock:
+            if self._closed:
+                raise ValueError("writer is closed")
+            out = await _run(self.executor, self._cipher.update, data)
+            if out:
+                self.writer.write(out)
+            await self.writer.drain()
+
+    async def finish(self):
+        """
+        Write the final (padded) block and, where the transport supports
+        it, half-close the stream (write_eof) so the peer sees EOF while
+        its replies can still be read.
+        """
+        async with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            out = self._cipher.finalize()
+            if out:
+                self.writer.write(out)
+            await self.writer.drain()
+            if self.writer.can_write_eof():
+                self.writer.write_eof()
+
+    async def close(self):
+        """finish() and close the underlying stream."""
+        await self.finish()
+        self.writer.close()
+        await self.writer.wait_closed()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+class DecryptingReader:
+    """
+    Wraps an asyncio StreamReader and decrypts what it reads, chunk_size
+    bytes at a time, on the executor. Nothing is read ahead of the caller,
+    so TCP flow control pushes back on the sender. If iv is None (and the
+    mode is not ECB) the IV is read from the first 16 bytes of the stream.
+    """
+
+    def __init__(self, reader, key, mode="CBC", iv=None, padding=None,
+                 chunk_size=DEFAULT_CHUNK_SIZE, executor=None):
+        self.reader = reader
+        self.executor = executor
+        self.chunk_size = chunk_size
+        self._args = (key, mode, iv, padding)
+        self._cipher = None
+        self._buffer = bytearray()
+        self._eof = False
+        self._lock = asyncio.Lock()
+
+    @property
+    def iv(self):
+        return self._cipher.iv if self._cipher is not None else self._args[2]
+
+    async def _start(self):
+        key, mode, iv, padding = self._args
+        if iv is None and mode.upper() != "ECB":
+            try:
+                iv = await self.reader.readexactly(BLOCK_SIZE)
+            except asyncio.IncompleteReadError:
+                raise ValueError("Stream too short to hold the 16-byte IV")
+        self._cipher = Decryptor(key, mode, iv, padding)
+
+    async def _fill(self):
+        """Decrypt the next chunk into the buffer; False once at EOF."""
+        if self._eof:
+            return False
+        if self._cipher is None:
+            await self._start()
+        chunk = await self.reader.read(self.chunk_size)
+        if chunk:
+            self._buffer += await _run(self.executor, self._cipher.update, chunk)
+        else:
+            self._eof = True
+            self._buffer += self._cipher.finalize()
+        return True
+
+    async def read(self, n=-1):
+        """
+        Return up to n bytes of plaintext (everything up to EOF if n < 0),
+        or b'' at EOF. Raises ValueError on bad padding.
+        """
+        async with self._lock:
+            if n < 0:
+                while await self._fill():
+                    pass
+            else:
+                while not self._buffer and await self._fill():
+                    pass
+            if n < 0:
+                n = len(self._buffer)
+            out = bytes(self._buffer[:n])
+            del self._buffer[:n]
+            return out
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        data = await self.read(self.chunk_size)
+        if not data:
+            raise StopAsyncIteration
+        return data
+
+async def encrypt_chunks(chunks, key, mode="CBC", iv=None, padding=None, executor=None):
+    """
+    Async generator: encrypt the chunks of the async iterable chunks as
+    they arrive. Like aes_modes.encrypt_stream, CBC and CTR need an
+    explicit iv. Chunks are only pulled when the consumer asks for more.
+    """
+    if iv is None and mode.upper() != "ECB":
+        raise ValueError(f"{mode} mode requires a 16-byte IV")
+    cipher = Encryptor(key, mode, iv, padding)
+    async for chunk in chunks:
+        out = await _run(executor, cipher.update, chunk)
+        if out:
+            yield out
+    out = cipher.finalize()
+    if out:
+        yield out
+
+async def decrypt_chunks(chunks, key, mode="CBC", iv=None, padding=None, executor=None):
+    """Async generator: decrypt the chunks of the async iterable chunks."""
+    cipher = Decryptor(key, mode, iv, padding)
+    async for chunk in chunks:
+        out = await _run(executor, cipher.update, chunk)
+        if out:
+            yield out
+    out = cipher.finalize()
+    if out:
+        yield out
@@ -0,0 +1,360 @@
+#!/usr/bin/env python3
+# AES-128 Encryption/Decryption Implementation
+# NumPy batch engine file
+
+import numpy as np
+
+from aes_constants import sbox, inv_sbox, rcon
+from aes_gf import MUL2, MUL3, MUL9, MUL11, MUL13, MUL14
+from aes_key import expand_key
+from aes_tables import KEY_ROUNDS
+
+# Blocks processed per vectorized pass; bounds the size of the temporaries
+DEFAULT_CHUNK_BLOCKS = 1 << 16
+
+SBOX = np.array(sbox, dtype=np.uint8)
+INV_SBOX = np.array(inv_sbox, dtype=np.uint8)
+RCON = np.array(rcon, dtype=np.uint8)
+
+# Multiplication tables from aes_gf as uint8 arrays
+X2 = np.frombuffer(MUL2, dtype=np.uint8)
+X3 = np.frombuffer(MUL3, dtype=np.uint8)
+X9 = np.frombuffer(MUL9, dtype=np.uint8)
+X11 = np.frombuffer(MUL11, dtype=np.uint8)
+X13 = np.frombuffer(MUL13, dtype=np.uint8)
+X14 = np.frombuffer(MUL14, dtype=np.uint8)
+
+# InvSubBytes fused with the InvMixColumns coefficients (byte-wise T-tables)
+TD9 = X9[INV_SBOX]
+TD11 = X11[INV_SBOX]
+TD13 = X13[INV_SBOX]
+TD14 = X14[INV_SBOX]
+
+# Byte k of a block is row k % 4, column k // 4 of the state
+SHIFT_ROWS = np.array([(k % 4) + 4 * ((k // 4 + k % 4) % 4) for k in range(16)], dtype=np.intp)
+INV_SHIFT_ROWS = np.argsort(SHIFT_ROWS).astype(np.intp)
+# Row r of each column replaced by row r + n (mod 4) of the same column
+ROTATE_1 = np.array([4 * (k // 4) + (k + 1) % 4 for k in range(16)], dtype=np.intp)
+ROTATE_2 = ROTATE_1[ROTATE_1]
+ROTATE_3 = ROTATE_2[ROTATE_1]
+# InvShiftRows composed with each InvMixColumns row rotation, so a
+# decryption round gathers straight from the previous state
+_DEC_GATHER = [INV_SHIFT_ROWS[rot] for rot in (np.arange(16), ROTATE_1, ROTATE_2, ROTATE_3)]
+
+def round_key_array(schedule):
+    """
+    View a flat byte schedule (AESKey.ek_bytes / AESKey.dk_bytes) as an
+    (Nr+1, 16) uint8 array of round keys in block byte order.
+    """
+    return np.frombuffer(schedule, dtype=np.uint8).reshape(-1, 16)
+
+def as_blocks(data):
+    """View a bytes-like buffer as an (N, 16) uint8 array without copying."""
+    if isinstance(data, np.ndarray):
+        return data.reshape(-1, 16)
+    if len(data) % 16 != 0:
+        raise ValueError(f"Data length must be a multiple of 16 bytes, got {len(data)}")
+    return np.frombuffer(data, dtype=np.uint8).reshape(-1, 16)
+
+def encrypt_rounds(blocks, round_keys):
+    """
+    Generator behind encrypt_state(): yields the state after the initial
+    AddRoundKey and after every round (Nr+1 arrays, the last one being the
+    ciphertext), the per-round snapshots a TraceRecorder takes of one block
+    for a whole batch. blocks is (..., 16) and round_keys (Nr+1, ..., 16);
+    the leading axes broadcast, so round keys of shape (Nr+1, N, 1, 16)
+    encrypt N groups of blocks under one key per group. Every yielded array
+    is new and never modified afterwards.
+    """
+    nr = len(round_keys) - 1
+    state = blocks ^ round_keys[0]
+    yield state
+    for r in range(1, nr):
+        # SubBytes and ShiftRows
+        state = SBOX[state[..., SHIFT_ROWS]]
+        # MixColumns
+        state = X2[state] ^ X3[state[..., ROTATE_1]] ^ state[..., ROTATE_2] ^ state[..., ROTATE_3]
+        # AddRoundKey
+        state ^= round_keys[r]
+        yield state
+    state = SBOX[state[..., SHIFT_ROWS]]
+    state ^= round_keys[nr]
+    yield state
+
+def encrypt_state(blocks, round_keys):
+    """
+    Encrypt an (N, 16) uint8 array of blocks with an (Nr+1, 16) round key
+    array. Returns a new array.
+    """
+    for state in encrypt_rounds(blocks, round_keys):
+        pass
+    return state
+
+def decrypt_state(blocks, round_keys):
+    """
+    Decrypt an (N, 16) uint8 array of blocks with the (Nr+1, 16) decryption
+    round key array built from AESKey.dk_bytes. This is the equivalent inverse
+    cipher: InvMixColumns is already folded into the round keys, so every
+    round is four fused table lookups plus the key XOR, like an encryption
+    round, instead of InvSubBytes followed by four multiplication lookups.
+    """
+    nr = len(round_keys) - 1
+    g0, g1, g2, g3 = _DEC_GATHER
+    state = blocks ^ round_keys[0]
+    for r in range(1, nr):
+        # InvSubBytes + InvShiftRows + InvMixColumns, then AddRoundKey
+        state = TD14[state[:, g0]] ^ TD11[state[:, g1]] ^ TD13[state[:, g2]] ^ TD9[state[:, g3]]
+        state ^= round_keys[r]
+    state = INV_SBOX[state[:, INV_SHIFT_ROWS]]
+    state ^= round_keys[nr]
+    return state
+
+def _process(data, round_keys, transform, chunk_blocks, out):
+    blocks = as_blocks(data)
+    if out is None:
+        if len(blocks) <= chunk_blocks:
+            return transform(blocks, round_keys).tobytes()
+        target = np.empty_like(blocks)
+    else:
+        target = as_blocks(out)
+        if target.shape != blocks.shape:
+            raise ValueError(f"out must be {len(blocks) * 16} bytes, got {target.size}")
+    for start in range(0, len(blocks), chunk_blocks):
+        stop = start + chunk_blocks
+        target[start:stop] = transform(blocks[start:stop], round_keys)
+    return target.tobytes() if out is None else out
+
+def encrypt_blocks(data, key, chunk_blocks=DEFAULT_CHUNK_BLOCKS, out=None):
+    """
+    Encrypt every 16-byte block of data independently (ECB) in one
+    vectorized pass per chunk. key may be raw bytes or an AESKey.
+    If out is a writable buffer of the same length (bytearray, memoryview,
+    mmap) the ciphertext is written into it and out is returned; otherwise
+    a new bytes object is returned.
+    """
+    round_keys = round_key_array(expand_key(key).ek_bytes)
+    return _process(data, round_keys, encrypt_state, chunk_blocks, out)
+
+def decrypt_blocks(data, key, chunk_blocks=DEFAULT_CHUNK_BLOCKS, out=None):
+    """
+    Decrypt every 16-byte block of data independently (ECB).
+    key may be raw bytes or an AESKey; out works as in encrypt_blocks().
+    """
+    round_keys = round_key_array(expand_key(key).dk_bytes)
+    return _process(data, round_keys, decrypt_state, chunk_blocks, out)
+
+def expand_keys(keys):
+    """
+    Expand a (K, 16|24|32) uint8 array of same-length AES keys at once: the
+    key schedule of aes_tables.expand_key_words with every word step
+    applied to all K keys together. Returns the (K, Nr+1, 16) encryption
+    round keys, laid out like round_key_array(AESKey.ek_bytes) for each key.
+    """
+    keys = np.ascontiguousarray(keys, dtype=np.uint8)
+    nr = KEY_ROUNDS.get(keys.shape[-1])
+    if keys.ndim != 2 or nr is None:
+        raise ValueError(f"keys must be a (K, 16|24|32) array, got shape {keys.shape}")
+    nk = keys.shape[1] // 4
+    # w[:, i] is word i of every schedule as 4 bytes, first row first
+    w = np.empty((len(keys), 4 * (nr + 1), 4), dtype=np.uint8)
+    w[:, :nk] = keys.reshape(-1, nk, 4)
+    for i in range(nk, 4 * (nr + 1)):
+        temp = w[:, i - 1]
+        if i % nk == 0:
+            # RotWord, SubWord and Rcon
+            temp = SBOX[temp[:, [1, 2, 3, 0]]]
+            temp[:, 0] ^= RCON[i // nk - 1]
+        elif nk > 6 and i % nk == 4:
+            temp = SBOX[temp]
+        w[:, i] = w[:, i - nk] ^ temp
+    return w.reshape(-1, nr + 1, 16)
+
+def decryption_keys(round_keys):
+    """
+    Equivalent inverse cipher schedules for a (K, Nr+1, 16) array from
+    expand_keys(), as aes_tables.decryption_key_words builds them: round
+    keys reversed, InvMixColumns applied to all but the first and last.
+    """
+    dk = round_keys[:, ::-1].copy()
+    middle = dk[:, 1:-1]
+    dk[:, 1:-1] = (X14[middle] ^ X11[middle[..., ROTATE_1]] ^
+                   X13[middle[..., ROTATE_2]] ^ X9[middle[..., ROTATE_3]])
+    return dk
+
+def _key_groups(keys, count):
+    """
+    Split the per-block keys by key length. Yields (distinct keys as a
+    (K, length) array, positions of the blocks using that length or None
+    for all of them, index of each of those blocks' key in the array).
+    """
+    if isinstance(keys, np.ndarray):
+        keys = np.ascontiguousarray(keys, dtype=np.uint8)
+        if keys.ndim != 2 or keys.shape[1] not in KEY_ROUNDS:
+            raise ValueError(f"keys must be an (N, 16|24|32) array, got shape {keys.shape}")
+        if len(keys) != count:
+            raise ValueError(f"Expected one key per block ({count}), got {len(keys)}")
+        unique, inverse = np.unique(keys.view(f'V{keys.shape[1]}').ravel(), return_inverse=True)
+        yield unique.view(np.uint8).reshape(len(unique), -1), None, inverse.reshape(-1)
+        return
+
+    positions = {}
+    inverse = np.fromiter((positions.setdefault(getattr(k, 'key', k), len(positions)) for k in keys),
+                          dtype=np.intp, count=len(keys))
+    if len(inverse) != count:
+        raise ValueError(f"Expected one key per block ({count}), got {len(inverse)}")
+    distinct = [bytes(k) for k in positions]
+    lengths = np.fromiter(map(len, distinct), dtype=np.intp, count=len(distinct))
+    for length in np.unique(lengths):
+        if length not in KEY_ROUNDS:
+            raise ValueError(f"AES key must be 16, 24 or 32 bytes, got {length}")
+        ids = np.flatnonzero(lengths == length)
+        unique = np.frombuffer(b''.join(distinct[i] for i in ids), dtype=np.uint8).reshape(-1, length)
+        if len(ids) == len(distinct):
+            yield unique, None, inverse
+            return
+        # Renumber this length's keys 0..len(ids)-1 and pick out its blocks
+        remap = np.empty(len(distinct), dtype=np.intp)
+        remap[ids] = np.arange(len(ids))
+        selected = np.flatnonzero(lengths[inverse] == length)
+        yield unique, selected, remap[inverse[selected]]
+
+def _process_many(keys, data, decrypt, chunk_blocks):
+    blocks = as_blocks(data)
+    out = np.empty_like(blocks)
+    transform = decrypt_state if decrypt else encrypt_state
+    for unique, selected, index in _key_groups(keys, len(blocks)):
+        round_keys = expand_keys(unique)
+        if decrypt:
+            round_keys = decryption_keys(round_keys)
+        # (Nr+1, K, 16): gathering with the block indices gives one round
+        # key row per block, which encrypt_state/decrypt_state XOR in unchanged
+        round_keys = np.ascontiguousarray(round_keys.transpose(1, 0, 2))
+        group = blocks if selected is None else blocks[selected]
+        result = out if selected is None else np.empty_like(group)
+        for start in range(0, len(group), chunk_blocks):
+            stop = start + chunk_blocks
+            result[start:stop] = transform(group[start:stop], round_keys[:, index[start:stop]])
+        if selected is not None:
+            out[selected] = result
+    return out.tobytes()
+
+def encrypt_many(keys, data, chunk_blocks=DEFAULT_CHUNK_BLOCKS):
+    """
+    Encrypt every 16-byte block of data under its own key: keys has one
+    entry per block, either a sequence of raw keys / AESKeys or an (N, 16),
+    (N, 24) or (N, 32) uint8 array. Each distinct key is expanded once (all
+    keys of a length in one vectorized pass) and the whole mixed-key batch
+    then runs through the rounds together, one pass per key length.
+    """
+    return _process_many(keys, data, False, chunk_blocks)
+
+def decrypt_many(keys, data, chunk_blocks=DEFAULT_CHUNK_BLOCKS):
+    """Decrypt every 16-byte block of data under its own key, like encrypt_many()."""
+    return _process_many(keys, data, True, chunk_blocks)
+
+def xor_into(out, a, b):
+    """
+    Write a XOR b into the writable buffer out. All three are bytes-like
+    of the same length; out may be a or b for an in-place XOR.
+    """
+    np.bitwise_xor(np.frombuffer(a, dtype=np.uint8), np.frombuffer(b, dtype=np.uint8),
+                   out=np.frombuffer(out, dtype=np.uint8))
+    return out
+
+def ghash_lanes(y, data, lanes, table):
+    """
+    Fold data (a multiple of 16*lanes bytes) into `lanes` interleaved GHASH
+    accumulators: lane l takes blocks l, l + lanes, l + 2*lanes, ... and
+    every step computes acc = acc * G ^ next blocks, where table is the
+    (16, 256, 16) byte table of G = H^lanes from aes_gcm. y, the running
+    GHASH value, is folded into the first block. Returns the accumulators
+    as lanes*16 bytes; aes_gcm finishes with a plain GHASH over them.
+    """
+    # XOR is bytewise, so 16-byte values can be handled as two uint64s
+    blocks = np.frombuffer(data, dtype=np.uint64).reshape(-1, lanes, 2)
+    tab = np.frombuffer(table, dtype=np.uint64).reshape(16, 256, 2)
+    acc = blocks[0].copy()
+    acc[0] ^= np.frombuffer(y, dtype=np.uint64)
+    for step in blocks[1:]:
+        b = acc.view(np.uint8)
+        acc = tab[0][b[:, 0]]
+        for i in range(1, 16):
+            acc ^= tab[i][b[:, i]]
+        acc ^= step
+    return acc.tobytes()
+
+def cmac_many(messages, key, k1, k2):
+    """
+    CMAC of every message in the list under one key, with the CMAC subkeys
+    k1 and k2 given as 16 bytes each. The messages are laid out as rows of
+    a zero-filled (M, max blocks, 16) array, padded and masked with the
+    subkeys in bulk; the CBC-MAC chains then advance one block per step
+    for all messages at once. Returns the M tags concatenated.
+    """
+    round_keys = round_key_array(expand_key(key).ek_bytes)
+    count = len(messages)
+    lengths = np.fromiter((len(m) for m in messages), dtype=np.intp, count=count)
+    blocks = np.maximum((lengths + 15) // 16, 1)
+    width = int(blocks.max()) * 16
+
+    # Scatter all message bytes into their rows
+    flat = np.frombuffer(b''.join(messages), dtype=np.uint8)
+    rows = np.repeat(np.arange(count), lengths)
+    starts = np.cumsum(lengths) - lengths
+    columns = np.arange(len(flat)) - np.repeat(starts, lengths)
+    data = np.zeros((count, width), dtype=np.uint8)
+    data[rows, columns] = flat
+
+    # 10* padding and K2 for partial (or empty) last blocks, K1 otherwise
+    partial = (lengths % 16 != 0) | (lengths == 0)
+    data[partial, lengths[partial]] = 0x80
+    data = data.reshape(count, -1, 16)
+    subkeys = np.where(partial[:, None], np.frombuffer(k2, dtype=np.uint8), np.frombuffer(k1, dtype=np.uint8))
+    data[np.arange(count), blocks - 1] ^= subkeys
+
+    # Longest messages first, so the chains still running are a prefix
+    order = np.argsort(-blocks, kind='stable')
+    data = data[order]
+    sorted_blocks = blocks[order]
+    state = np.zeros((count, 16), dtype=np.uint8)
+    for j in range(data.shape[1]):
+        active = int(np.count_nonzero(sorted_blocks > j))
+        state[:active] = encrypt_state(state[:active] ^ data[:active, j], round_keys)
+    tags = np.empty_like(state)
+    tags[order] = state
+    return tags.tobytes()
+
+def xts_tweaks(initial, count):
+    """
+    Tweaks for `count` consecutive blocks of every XTS sector: initial is
+    an (S, 16) array of encrypted sector numbers T_0, the result an
+    (S, count, 16) array of T_j = T_0 * alpha^j. Each doubling step runs
+    on all sectors at once, on the tweaks as little-endian (low, high)
+    uint64 pairs.
+    """
+    t = np.ascontiguousarray(initial, dtype=np.uint8).view('<u8').reshape(-1, 2)
+    low = t[:, 0].copy()
+    high = t[:, 1].copy()
+    out = np.empty((len(t), count, 2), dtype='<u8')
+    for j in range(count):
+        out[:, j, 0] = low
+        out[:, j, 1] = high
+        carry = high >> np.uint64(63)
+        high = (high << np.uint64(1)) | (low >> np.uint64(63))
+        low = (low << np.uint64(1)) ^ (carry * np.uint64(0x87))
+    return out.view(np.uint8).reshape(len(t), count, 16)
+
+def xts_blocks(data, key, tweaks, decrypt=False):
+    """
+    XTS whole blocks: E(P ^ T) ^ T for every block of data with the
+    matching row of tweaks (any shape ending in 16, one row per block).
+    For decryption key is used with the inverse cipher. Returns bytes.
+    """
+    t = tweaks.reshape(-1, 16)
+    blocks = as_blocks(data) ^ t
+    if decrypt:
+        state = decrypt_state(blocks, round_key_array(expand_key(key).dk_bytes))
+    else:
+        state = encrypt_state(blocks, round_key_array(expand_key(key).ek_bytes))
+    state ^= t
+    return state.tobytes()
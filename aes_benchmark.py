@@ -0,0 +1,395 @@
+#!/usr/bin/env python3
+# AES-128 Encryption/Decryption Implementation
+# Benchmark suite file
+
+import argparse
+import itertools
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+
+import aes_bitslice
+import aes_cmac
+import aes_core
+import aes_gcm
+import aes_keystream
+import aes_modes
+import aes_parallel
+import aes_xts
+from aes_key import AESKey, expand_key
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+try:
+    import aes_batch
+except ImportError:  # NumPy not installed
+    aes_batch = None
+
+DEFAULT_SIZES = [16, 1 << 10, 1 << 16, 1 << 20]
+DEFAULT_MIN_TIME = 0.2
+DEFAULT_THRESHOLD = 0.10
+
+BENCH_KEY = bytes.fromhex("2b7e151628aed2a6abf7158809cf4f3c")
+BENCH_KEY_256 = bytes.fromhex("603deb1015ca71be2b73aef0857d77811f352c073b6108d72d9810a30914dff4")
+BENCH_IV = bytes.fromhex("000102030405060708090a0b0c0d0e0f")
+# Entry points whose import time is benchmarked in a fresh interpreter
+IMPORT_MODULES = ("aes_core", "aes_modes", "aes", "main")
+
+_UNITS = {"": 1, "B": 1, "K": 1 << 10, "KB": 1 << 10, "KIB": 1 << 10,
+          "M": 1 << 20, "MB": 1 << 20, "MIB": 1 << 20,
+          "G": 1 << 30, "GB": 1 << 30, "GIB": 1 << 30}
+
+def parse_size(text):
+    """Parse sizes such as '16', '64K', '1MiB' or '1GiB' into bytes."""
+    text = text.strip().upper()
+    digits = text.rstrip("KMGIB")
+    unit = text[len(digits):]
+    if not digits.isdigit() or unit not in _UNITS:
+        raise ValueError(f"Invalid size {text!r}")
+    return int(digits) * _UNITS[unit]
+
+def format_size(n):
+    """Format a byte count the way parse_size() reads it."""
+    for unit, factor in (("GiB", 1 << 30), ("MiB", 1 << 20), ("KiB", 1 << 10)):
+        if n >= factor and n % factor == 0:
+            return f"{n // factor}{unit}"
+    return f"{n}B"
+
+def peak_rss_bytes():
+    """Peak resident set size of this process so far, or None if unknown."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+def _percentile(sorted_values, fraction):
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+def _traced_peak(fn):
+    """Call fn() once under tracemalloc; return the peak bytes it allocated."""
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+def measure(fn, nbytes, min_time=DEFAULT_MIN_TIME, min_calls=3):
+    """
+    Call fn() repeatedly for at least min_time seconds and min_calls calls.
+    Returns throughput and per-call latency statistics, and the peak memory
+    one call allocates on top of its inputs (traced during the warm-up call;
+    worker processes are not included).
+    """
+    # Warm-up: caches, lazily built tables, pool start-up
+    peak_alloc = _traced_peak(fn)
+    latencies = []
+    clock = time.perf_counter_ns
+    deadline = clock() + int(min_time * 1e9)
+    while len(latencies) < min_calls or clock() < deadline:
+        start = clock()
+        fn()
+        latencies.append(clock() - start)
+    total_s = sum(latencies) / 1e9
+    latencies.sort()
+    calls = len(latencies)
+    result = {
+        "calls": calls,
+        "bytes_per_call": nbytes,
+        "ops_per_s": calls / total_s,
+        "p50_ns": _percentile(latencies, 0.50),
+        "p99_ns": _percentile(latencies, 0.99),
+        "peak_alloc_bytes": peak_alloc,
+    }
+    if nbytes:
+        result["blocks_per_s"] = calls * (nbytes // 16) / total_s
+        result["mb_per_s"] = calls * nbytes / total_s / 1e6
+    return result
+
+def _ready(fn):
+    # Setup closure for a benchmark whose inputs are small and already built
+    return lambda: fn
+
+def _with_input(make, call):
+    """
+    Setup closure: build the input with make() only when the benchmark is
+    about to run, and time call(input).
+    """
+    def setup():
+        value = make()
+        return lambda: call(value)
+    return setup
+
+def primitive_benchmarks():
+    """(name, setup, bytes per call) for the round primitives and single blocks."""
+    block = bytes(range(16))
+    aes_key = AESKey(BENCH_KEY)
+    matrix = aes_core.bytes_to_matrix(block)
+    round_key = aes_key.round_key_matrices()[1]
+    state = bytearray(block)
+    xts_key = aes_xts.XTSKey(BENCH_KEY * 2)
+    sector = bytes(aes_xts.SECTOR_SIZE)
+
+    benches = [
+        ("primitive/sub_bytes", lambda: aes_core.sub_bytes([row[:] for row in matrix]), 16),
+        ("primitive/shift_rows", lambda: aes_core.shift_rows(matrix), 16),
+        ("primitive/mix_columns", lambda: aes_core.mix_columns([row[:] for row in matrix]), 16),
+        ("primitive/add_round_key", lambda: aes_core.add_round_key([row[:] for row in matrix], round_key), 16),
+        ("primitive/sub_bytes_flat", lambda: aes_core.sub_bytes_flat(state), 16),
+        ("primitive/shift_rows_flat", lambda: aes_core.shift_rows_flat(state), 16),
+        ("primitive/mix_columns_flat", lambda: aes_core.mix_columns_flat(state), 16),
+        ("primitive/add_round_key_flat", lambda: aes_core.add_round_key_flat(state, aes_key.ek_bytes, 16), 16),
+        ("key/generate_round_keys", lambda: aes_core.generate_round_keys(BENCH_KEY), 0),
+        ("key/AESKey", lambda: AESKey(BENCH_KEY), 0),
+        ("key/AESKey[192]", lambda: AESKey(BENCH_KEY_256[:24]), 0),
+        ("key/AESKey[256]", lambda: AESKey(BENCH_KEY_256), 0),
+        ("key/expand_key_cached", lambda: expand_key(BENCH_KEY), 0),
+        ("key/expand_key_cached[256]", lambda: expand_key(BENCH_KEY_256), 0),
+        ("mac/cmac[48B]", lambda: aes_cmac.cmac(block * 3, aes_key), 48),
+        ("xts/encrypt_sector[512B]", lambda: xts_key.encrypt_sector(7, sector), 512),
+    ]
+    ciphertext = aes_key.encrypt_block(block)
+    aes_key_256 = AESKey(BENCH_KEY_256)
+    for engine in aes_core.ENGINES:
+        benches.append((f"block/encrypt[{engine}]",
+                        lambda engine=engine: aes_core.encrypt(block, aes_key, engine=engine), 16))
+        benches.append((f"block/encrypt[{engine},256]",
+                        lambda engine=engine: aes_core.encrypt(block, aes_key_256, engine=engine), 16))
+        benches.append((f"block/decrypt[{engine}]",
+                        lambda engine=engine: aes_core.decrypt(ciphertext, aes_key, engine=engine), 16))
+    return [(name, _ready(fn), nbytes) for name, fn, nbytes in benches]
+
+def _random(n):
+    return lambda: os.urandom(n)
+
+def _mode_ciphertext(aes_key, mode, size):
+    """
+    A valid aes_modes ciphertext of a size-byte message, built without
+    encrypting it: random blocks, then for ECB/CBC a last block that
+    decrypts to the message tail and its PKCS#7 padding. Decrypting it
+    costs the same as decrypting a real one.
+    """
+    if mode == "CTR":
+        return os.urandom(size)
+    tail = size % 16
+    body = os.urandom(size - tail)
+    last = os.urandom(tail) + bytes([16 - tail]) * (16 - tail)
+    if mode == "CBC":
+        last = bytes(a ^ b for a, b in zip(last, body[-16:] if body else BENCH_IV))
+    return body + aes_key.encrypt_block(last)
+
+def _messages(size):
+    # Many small records: size is the total over 48-byte messages
+    def make():
+        data = os.urandom(size)
+        return [data[i:i + 48] for i in range(0, size, 48)]
+    return make
+
+def engine_benchmarks(sizes, workers, executor):
+    """
+    (name, setup, bytes per call) for the batch (single and multi-key),
+    bitslice, modes, GCM, CMAC, XTS and parallel paths. Inputs are only
+    built by setup(), so filtered-out benchmarks cost nothing.
+    """
+    aes_key = expand_key(BENCH_KEY)
+    aes_key_256 = expand_key(BENCH_KEY_256)
+    xts_key = aes_xts.XTSKey(BENCH_KEY * 2)
+    gcm_key = aes_gcm.gcm_key(aes_key)
+    for size in sizes:
+        label = format_size(size)
+        whole = size - size % 16
+
+        if aes_batch is not None and whole:
+            yield (f"batch/encrypt_blocks/{label}",
+                   _with_input(_random(whole), lambda b: aes_batch.encrypt_blocks(b, aes_key)), whole)
+            yield (f"batch/encrypt_blocks[256]/{label}",
+                   _with_input(_random(whole), lambda b: aes_batch.encrypt_blocks(b, aes_key_256)), whole)
+            yield (f"batch/decrypt_blocks/{label}",
+                   _with_input(_random(whole), lambda b: aes_batch.decrypt_blocks(b, aes_key)), whole)
+
+            def many_keys(n=whole):
+                # One key per block, drawn from 64 tenants
+                tenant_keys = [os.urandom(16) for _ in range(64)]
+                return os.urandom(n), [tenant_keys[i % 64] for i in range(n // 16)]
+            yield (f"batch/encrypt_many[64 keys]/{label}",
+                   _with_input(many_keys, lambda args: aes_batch.encrypt_many(args[1], args[0])), whole)
+
+        if whole:
+            yield (f"bitslice/encrypt_blocks/{label}",
+                   _with_input(_random(whole), lambda b: aes_bitslice.encrypt_blocks(b, aes_key)), whole)
+            yield (f"bitslice/decrypt_blocks/{label}",
+                   _with_input(_random(whole), lambda b: aes_bitslice.decrypt_blocks(b, aes_key)), whole)
+
+        for mode in aes_modes.MODES:
+            iv = None if mode == "ECB" else BENCH_IV
+            yield (f"modes/{mode}-encrypt/{label}",
+                   _with_input(_random(size), lambda d, m=mode, iv=iv: aes_modes.encrypt(d, aes_key, m, iv)), size)
+            yield (f"modes/{mode}-decrypt/{label}",
+                   _with_input(lambda m=mode, n=size: _mode_ciphertext(aes_key, m, n),
+                               lambda c, m=mode, iv=iv: aes_modes.decrypt(c, aes_key, m, iv)), size)
+
+        yield (f"gcm/encrypt/{label}",
+               _with_input(_random(size), lambda d: aes_gcm.encrypt(d, aes_key, BENCH_IV[:12])), size)
+        yield f"gcm/ghash/{label}", _with_input(_random(whole), lambda b: gcm_key.ghash(0, b)), whole
+
+        yield (f"cmac/cmac_many[48B]/{label}",
+               _with_input(_messages(size), lambda m: aes_cmac.cmac_many(m, aes_key)), size)
+
+        sectors = size - size % aes_xts.SECTOR_SIZE
+        if sectors:
+            yield (f"xts/encrypt_sectors/{label}",
+                   _with_input(_random(sectors), lambda d: xts_key.encrypt_sectors(0, d)), sectors)
+
+        if workers > 1 and whole:
+            yield (f"parallel/ctr_crypt/{label}",
+                   _with_input(_random(size),
+                               lambda d: aes_parallel.ctr_crypt(d, aes_key, BENCH_IV, workers, executor=executor)), size)
+            yield (f"parallel/ecb_encrypt/{label}",
+                   _with_input(_random(whole),
+                               lambda b: aes_parallel.ecb_encrypt(b, aes_key, workers, executor=executor)), whole)
+            yield (f"parallel/cbc_decrypt/{label}",
+                   _with_input(_random(whole),
+                               lambda b: aes_parallel.cbc_decrypt(b, aes_key, BENCH_IV, workers, executor=executor)),
+                   whole)
+
+def keystream_benchmarks():
+    """
+    (name, setup, bytes per call) for a 4 KiB CTR request served from the
+    precomputed keystream, next to the same request computed inline.
+    """
+    aes_key = expand_key(BENCH_KEY)
+    request = os.urandom(4096)
+    yield ("keystream/ctr_inline[4KiB]",
+           _ready(lambda: aes_modes.encrypt(request, aes_key, "CTR", BENCH_IV)), len(request))
+    yield ("keystream/xor_buffered[4KiB]",
+           _with_input(lambda: aes_keystream.CTRKeystream(aes_key, BENCH_IV), lambda ks: ks.xor(request)),
+           len(request))
+
+def analysis_benchmarks():
+    """
+    (name, setup, bytes per call) for an avalanche run of 256 samples: 129
+    blocks encrypted per sample, with the state differences of every
+    round reduced into the report.
+    """
+    if aes_batch is None:
+        return
+    import aes_analysis
+
+    yield ("analysis/avalanche[256 samples]",
+           _ready(lambda: aes_analysis.avalanche(256, seed=0, workers=1)), 256 * 129 * 16)
+
+def import_benchmarks():
+    """
+    (name, setup, 0) for starting a fresh interpreter that imports each entry
+    point, next to a bare interpreter start ("import/python") to subtract.
+    Short-lived CLI runs and worker processes pay this on every start.
+    """
+    here = os.path.dirname(os.path.abspath(__file__))
+    for module in (None,) + IMPORT_MODULES:
+        code = f"import {module}" if module else "pass"
+        yield (f"import/{module or 'python'}",
+               _ready(lambda c=code: subprocess.run([sys.executable, "-c", c], cwd=here, check=True)), 0)
+
+def run_benchmarks(sizes=DEFAULT_SIZES, workers=None, min_time=DEFAULT_MIN_TIME, name_filter=None, log=None):
+    """
+    Run every benchmark whose name contains name_filter and return the
+    results as a JSON-serializable dict. A benchmark's inputs are built
+    just before it runs and released right after, so only one set is
+    held in memory at a time.
+    """
+    workers = workers or os.cpu_count() or 1
+    results = {}
+    executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    try:
+        benches = itertools.chain(primitive_benchmarks(), keystream_benchmarks(), analysis_benchmarks(),
+                                  import_benchmarks(), engine_benchmarks(sizes, workers, executor))
+        for name, setup, nbytes in benches:
+            if name_filter and name_filter not in name:
+                continue
+            fn = setup()
+            results[name] = measure(fn, nbytes, min_time)
+            # Drop this benchmark's inputs before the next one builds its own
+            del fn
+            if log is not None:
+                log(format_result(name, results[name]))
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    return {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "workers": workers,
+            "numpy": aes_batch is not None,
+            "peak_rss_bytes": peak_rss_bytes(),
+        },
+        "results": results,
+    }
+
+def format_result(name, result):
+    """One human-readable line per benchmark."""
+    line = f"{name:<40} {result['ops_per_s']:>14,.1f} op/s  p50 {result['p50_ns'] / 1e3:>10.1f}us  p99 {result['p99_ns'] / 1e3:>10.1f}us"
+    if "mb_per_s" in result:
+        line += f"  {result['mb_per_s']:>9.2f} MB/s  {result['blocks_per_s']:>12,.0f} blocks/s"
+    line += f"  peak {result['peak_alloc_bytes'] / (1 << 20):>8.1f} MiB"
+    return line
+
+def compare(current, baseline, threshold=DEFAULT_THRESHOLD):
+    """
+    Compare two result dicts. Returns (name, baseline op/s, current op/s)
+    for every benchmark whose throughput dropped by more than threshold.
+    """
+    regressions = []
+    for name, base in baseline["results"].items():
+        result = current["results"].get(name)
+        if result is None:
+            continue
+        if result["ops_per_s"] < base["ops_per_s"] * (1 - threshold):
+            regressions.append((name, base["ops_per_s"], result["ops_per_s"]))
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the AES primitives, modes and engines.")
+    parser.add_argument("--sizes", default=",".join(format_size(s) for s in DEFAULT_SIZES),
+                        help="comma-separated input sizes, e.g. 16,64K,1MiB,1GiB")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes for the parallel engine")
+    parser.add_argument("--min-time", type=float, default=DEFAULT_MIN_TIME, help="seconds to spend per benchmark")
+    parser.add_argument("--filter", default=None, help="only run benchmarks whose name contains this text")
+    parser.add_argument("-o", "--output", default=None, help="write results to this JSON file")
+    parser.add_argument("--baseline", default=None, help="compare against this JSON file")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="allowed throughput drop against the baseline (default 0.10)")
+    args = parser.parse_args(argv)
+
+    sizes = [parse_size(s) for s in args.sizes.split(",") if s]
+    results = run_benchmarks(sizes, args.workers, args.min_time, args.filter, log=print)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        for name, before, after in regressions:
+            print(f"REGRESSION {name}: {before:,.1f} -> {after:,.1f} op/s ({after / before - 1:+.1%})")
+        if regressions:
+            return 1
+        print(f"No regressions beyond {args.threshold:.0%} against {args.baseline}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
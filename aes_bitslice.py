@@ -0,0 +1,363 @@
+#!/usr/bin/env python3
+# AES-128 Encryption/Decryption Implementation
+# Bitsliced constant-time engine file
+
+from functools import lru_cache
+
+from aes_constants import rcon
+from aes_tables import KEY_ROUNDS
+
+# Bit-plane layout: a batch of N blocks is held as 128 Python ints, one per
+# bit of the state. Plane 8*k + b holds bit b of byte k of every block, the
+# bit of block i at bit i of the int. Every transformation is a fixed
+# sequence of XORs, ANDs and NOTs of whole planes, so one pass through the
+# circuit encrypts all N blocks:
+#
+#   SubBytes      the Boyar-Peralta circuit (32 AND and 83 XOR/XNOR gates) on
+#                 the 8 planes of each byte; InvSubBytes wraps the same
+#                 circuit in the inverse affine map
+#   ShiftRows     a reordering of the list of planes, no operations at all
+#   MixColumns    XORs of planes (xtime is a plane shuffle plus 3 XORs)
+#   Key schedule  SubWord runs through the same circuit, so the key is never
+#                 used as an index either
+#
+# No secret value is ever used as an index or a branch condition, so there
+# is no cache-timing leak. Python's int arithmetic is not strictly constant
+# time at the machine level (CPython drops leading zero digits, so a plane
+# whose top blocks are all 0 is shorter), but the sequence of operations
+# depends on the batch size only.
+
+# Blocks per bitsliced pass: each plane is then a 2 KiB int
+DEFAULT_CHUNK_BLOCKS = 1 << 14
+
+# Byte k of a block is row k % 4, column k // 4 of the state
+SHIFT_ROWS = [(k % 4) + 4 * ((k // 4 + k % 4) % 4) for k in range(16)]
+INV_SHIFT_ROWS = [SHIFT_ROWS.index(k) for k in range(16)]
+# The same permutations on the 128 planes
+_SHIFT_PLANES = [8 * SHIFT_ROWS[i // 8] + i % 8 for i in range(128)]
+_INV_SHIFT_PLANES = [8 * INV_SHIFT_ROWS[i // 8] + i % 8 for i in range(128)]
+
+def _repeat(pattern, lanes):
+    return int.from_bytes(pattern.to_bytes(8, 'little') * lanes, 'little')
+
+@lru_cache(maxsize=8)
+def _transpose_masks(lanes):
+    return (_repeat(0x00AA00AA00AA00AA, lanes), _repeat(0x0000CCCC0000CCCC, lanes),
+            _repeat(0x00000000F0F0F0F0, lanes))
+
+def _transpose8(x, masks):
+    """
+    Transpose the 8x8 bit matrix in every 64-bit lane of x: bit c of byte
+    r moves to bit r of byte c. It is its own inverse.
+    """
+    m1, m2, m3 = masks
+    t = (x ^ (x >> 7)) & m1
+    x ^= t ^ (t << 7)
+    t = (x ^ (x >> 14)) & m2
+    x ^= t ^ (t << 14)
+    t = (x ^ (x >> 28)) & m3
+    x ^= t ^ (t << 28)
+    return x
+
+def to_planes(data, blocks):
+    """
+    Split blocks * 16 bytes (blocks a multiple of 8) into the 128 bit
+    planes. Each byte position is gathered with one slice, and an 8x8 bit
+    transpose per 8 blocks turns its bytes into 8 planes.
+    """
+    data = bytes(data)
+    masks = _transpose_masks(blocks // 8)
+    planes = []
+    for k in range(16):
+        column = _transpose8(int.from_bytes(data[k::16], 'little'), masks).to_bytes(blocks, 'little')
+        planes.extend(int.from_bytes(column[b::8], 'little') for b in range(8))
+    return planes
+
+def from_planes(planes, blocks):
+    """Inverse of to_planes(): the 128 planes back to blocks * 16 bytes."""
+    masks = _transpose_masks(blocks // 8)
+    plane_bytes = blocks // 8
+    out = bytearray(16 * blocks)
+    column = bytearray(blocks)
+    for k in range(16):
+        for b in range(8):
+            column[b::8] = planes[8 * k + b].to_bytes(plane_bytes, 'little')
+        out[k::16] = _transpose8(int.from_bytes(column, 'little'), masks).to_bytes(blocks, 'little')
+    return bytes(out)
+
+def sub_byte(p, ones):
+    """
+    The AES S-box as a Boolean circuit (Boyar and Peralta, "A depth-16
+    circuit for the AES S-box", 2011) on the 8 planes p of one byte
+    position, least significant bit first. ones has a 1 in every lane.
+    """
+    x7, x6, x5, x4, x3, x2, x1, x0 = p
+    # Top linear transformation
+    y14 = x3 ^ x5
+    y13 = x0 ^ x6
+    y9 = x0 ^ x3
+    y8 = x0 ^ x5
+    t0 = x1 ^ x2
+    y1 = t0 ^ x7
+    y4 = y1 ^ x3
+    y12 = y13 ^ y14
+    y2 = y1 ^ x0
+    y5 = y1 ^ x6
+    y3 = y5 ^ y8
+    t1 = x4 ^ y12
+    y15 = t1 ^ x5
+    y20 = t1 ^ x1
+    y6 = y15 ^ x7
+    y10 = y15 ^ t0
+    y11 = y20 ^ y9
+    y7 = x7 ^ y11
+    y17 = y10 ^ y11
+    y19 = y10 ^ y8
+    y16 = t0 ^ y11
+    y21 = y13 ^ y16
+    y18 = x0 ^ y16
+    # Nonlinear middle: inversion in GF(2^4)^2
+    t2 = y12 & y15
+    t3 = y3 & y6
+    t4 = t3 ^ t2
+    t5 = y4 & x7
+    t6 = t5 ^ t2
+    t7 = y13 & y16
+    t8 = y5 & y1
+    t9 = t8 ^ t7
+    t10 = y2 & y7
+    t11 = t10 ^ t7
+    t12 = y9 & y11
+    t13 = y14 & y17
+    t14 = t13 ^ t12
+    t15 = y8 & y10
+    t16 = t15 ^ t12
+    t17 = t4 ^ t14
+    t18 = t6 ^ t16
+    t19 = t9 ^ t14
+    t20 = t11 ^ t16
+    t21 = t17 ^ y20
+    t22 = t18 ^ y19
+    t23 = t19 ^ y21
+    t24 = t20 ^ y18
+    t25 = t21 ^ t22
+    t26 = t21 & t23
+    t27 = t24 ^ t26
+    t28 = t25 & t27
+    t29 = t28 ^ t22
+    t30 = t23 ^ t24
+    t31 = t22 ^ t26
+    t32 = t31 & t30
+    t33 = t32 ^ t24
+    t34 = t23 ^ t33
+    t35 = t27 ^ t33
+    t36 = t24 & t35
+    t37 = t36 ^ t34
+    t38 = t27 ^ t36
+    t39 = t29 & t38
+    t40 = t25 ^ t39
+    t41 = t40 ^ t37
+    t42 = t29 ^ t33
+    t43 = t29 ^ t40
+    t44 = t33 ^ t37
+    t45 = t42 ^ t41
+    z0 = t44 & y15
+    z1 = t37 & y6
+    z2 = t33 & x7
+    z3 = t43 & y16
+    z4 = t40 & y1
+    z5 = t29 & y7
+    z6 = t42 & y11
+    z7 = t45 & y17
+    z8 = t41 & y10
+    z9 = t44 & y12
+    z10 = t37 & y3
+    z11 = t33 & y4
+    z12 = t43 & y13
+    z13 = t40 & y5
+    z14 = t29 & y2
+    z15 = t42 & y9
+    z16 = t45 & y14
+    z17 = t41 & y8
+    # Bottom linear transformation (XNOR gates as XOR with ones)
+    t46 = z15 ^ z16
+    t47 = z10 ^ z11
+    t48 = z5 ^ z13
+    t49 = z9 ^ z10
+    t50 = z2 ^ z12
+    t51 = z2 ^ z5
+    t52 = z7 ^ z8
+    t53 = z0 ^ z3
+    t54 = z6 ^ z7
+    t55 = z16 ^ z17
+    t56 = z12 ^ t48
+    t57 = t50 ^ t53
+    t58 = z4 ^ t46
+    t59 = z3 ^ t54
+    t60 = t46 ^ t57
+    t61 = z14 ^ t57
+    t62 = t52 ^ t58
+    t63 = t49 ^ t58
+    t64 = z4 ^ t59
+    t65 = t61 ^ t62
+    t66 = z1 ^ t63
+    s0 = t59 ^ t63
+    s6 = t56 ^ t62 ^ ones
+    s7 = t48 ^ t60 ^ ones
+    t67 = t64 ^ t65
+    s3 = t53 ^ t66
+    s4 = t51 ^ t66
+    s5 = t47 ^ t65
+    s1 = t64 ^ s3 ^ ones
+    s2 = t55 ^ t67 ^ ones
+    return [s7, s6, s5, s4, s3, s2, s1, s0]
+
+def _inv_affine(p):
+    # Bit i of the inverse affine map (without its constant) is
+    # x[i-1] ^ x[i-3] ^ x[i-6]
+    return [p[(i - 1) % 8] ^ p[(i - 3) % 8] ^ p[(i - 6) % 8] for i in range(8)]
+
+def inv_sub_byte(p, ones):
+    """
+    InvSubBytes on the 8 planes of one byte position: InvS(x) =
+    A^-1(S(A^-1(x) ^ 0x05)) ^ 0x05, A^-1 being the linear part of the
+    inverse affine map, so the forward circuit serves both directions.
+    """
+    q = _inv_affine(p)
+    q[0] ^= ones
+    q[2] ^= ones
+    q = _inv_affine(sub_byte(q, ones))
+    q[0] ^= ones
+    q[2] ^= ones
+    return q
+
+def sub_bytes(s, ones):
+    out = []
+    for k in range(0, 128, 8):
+        out.extend(sub_byte(s[k:k + 8], ones))
+    return out
+
+def inv_sub_bytes(s, ones):
+    out = []
+    for k in range(0, 128, 8):
+        out.extend(inv_sub_byte(s[k:k + 8], ones))
+    return out
+
+def _xtime(a):
+    # Multiplication by x: shift up one plane, reduce by 0x1B (bits 0, 1, 3, 4)
+    h = a[7]
+    return [h, a[0] ^ h, a[1], a[2] ^ h, a[3] ^ h, a[4], a[5], a[6]]
+
+def mix_columns(s):
+    # 2*a[r] ^ 3*a[r+1] ^ a[r+2] ^ a[r+3] = a[r] ^ t ^ xtime(a[r] ^ a[r+1]),
+    # with t the XOR of the whole column
+    out = []
+    for c in range(0, 128, 32):
+        a = [s[c + 8 * r:c + 8 * r + 8] for r in range(4)]
+        t = [a[0][b] ^ a[1][b] ^ a[2][b] ^ a[3][b] for b in range(8)]
+        for r in range(4):
+            ar, an = a[r], a[(r + 1) % 4]
+            d = _xtime([ar[b] ^ an[b] for b in range(8)])
+            out.extend(ar[b] ^ t[b] ^ d[b] for b in range(8))
+    return out
+
+def inv_mix_columns(s):
+    # InvMixColumns = MixColumns after adding 4*(a[0] ^ a[2]) to rows 0 and
+    # 2 and 4*(a[1] ^ a[3]) to rows 1 and 3
+    s = list(s)
+    for c in range(0, 128, 32):
+        for r in (0, 1):
+            lo, hi = c + 8 * r, c + 8 * (r + 2)
+            u = _xtime(_xtime([s[lo + b] ^ s[hi + b] for b in range(8)]))
+            for b in range(8):
+                s[lo + b] ^= u[b]
+                s[hi + b] ^= u[b]
+    return mix_columns(s)
+
+def _add_round_key(s, k):
+    return [a ^ b for a, b in zip(s, k)]
+
+def _sub_word(word):
+    """SubWord of a 4-byte word through the circuit (the 4 bytes as 4 of 8 lanes)."""
+    masks = _transpose_masks(1)
+    planes = _transpose8(int.from_bytes(word + bytes(4), 'little'), masks).to_bytes(8, 'little')
+    out = sub_byte(list(planes), 0xFF)
+    return _transpose8(int.from_bytes(bytes(out), 'little'), masks).to_bytes(8, 'little')[:4]
+
+def key_schedule(key):
+    """
+    Expand a 16, 24 or 32-byte key into the flat Nr+1 round keys (the
+    layout of AESKey.ek_bytes), with SubWord computed by the S-box circuit
+    instead of table lookups. An AESKey is re-expanded from its raw key.
+    """
+    key = bytes(getattr(key, "key", key))
+    nr = KEY_ROUNDS.get(len(key))
+    if nr is None:
+        raise ValueError(f"AES key must be 16, 24 or 32 bytes, got {len(key)}")
+    nk = len(key) // 4
+    words = [key[4 * i:4 * i + 4] for i in range(nk)]
+    for i in range(nk, 4 * (nr + 1)):
+        temp = words[i - 1]
+        if i % nk == 0:
+            temp = _sub_word(temp[1:] + temp[:1])
+            temp = bytes([temp[0] ^ rcon[i // nk - 1]]) + temp[1:]
+        elif nk > 6 and i % nk == 4:
+            temp = _sub_word(temp)
+        words.append(bytes(a ^ b for a, b in zip(words[i - nk], temp)))
+    return b''.join(words)
+
+def _round_key_planes(schedule, ones):
+    """Every round key as 128 planes, each all ones or all zeros."""
+    return [[ones * ((schedule[i + k] >> b) & 1) for k in range(16) for b in range(8)]
+            for i in range(0, len(schedule), 16)]
+
+def encrypt_state(s, round_keys, ones):
+    """Encrypt the 128 planes s with round keys from _round_key_planes()."""
+    nr = len(round_keys) - 1
+    s = _add_round_key(s, round_keys[0])
+    for r in range(1, nr):
+        s = sub_bytes(s, ones)
+        s = mix_columns([s[i] for i in _SHIFT_PLANES])
+        s = _add_round_key(s, round_keys[r])
+    s = sub_bytes(s, ones)
+    return _add_round_key([s[i] for i in _SHIFT_PLANES], round_keys[nr])
+
+def decrypt_state(s, round_keys, ones):
+    """Decrypt the 128 planes s with the encryption round keys (inverse cipher)."""
+    nr = len(round_keys) - 1
+    s = _add_round_key(s, round_keys[nr])
+    for r in range(nr - 1, 0, -1):
+        s = inv_sub_bytes([s[i] for i in _INV_SHIFT_PLANES], ones)
+        s = inv_mix_columns(_add_round_key(s, round_keys[r]))
+    s = inv_sub_bytes([s[i] for i in _INV_SHIFT_PLANES], ones)
+    return _add_round_key(s, round_keys[0])
+
+def _process(data, key, transform, chunk_blocks):
+    if len(data) % 16 != 0:
+        raise ValueError(f"Data length must be a multiple of 16 bytes, got {len(data)}")
+    schedule = key_schedule(key)
+    data = memoryview(data)
+    out = []
+    for start in range(0, len(data), 16 * chunk_blocks):
+        chunk = bytes(data[start:start + 16 * chunk_blocks])
+        # The transpose works on groups of 8 blocks: pad with zero blocks
+        blocks = -(-len(chunk) // 128) * 8
+        ones = (1 << blocks) - 1
+        planes = transform(to_planes(chunk + bytes(16 * blocks - len(chunk)), blocks),
+                           _round_key_planes(schedule, ones), ones)
+        out.append(from_planes(planes, blocks)[:len(chunk)])
+    return b''.join(out)
+
+def encrypt_blocks(data, key, chunk_blocks=DEFAULT_CHUNK_BLOCKS):
+    """
+    Encrypt every 16-byte block of data independently (ECB), chunk_blocks
+    blocks per bitsliced pass. key may be raw bytes or an AESKey.
+    """
+    return _process(data, key, encrypt_state, chunk_blocks)
+
+def decrypt_blocks(data, key, chunk_blocks=DEFAULT_CHUNK_BLOCKS):
+    """
+    Decrypt every 16-byte block of data independently (ECB).
+    key may be raw bytes or an AESKey.
+    """
+    return _process(data, key, decrypt_state, chunk_blocks)
@@ -2,8 +2,17 @@
 # AES-128 Encryption/Decryption Implementation
 # Core functionality file
 
-from aes_utils import bytes_to_matrix, matrix_to_bytes, display_state, display_round_key
+from aes_utils import bytes_to_matrix
 from aes_constants import sbox, inv_sbox, rcon
+from aes_gf import gf_mul, MUL2, MUL3, MUL9, MUL11, MUL13, MUL14
+import aes_tables
+from aes_key import expand_key
+
+# aes_bitslice và aes_trace chỉ được import khi cần (engine="bitslice",
+# verbose=True), để import aes_core chỉ nạp các hằng số và engine T-table
+
+# Các engine có thể chọn cho encrypt/decrypt
+ENGINES = ("table", "reference", "bitslice")
 
 def sub_bytes(state, inverse=False):
     """
@@ -41,17 +50,11 @@ def shift_rows(state, inverse=False):
     return result
 
 def galois_multiplication(a, b):
-    """Nhân hai số trong trường Galois GF(2^8)."""
-    p = 0
-    for i in range(8):
-        if b & 1:
-            p ^= a
-        hi_bit_set = a & 0x80
-        a <<= 1
-        if hi_bit_set:
-            a ^= 0x1B  # AES's irreducible polynomial x^8 + x^4 + x^3 + x + 1 (0x11b)
-        b >>= 1
-    return p & 0xFF
+    """
+    Nhân hai số trong trường Galois GF(2^8), đa thức bất khả quy
+    x^8 + x^4 + x^3 + x + 1 (0x11b). Dùng bảng log/antilog trong aes_gf.
+    """
+    return gf_mul(a, b)
 
 def mix_columns(state, inverse=False):
     """
@@ -65,38 +68,17 @@ def mix_columns(state, inverse=False):
         col = [state[j][i] for j in range(4)]
         
         if not inverse:
-            # MixColumns transformation cho mã hóa
-            state[0][i] = galois_multiplication(0x02, col[0]) ^ \
-                          galois_multiplication(0x03, col[1]) ^ \
-                          col[2] ^ col[3]
-            state[1][i] = col[0] ^ \
-                          galois_multiplication(0x02, col[1]) ^ \
-                          galois_multiplication(0x03, col[2]) ^ \
-                          col[3]
-            state[2][i] = col[0] ^ col[1] ^ \
-                          galois_multiplication(0x02, col[2]) ^ \
-                          galois_multiplication(0x03, col[3])
-            state[3][i] = galois_multiplication(0x03, col[0]) ^ \
-                          col[1] ^ col[2] ^ \
-                          galois_multiplication(0x02, col[3])
+            # MixColumns transformation cho mã hóa (tra bảng nhân {02}, {03})
+            state[0][i] = MUL2[col[0]] ^ MUL3[col[1]] ^ col[2] ^ col[3]
+            state[1][i] = col[0] ^ MUL2[col[1]] ^ MUL3[col[2]] ^ col[3]
+            state[2][i] = col[0] ^ col[1] ^ MUL2[col[2]] ^ MUL3[col[3]]
+            state[3][i] = MUL3[col[0]] ^ col[1] ^ col[2] ^ MUL2[col[3]]
         else:
-            # InvMixColumns transformation cho giải mã
-            state[0][i] = galois_multiplication(0x0E, col[0]) ^ \
-                          galois_multiplication(0x0B, col[1]) ^ \
-                          galois_multiplication(0x0D, col[2]) ^ \
-                          galois_multiplication(0x09, col[3])
-            state[1][i] = galois_multiplication(0x09, col[0]) ^ \
-                          galois_multiplication(0x0E, col[1]) ^ \
-                          galois_multiplication(0x0B, col[2]) ^ \
-                          galois_multiplication(0x0D, col[3])
-            state[2][i] = galois_multiplication(0x0D, col[0]) ^ \
-                          galois_multiplication(0x09, col[1]) ^ \
-                          galois_multiplication(0x0E, col[2]) ^ \
-                          galois_multiplication(0x0B, col[3])
-            state[3][i] = galois_multiplication(0x0B, col[0]) ^ \
-                          galois_multiplication(0x0D, col[1]) ^ \
-                          galois_multiplication(0x09, col[2]) ^ \
-                          galois_multiplication(0x0E, col[3])
+            # InvMixColumns transformation cho giải mã (tra bảng nhân {0E}, {0B}, {0D}, {09})
+            state[0][i] = MUL14[col[0]] ^ MUL11[col[1]] ^ MUL13[col[2]] ^ MUL9[col[3]]
+            state[1][i] = MUL9[col[0]] ^ MUL14[col[1]] ^ MUL11[col[2]] ^ MUL13[col[3]]
+            state[2][i] = MUL13[col[0]] ^ MUL9[col[1]] ^ MUL14[col[2]] ^ MUL11[col[3]]
+            state[3][i] = MUL11[col[0]] ^ MUL13[col[1]] ^ MUL9[col[2]] ^ MUL14[col[3]]
     
     return state
 
@@ -111,229 +93,258 @@ def add_round_key(state, round_key):
     
     return state
 
+# Các phép biến đổi trên state dạng phẳng: một bytearray 16 bytes theo thứ tự
+# cột (byte k là hàng k % 4, cột k // 4), giống thứ tự của block dữ liệu.
+# Tất cả đều sửa trực tiếp trên buffer, không cấp phát ma trận mới mỗi vòng.
+
+def sub_bytes_flat(state, inverse=False):
+    """SubBytes (hoặc InvSubBytes) tại chỗ trên state dạng phẳng."""
+    box = inv_sbox if inverse else sbox
+    for i in range(16):
+        state[i] = box[state[i]]
+    return state
+
+def shift_rows_flat(state, inverse=False):
+    """ShiftRows (hoặc InvShiftRows) tại chỗ trên state dạng phẳng."""
+    if not inverse:
+        state[1], state[5], state[9], state[13] = state[5], state[9], state[13], state[1]
+        state[3], state[7], state[11], state[15] = state[15], state[3], state[7], state[11]
+    else:
+        state[1], state[5], state[9], state[13] = state[13], state[1], state[5], state[9]
+        state[3], state[7], state[11], state[15] = state[7], state[11], state[15], state[3]
+    # Hàng 2 dịch 2 vị trí theo cả hai chiều
+    state[2], state[6], state[10], state[14] = state[10], state[14], state[2], state[6]
+    return state
+
+def mix_columns_flat(state, inverse=False):
+    """MixColumns (hoặc InvMixColumns) tại chỗ trên state dạng phẳng."""
+    for i in range(0, 16, 4):
+        a0, a1, a2, a3 = state[i], state[i + 1], state[i + 2], state[i + 3]
+        if not inverse:
+            state[i] = MUL2[a0] ^ MUL3[a1] ^ a2 ^ a3
+            state[i + 1] = a0 ^ MUL2[a1] ^ MUL3[a2] ^ a3
+            state[i + 2] = a0 ^ a1 ^ MUL2[a2] ^ MUL3[a3]
+            state[i + 3] = MUL3[a0] ^ a1 ^ a2 ^ MUL2[a3]
+        else:
+            state[i] = MUL14[a0] ^ MUL11[a1] ^ MUL13[a2] ^ MUL9[a3]
+            state[i + 1] = MUL9[a0] ^ MUL14[a1] ^ MUL11[a2] ^ MUL13[a3]
+            state[i + 2] = MUL13[a0] ^ MUL9[a1] ^ MUL14[a2] ^ MUL11[a3]
+            state[i + 3] = MUL11[a0] ^ MUL13[a1] ^ MUL9[a2] ^ MUL14[a3]
+    return state
+
+def add_round_key_flat(state, round_keys, offset=0):
+    """
+    AddRoundKey tại chỗ. round_keys là lịch khóa phẳng (176 bytes, xem
+    AESKey.ek_bytes); offset là vị trí byte đầu của khóa vòng cần dùng.
+    """
+    for i in range(16):
+        state[i] ^= round_keys[offset + i]
+    return state
+
 def generate_round_keys(key):
     """
-    Sinh các khóa con từ khóa chính key.
+    Sinh các khóa con từ khóa chính key (16, 24 hoặc 32 bytes cho
+    AES-128/192/256): Nr+1 ma trận 4x4, với Nr = 10, 12 hoặc 14 vòng.
     """
-    key_schedule = []
-    key_matrix = bytes_to_matrix(key)
-    key_schedule.append(key_matrix)
-    
-    for i in range(10):  # AES-128 có 10 vòng, nên cần 11 khóa con (khóa ban đầu + 10 khóa vòng)
-        # Lấy khóa của vòng trước
-        prev_key = key_schedule[-1]
-        new_key = [row[:] for row in prev_key]  # Tạo bản sao
-        
-        # RotWord: Dịch vòng cột cuối
-        temp = [prev_key[1][3], prev_key[2][3], prev_key[3][3], prev_key[0][3]]
-        
-        # SubWord: Thay thế bằng giá trị từ S-box
-        for j in range(4):
-            temp[j] = sbox[temp[j]]
-        
-        # XOR với cột đầu của khóa trước và với Rcon
-        for j in range(4):
-            new_key[j][0] = prev_key[j][0] ^ temp[j] ^ (rcon[i] if j == 0 else 0)
-        
-        # Tính các cột còn lại
-        for j in range(1, 4):
-            for k in range(4):
-                new_key[k][j] = new_key[k][j-1] ^ prev_key[k][j]
-        
-        key_schedule.append(new_key)
-    
-    return key_schedule
+    nr = aes_tables.KEY_ROUNDS.get(len(key))
+    if nr is None:
+        raise ValueError(f"AES key must be 16, 24 or 32 bytes, got {len(key)}")
+    nk = len(key) // 4
+    
+    # Mỗi word là một cột 4 byte; khóa chính cho Nk word đầu tiên
+    words = [list(key[4*i:4*i + 4]) for i in range(nk)]
+    for i in range(nk, 4 * (nr + 1)):
+        temp = words[i - 1][:]
+        if i % nk == 0:
+            # RotWord: Dịch vòng word, SubWord: thay thế bằng S-box, XOR với Rcon
+            temp = [sbox[b] for b in temp[1:] + temp[:1]]
+            temp[0] ^= rcon[i // nk - 1]
+        elif nk > 6 and i % nk == 4:
+            # Chỉ AES-256: thêm SubWord ở giữa mỗi nhóm 8 word
+            temp = [sbox[b] for b in temp]
+        words.append([words[i - nk][j] ^ temp[j] for j in range(4)])
+    
+    # Mỗi khóa vòng gồm 4 word liên tiếp, word là cột của ma trận
+    return [[[words[4*r + c][row] for c in range(4)] for row in range(4)] for r in range(nr + 1)]
 
-def encrypt(plaintext, key, verbose=False):
+def generate_decryption_round_keys(round_keys):
     """
-    Mã hóa plaintext với khóa key sử dụng AES-128.
-    Nếu verbose=True, hiển thị thông tin chi tiết qua mỗi vòng.
+    Sinh các khóa vòng cho "equivalent inverse cipher" (FIPS-197 mục 5.3.5)
+    từ các khóa vòng mã hóa: đảo ngược thứ tự và áp dụng InvMixColumns
+    một lần lên các khóa vòng 1..Nr-1, để mỗi vòng giải mã có cùng cấu trúc
+    với vòng mã hóa.
     """
-    state = bytes_to_matrix(plaintext)
-    round_keys = generate_round_keys(key)
-    
-    if verbose:
-        print("\nKhóa chính:")
-        display_round_key(round_keys[0])
-        print("\nCác khóa vòng:")
-        for i in range(1, 11):
-            print(f"\nKhóa vòng {i}:")
-            display_round_key(round_keys[i])
-    
-    # Initial round
-    if verbose:
-        print("\n--- Vòng ban đầu ---")
-        print("Trước AddRoundKey:")
-        display_state(state)
-    
-    state = add_round_key(state, round_keys[0])
-    
-    if verbose:
-        print("Sau AddRoundKey:")
-        display_state(state)
-    
-    # Main rounds
-    for i in range(1, 10):
-        if verbose:
-            print(f"\n--- Vòng {i} ---")
-        
-        if verbose:
-            print("Trước SubBytes:")
-            display_state(state)
-        
-        state = sub_bytes(state)
-        
-        if verbose:
-            print("Sau SubBytes:")
-            display_state(state)
-            print("Trước ShiftRows:")
-            display_state(state)
-        
-        state = shift_rows(state)
-        
-        if verbose:
-            print("Sau ShiftRows:")
-            display_state(state)
-            print("Trước MixColumns:")
-            display_state(state)
-        
-        state = mix_columns(state)
-        
-        if verbose:
-            print("Sau MixColumns:")
-            display_state(state)
-            print("Trước AddRoundKey:")
-            display_state(state)
-        
-        state = add_round_key(state, round_keys[i])
-        
-        if verbose:
-            print("Sau AddRoundKey:")
-            display_state(state)
-    
-    # Final round (no MixColumns)
-    if verbose:
-        print("\n--- Vòng cuối (10) ---")
-        print("Trước SubBytes:")
-        display_state(state)
-    
-    state = sub_bytes(state)
-    
-    if verbose:
-        print("Sau SubBytes:")
-        display_state(state)
-        print("Trước ShiftRows:")
-        display_state(state)
-    
-    state = shift_rows(state)
-    
-    if verbose:
-        print("Sau ShiftRows:")
-        display_state(state)
-        print("Trước AddRoundKey:")
-        display_state(state)
-    
-    state = add_round_key(state, round_keys[10])
-    
-    if verbose:
-        print("Sau AddRoundKey (Ciphertext):")
-        display_state(state)
-    
-    return matrix_to_bytes(state)
+    nr = len(round_keys) - 1
+    dec_keys = [[row[:] for row in round_keys[nr]]]
+    for i in range(nr - 1, 0, -1):
+        dec_keys.append(mix_columns([row[:] for row in round_keys[i]], inverse=True))
+    dec_keys.append([row[:] for row in round_keys[0]])
+    return dec_keys
 
-def decrypt(ciphertext, key, verbose=False):
+def encrypt_block_flat(state, round_keys):
     """
-    Giải mã ciphertext với khóa key sử dụng AES-128.
-    Nếu verbose=True, hiển thị thông tin chi tiết qua mỗi vòng.
+    Mã hóa tại chỗ một state dạng phẳng (bytearray 16 bytes) với lịch khóa
+    phẳng round_keys. Không cấp phát gì thêm trong các vòng.
     """
-    state = bytes_to_matrix(ciphertext)
-    round_keys = generate_round_keys(key)
-    
-    if verbose:
-        print("\nKhóa chính:")
-        display_round_key(round_keys[0])
-        print("\nCác khóa vòng:")
-        for i in range(1, 11):
-            print(f"\nKhóa vòng {i}:")
-            display_round_key(round_keys[i])
-    
-    # Initial round
-    if verbose:
-        print("\n--- Vòng ban đầu ---")
-        print("Trước AddRoundKey:")
-        display_state(state)
-    
-    state = add_round_key(state, round_keys[10])
-    
-    if verbose:
-        print("Sau AddRoundKey:")
-        display_state(state)
-    
-    # Main rounds
-    for i in range(9, 0, -1):
-        if verbose:
-            print(f"\n--- Vòng {10-i} ---")
-        
-        if verbose:
-            print("Trước InvShiftRows:")
-            display_state(state)
-        
-        state = shift_rows(state, inverse=True)
-        
-        if verbose:
-            print("Sau InvShiftRows:")
-            display_state(state)
-            print("Trước InvSubBytes:")
-            display_state(state)
-        
-        state = sub_bytes(state, inverse=True)
-        
-        if verbose:
-            print("Sau InvSubBytes:")
-            display_state(state)
-            print("Trước AddRoundKey:")
-            display_state(state)
-        
-        state = add_round_key(state, round_keys[i])
-        
-        if verbose:
-            print("Sau AddRoundKey:")
-            display_state(state)
-            print("Trước InvMixColumns:")
-            display_state(state)
-        
-        state = mix_columns(state, inverse=True)
-        
-        if verbose:
-            print("Sau InvMixColumns:")
-            display_state(state)
-    
-    # Final round (no InvMixColumns)
-    if verbose:
-        print("\n--- Vòng cuối (10) ---")
-        print("Trước InvShiftRows:")
-        display_state(state)
-    
-    state = shift_rows(state, inverse=True)
-    
-    if verbose:
-        print("Sau InvShiftRows:")
-        display_state(state)
-        print("Trước InvSubBytes:")
-        display_state(state)
-    
-    state = sub_bytes(state, inverse=True)
-    
-    if verbose:
-        print("Sau InvSubBytes:")
-        display_state(state)
-        print("Trước AddRoundKey:")
-        display_state(state)
-    
-    state = add_round_key(state, round_keys[0])
-    
-    if verbose:
-        print("Sau AddRoundKey (Plaintext):")
-        display_state(state)
-    
-    return matrix_to_bytes(state)
\ No newline at end of file
+    nr = len(round_keys) // 16 - 1
+    add_round_key_flat(state, round_keys, 0)
+    for i in range(1, nr):
+        sub_bytes_flat(state)
+        shift_rows_flat(state)
+        mix_columns_flat(state)
+        add_round_key_flat(state, round_keys, 16 * i)
+    sub_bytes_flat(state)
+    shift_rows_flat(state)
+    add_round_key_flat(state, round_keys, 16 * nr)
+    return state
+
+def decrypt_block_flat(state, round_keys):
+    """
+    Giải mã tại chỗ một state dạng phẳng với lịch khóa mã hóa phẳng
+    round_keys, theo thứ tự nghịch đảo thông thường.
+    """
+    nr = len(round_keys) // 16 - 1
+    add_round_key_flat(state, round_keys, 16 * nr)
+    for i in range(nr - 1, 0, -1):
+        shift_rows_flat(state, inverse=True)
+        sub_bytes_flat(state, inverse=True)
+        add_round_key_flat(state, round_keys, 16 * i)
+        mix_columns_flat(state, inverse=True)
+    shift_rows_flat(state, inverse=True)
+    sub_bytes_flat(state, inverse=True)
+    add_round_key_flat(state, round_keys, 0)
+    return state
+
+def decrypt_block_flat_equivalent(state, dec_round_keys):
+    """
+    Giải mã tại chỗ theo equivalent inverse cipher, với lịch khóa giải mã
+    phẳng dec_round_keys (AESKey.dk_bytes): InvSubBytes → InvShiftRows →
+    InvMixColumns → AddRoundKey, cùng cấu trúc với mã hóa.
+    """
+    nr = len(dec_round_keys) // 16 - 1
+    add_round_key_flat(state, dec_round_keys, 0)
+    for i in range(1, nr):
+        sub_bytes_flat(state, inverse=True)
+        shift_rows_flat(state, inverse=True)
+        mix_columns_flat(state, inverse=True)
+        add_round_key_flat(state, dec_round_keys, 16 * i)
+    sub_bytes_flat(state, inverse=True)
+    shift_rows_flat(state, inverse=True)
+    add_round_key_flat(state, dec_round_keys, 16 * nr)
+    return state
+
+# Các bước dùng cho đường chạy có tracer: step(state, round_keys, offset)
+_STEPS = {
+    "SubBytes": lambda state, round_keys, offset: sub_bytes_flat(state),
+    "ShiftRows": lambda state, round_keys, offset: shift_rows_flat(state),
+    "MixColumns": lambda state, round_keys, offset: mix_columns_flat(state),
+    "InvSubBytes": lambda state, round_keys, offset: sub_bytes_flat(state, inverse=True),
+    "InvShiftRows": lambda state, round_keys, offset: shift_rows_flat(state, inverse=True),
+    "InvMixColumns": lambda state, round_keys, offset: mix_columns_flat(state, inverse=True),
+    "AddRoundKey": lambda state, round_keys, offset: add_round_key_flat(state, round_keys, offset),
+}
+
+_programs = {}
+
+def _trace_program(nr, kind):
+    """
+    Danh sách (vòng, tên bước, hàm, offset khóa) cho một lần chạy có tracer.
+    kind là "encrypt", "decrypt" (nghịch đảo thông thường, khóa mã hóa) hoặc
+    "equivalent" (equivalent inverse cipher, khóa giải mã).
+    """
+    program = _programs.get((nr, kind))
+    if program is not None:
+        return program
+    
+    if kind == "encrypt":
+        main = ["SubBytes", "ShiftRows", "MixColumns", "AddRoundKey"]
+    elif kind == "equivalent":
+        main = ["InvSubBytes", "InvShiftRows", "InvMixColumns", "AddRoundKey"]
+    else:
+        main = ["InvShiftRows", "InvSubBytes", "AddRoundKey", "InvMixColumns"]
+    final = [name for name in main if not name.endswith("MixColumns")]
+    
+    def key_offset(i):
+        # Giải mã thông thường dùng khóa mã hóa theo thứ tự ngược
+        return 16 * (nr - i) if kind == "decrypt" else 16 * i
+    
+    program = [(0, "AddRoundKey", _STEPS["AddRoundKey"], key_offset(0))]
+    for i in range(1, nr + 1):
+        for name in (main if i < nr else final):
+            program.append((i, name, _STEPS[name], key_offset(i)))
+    
+    _programs[(nr, kind)] = program
+    return program
+
+def _run_traced(state, round_keys, kind, tracer):
+    """Chạy cipher trên state phẳng, báo từng bước cho tracer."""
+    nr = len(round_keys) // 16 - 1
+    before = bytearray(16)
+    tracer.begin(round_keys, kind)
+    for round_num, name, step, offset in _trace_program(nr, kind):
+        before[:] = state
+        step(state, round_keys, offset)
+        tracer.record(round_num, name, before, state)
+    return state
+
+def _check_engine(engine):
+    """Kiểm tra tên engine hợp lệ."""
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown engine {engine!r}, expected one of {ENGINES}")
+
+def encrypt(plaintext, key, verbose=False, engine="table", tracer=None):
+    """
+    Mã hóa plaintext với khóa key sử dụng AES.
+    key có thể là 16, 24 hoặc 32 bytes (AES-128/192/256, số vòng 10/12/14)
+    hoặc một AESKey đã mở rộng sẵn (xem aes_key).
+    engine="table" dùng các bảng T-table (nhanh), engine="reference" chạy
+    từng bước SubBytes/ShiftRows/MixColumns/AddRoundKey trên state dạng
+    phẳng (bytearray), engine="bitslice" dùng engine bitsliced trong
+    aes_bitslice (không tra bảng theo dữ liệu bí mật, chống tấn công
+    cache-timing; plaintext có thể gồm nhiều khối).
+    tracer (xem aes_trace) nhận state trước/sau mỗi bước; khi có tracer,
+    cipher luôn chạy từng bước. verbose=True tương đương tracer=PrintTracer().
+    Khi không có tracer, đường chạy không có nhánh kiểm tra nào cho việc
+    theo dõi.
+    """
+    _check_engine(engine)
+    if verbose and tracer is None:
+        from aes_trace import PrintTracer
+        tracer = PrintTracer()
+    aes_key = expand_key(key)
+    
+    if tracer is not None:
+        return bytes(_run_traced(bytearray(plaintext), aes_key.ek_bytes, "encrypt", tracer))
+    if engine == "table":
+        return aes_tables.encrypt_block(plaintext, aes_key.ek)
+    if engine == "bitslice":
+        import aes_bitslice
+        return aes_bitslice.encrypt_blocks(plaintext, aes_key)
+    return bytes(encrypt_block_flat(bytearray(plaintext), aes_key.ek_bytes))
+
+def decrypt(ciphertext, key, verbose=False, engine="table", equivalent=False, tracer=None):
+    """
+    Giải mã ciphertext với khóa key sử dụng AES (khóa 128, 192 hoặc 256 bit).
+    engine, verbose và tracer có ý nghĩa giống như trong encrypt().
+    equivalent=True chạy equivalent inverse cipher (cùng thứ tự bước như
+    mã hóa, InvMixColumns đã được áp dụng sẵn lên khóa vòng); engine
+    "table" luôn giải mã theo cách này.
+    """
+    _check_engine(engine)
+    if verbose and tracer is None:
+        from aes_trace import PrintTracer
+        tracer = PrintTracer()
+    aes_key = expand_key(key)
+    
+    if tracer is not None:
+        if equivalent:
+            return bytes(_run_traced(bytearray(ciphertext), aes_key.dk_bytes, "equivalent", tracer))
+        return bytes(_run_traced(bytearray(ciphertext), aes_key.ek_bytes, "decrypt", tracer))
+    if engine == "table":
+        return aes_tables.decrypt_block(ciphertext, aes_key.dk)
+    if engine == "bitslice":
+        import aes_bitslice
+        return aes_bitslice.decrypt_blocks(ciphertext, aes_key)
+    if equivalent:
+        return bytes(decrypt_block_flat_equivalent(bytearray(ciphertext), aes_key.dk_bytes))
+    return bytes(decrypt_block_flat(bytearray(ciphertext), aes_key.ek_bytes))
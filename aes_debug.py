@@ -4,29 +4,64 @@
 
 from aes_core import encrypt, decrypt
 from aes_utils import bytes_to_hex
+import aes_modes
+
+TEST_VECTORS = [
+    # (key, plaintext, expected_ciphertext)
+    (
+        bytes.fromhex("000102030405060708090a0b0c0d0e0f"), 
+        bytes.fromhex("00112233445566778899aabbccddeeff"), 
+        bytes.fromhex("69c4e0d86a7b0430d8cdb78070b4c55a")
+    ),
+    (
+        bytes.fromhex("2b7e151628aed2a6abf7158809cf4f3c"), 
+        bytes.fromhex("6bc1bee22e409f96e93d7e117393172a"), 
+        bytes.fromhex("3ad77bb40d7a3660a89ecaf32466ef97")
+    ),
+    # AES-192 and AES-256 (FIPS-197 Appendix C.2 and C.3)
+    (
+        bytes.fromhex("000102030405060708090a0b0c0d0e0f1011121314151617"), 
+        bytes.fromhex("00112233445566778899aabbccddeeff"), 
+        bytes.fromhex("dda97ca4864cdfe06eaf70a0ec0d7191")
+    ),
+    (
+        bytes.fromhex("000102030405060708090a0b0c0d0e0f101112131415161718191a1b1c1d1e1f"), 
+        bytes.fromhex("00112233445566778899aabbccddeeff"), 
+        bytes.fromhex("8ea2b7ca516745bfeafc49904b496089")
+    ),
+    # Add more test vectors as needed
+]
+
+_GCM_KEY = "feffe9928665731c6d6a8f9467308308"
+_GCM_PLAINTEXT = ("d9313225f88406e5a55909c5aff5269a86a7a9531534f7da2e4c303d8a318a72"
+                  "1c3c0c95956809532fcf0e2449a6b525b16aedf5aa0de657ba637b391aafd255")
+_GCM_CIPHERTEXT = ("42831ec2217774244b7221b784d0d49ce3aa212f2c02a4e035c17e2329aca12e"
+                   "21d514b25466931c7d8f6a5aac84aa051ba30b396a0aac973d58e091473f5985")
+
+GCM_TEST_VECTORS = [
+    # (key, iv, plaintext, aad, ciphertext, tag) from the GCM specification
+    (bytes(16), bytes(12), b'', b'', b'',
+     bytes.fromhex("58e2fccefa7e3061367f1d57a4e7455a")),
+    (bytes(16), bytes(12), bytes(16), b'',
+     bytes.fromhex("0388dace60b6a392f328c2b971b2fe78"),
+     bytes.fromhex("ab6e47d42cec13bdf53a67b21257bddf")),
+    (bytes.fromhex(_GCM_KEY), bytes.fromhex("cafebabefacedbaddecaf888"),
+     bytes.fromhex(_GCM_PLAINTEXT), b'',
+     bytes.fromhex(_GCM_CIPHERTEXT),
+     bytes.fromhex("4d5c2af327cd64a62cf35abd2ba6fab4")),
+    (bytes.fromhex(_GCM_KEY), bytes.fromhex("cafebabefacedbaddecaf888"),
+     bytes.fromhex(_GCM_PLAINTEXT[:120]), bytes.fromhex("feedfacedeadbeeffeedfacedeadbeefabaddad2"),
+     bytes.fromhex(_GCM_CIPHERTEXT[:120]),
+     bytes.fromhex("5bc94fbc3221a5db94fae95ae7121a47")),
+]
 
 def run_test_vectors():
     """
-    Run some standard test vectors for AES-128 to verify implementation.
-    """
-    print("Running AES-128 test vectors...")
-    
-    test_vectors = [
-        # (key, plaintext, expected_ciphertext)
-        (
-            bytes.fromhex("000102030405060708090a0b0c0d0e0f"), 
-            bytes.fromhex("00112233445566778899aabbccddeeff"), 
-            bytes.fromhex("69c4e0d86a7b0430d8cdb78070b4c55a")
-        ),
-        (
-            bytes.fromhex("2b7e151628aed2a6abf7158809cf4f3c"), 
-            bytes.fromhex("6bc1bee22e409f96e93d7e117393172a"), 
-            bytes.fromhex("3ad77bb40d7a3660a89ecaf32466ef97")
-        ),
-        # Add more test vectors as needed
-    ]
+    Run some standard test vectors for AES-128/192/256 to verify implementation.
+    """
+    print("Running AES test vectors...")
     
-    for i, (key, plaintext, expected_ciphertext) in enumerate(test_vectors):
+    for i, (key, plaintext, expected_ciphertext) in enumerate(TEST_VECTORS):
         print(f"\nTest Vector {i+1}:")
         print(f"Key:       {bytes_to_hex(key)}")
         print(f"Plaintext: {bytes_to_hex(plaintext)}")
@@ -41,6 +76,629 @@ def run_test_vectors():
         decrypted = decrypt(ciphertext, key)
         print(f"Decrypted: {bytes_to_hex(decrypted)}")
         print(f"Decryption {'PASSED' if decrypted == plaintext else 'FAILED'}")
+        
+        # The step-by-step key schedule must match the flat word schedule
+        from aes_core import generate_round_keys
+        from aes_key import expand_key
+        ok = generate_round_keys(key) == expand_key(key).round_key_matrices()
+        print(f"Key schedule ({len(generate_round_keys(key)) - 1} rounds) {'PASSED' if ok else 'FAILED'}")
+
+def test_tracing():
+    """
+    Check the round tracers on the FIPS-197 C.1 vector: the recorder holds
+    every step and ends on the ciphertext, print_trace/PrintTracer print
+    it, and verbose=True prints and returns the table engine's result.
+    """
+    print("\nTesting round tracers...")
+    
+    import contextlib
+    import io
+    from aes_trace import TraceRecorder, PrintTracer, print_trace
+    
+    key, plaintext, expected_ciphertext = TEST_VECTORS[0]
+    trace = TraceRecorder()
+    ciphertext = encrypt(plaintext, key, tracer=trace)
+    # Initial AddRoundKey, 4 steps in rounds 1-9, 3 in round 10 (no MixColumns)
+    last = trace[-1]
+    ok = (len(trace) == 1 + 4 * 9 + 3 and trace.rounds == 10 and ciphertext == expected_ciphertext and
+          (last.round, last.operation, last.after) == (10, "AddRoundKey", expected_ciphertext) and
+          trace[0].before == plaintext)
+    print(f"TraceRecorder steps {'PASSED' if ok else 'FAILED'}")
+    
+    outputs = []
+    for run in (lambda: print_trace(trace),
+                lambda: encrypt(plaintext, key, tracer=PrintTracer()),
+                lambda: encrypt(plaintext, key, verbose=True)):
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            result = run()
+        outputs.append(out.getvalue())
+        ok = result is None or result == encrypt(plaintext, key, engine="table")
+        print(f"Trace printing {len(outputs)} {'PASSED' if ok and '(Ciphertext)' in out.getvalue() else 'FAILED'}")
+    ok = outputs[0] == outputs[1] == outputs[2]
+    print(f"Trace printing matches verbose {'PASSED' if ok else 'FAILED'}")
+
+def test_key_cache():
+    """
+    Check the LRU key cache: repeated gets are hits, and with a full cache
+    the least recently used key is the one evicted.
+    """
+    print("\nTesting key cache...")
+    
+    from aes_key import KeyCache
+    
+    expanded = []
+    
+    def factory(key):
+        expanded.append(key)
+        return ("expanded", key)
+    
+    a, b, c = bytes(16), bytes([1]) * 16, bytes([2]) * 16
+    cache = KeyCache(maxsize=2, factory=factory)
+    cache.get(a)
+    cache.get(b)
+    ok = cache.get(a) == ("expanded", a)    # hit: a is now the most recently used
+    cache.get(c)                            # evicts b, not a
+    ok = ok and cache.info() == {"hits": 1, "misses": 3, "evictions": 1, "size": 2, "maxsize": 2}
+    cache.get(a)                            # still cached
+    cache.get(b)                            # expanded again, evicts c
+    ok = ok and expanded == [a, b, c, b] and cache.info()["hits"] == 2 and cache.info()["evictions"] == 2
+    print(f"Key cache LRU {'PASSED' if ok else 'FAILED'}")
+
+def test_batch_engine():
+    """
+    Check that the NumPy batch engine is bit-identical to aes_core.encrypt.
+    """
+    print("\nTesting NumPy batch engine...")
+    
+    try:
+        from aes_batch import encrypt_blocks, decrypt_blocks
+    except ImportError:
+        print("Batch engine test SKIPPED (NumPy not installed)")
+        return
+    
+    for i, (key, plaintext, expected_ciphertext) in enumerate(TEST_VECTORS):
+        # Repeat the vector so the engine sees a real batch
+        data = plaintext * 64
+        ciphertext = encrypt_blocks(data, key)
+        expected = encrypt(plaintext, key) * 64
+        print(f"Test Vector {i+1} batch encryption {'PASSED' if ciphertext == expected and ciphertext[:16] == expected_ciphertext else 'FAILED'}")
+        print(f"Test Vector {i+1} batch decryption {'PASSED' if decrypt_blocks(ciphertext, key) == data else 'FAILED'}")
+    
+    # Multi-key batch: one key per block, repeated keys included
+    from aes_batch import encrypt_many, decrypt_many
+    keys = [key for key, _, _ in TEST_VECTORS] * 8
+    data = b''.join(plaintext for _, plaintext, _ in TEST_VECTORS) * 8
+    ciphertext = encrypt_many(keys, data)
+    expected = b''.join(encrypt(data[16*i:16*i + 16], k) for i, k in enumerate(keys))
+    print(f"Multi-key batch encryption {'PASSED' if ciphertext == expected else 'FAILED'}")
+    print(f"Multi-key batch decryption {'PASSED' if decrypt_many(keys, ciphertext) == data else 'FAILED'}")
+
+def test_bitslice_engine():
+    """
+    Check the bitsliced engine: its S-box circuit against aes_constants, the
+    circuit-based key schedule, the test vectors, and wide batches (AES-128
+    and AES-256, several passes, a block count that is not a multiple of 8)
+    against the T-table engine.
+    """
+    print("\nTesting bitsliced engine...")
+    
+    import os
+    import aes_bitslice
+    from aes_constants import sbox, inv_sbox
+    from aes_key import expand_key
+    
+    # All 256 byte values as 256 lanes of one byte position
+    ones = (1 << 256) - 1
+    planes = [sum(((v >> b) & 1) << v for v in range(256)) for b in range(8)]
+    def values(out):
+        return bytes(sum(((out[b] >> v) & 1) << b for b in range(8)) for v in range(256))
+    ok = values(aes_bitslice.sub_byte(planes, ones)) == bytes(sbox) and \
+        values(aes_bitslice.inv_sub_byte(planes, ones)) == bytes(inv_sbox)
+    print(f"Bitsliced S-box {'PASSED' if ok else 'FAILED'}")
+    
+    ok = all(aes_bitslice.key_schedule(key) == expand_key(key).ek_bytes
+             for key in (os.urandom(16), os.urandom(24), os.urandom(32)))
+    print(f"Bitsliced key schedule {'PASSED' if ok else 'FAILED'}")
+    
+    for i, (key, plaintext, expected_ciphertext) in enumerate(TEST_VECTORS):
+        ciphertext = encrypt(plaintext, key, engine="bitslice")
+        print(f"Test Vector {i+1} bitslice encryption {'PASSED' if ciphertext == expected_ciphertext else 'FAILED'}")
+        print(f"Test Vector {i+1} bitslice decryption {'PASSED' if decrypt(ciphertext, key, engine='bitslice') == plaintext else 'FAILED'}")
+    
+    data = os.urandom(16 * 1003)
+    ok = True
+    for key in (TEST_VECTORS[0][0], os.urandom(32)):
+        ciphertext = aes_bitslice.encrypt_blocks(data, key, chunk_blocks=256)
+        ok = ok and ciphertext == aes_modes.encrypt(data, key, "ECB", padding=False) and \
+            aes_bitslice.decrypt_blocks(ciphertext, key) == data
+    print(f"Bitsliced batch {'PASSED' if ok else 'FAILED'}")
+
+def test_parallel():
+    """
+    Check that the process-parallel paths in aes_parallel are byte-identical
+    to the serial aes_modes output, with one worker and with several, for
+    empty input, exactly one chunk and input spread over several chunks
+    (not block-aligned where the mode allows it).
+    """
+    print("\nTesting parallel engine...")
+    
+    import io
+    import os
+    import aes_parallel
+    from concurrent.futures import ProcessPoolExecutor
+    
+    key, iv = os.urandom(16), os.urandom(16)
+    chunk_size = 64
+    aligned = [b'', os.urandom(chunk_size), os.urandom(5 * chunk_size)]
+    unaligned = aligned + [os.urandom(5 * chunk_size + 7)]
+    
+    def stream(fn, data, *args):
+        dst = io.BytesIO()
+        written = fn(io.BytesIO(data), dst, key, *args, chunk_size=chunk_size, executor=executor)
+        return dst.getvalue() if written == len(dst.getvalue()) else None
+    
+    with ProcessPoolExecutor(max_workers=2) as pool:
+        for workers, executor in ((1, None), (2, pool)):
+            run = dict(workers=workers, chunk_size=chunk_size, executor=executor)
+            ok = all(aes_parallel.ecb_encrypt(d, key, **run) == aes_modes.encrypt(d, key, "ECB", padding=False) and
+                     aes_parallel.ecb_decrypt(d, key, **run) == aes_modes.decrypt(d, key, "ECB", padding=False) and
+                     aes_parallel.cbc_decrypt(d, key, iv, **run) == aes_modes.decrypt(d, key, "CBC", iv, padding=False)
+                     for d in aligned)
+            ok = ok and all(aes_parallel.ctr_crypt(d, key, iv, **run) == aes_modes.encrypt(d, key, "CTR", iv)
+                            for d in unaligned)
+            print(f"Parallel blocks (workers={workers}) {'PASSED' if ok else 'FAILED'}")
+            
+            ok = True
+            for data in unaligned:
+                for mode in aes_parallel.PARALLEL_DECRYPT_MODES:
+                    mode_iv = None if mode == "ECB" else iv
+                    ciphertext = aes_modes.encrypt(data, key, mode, mode_iv)
+                    if mode in aes_parallel.PARALLEL_MODES:
+                        ok = ok and stream(aes_parallel.encrypt_stream, data, mode, mode_iv, workers) == ciphertext
+                    ok = ok and stream(aes_parallel.decrypt_stream, ciphertext, mode, mode_iv, workers) == data
+            print(f"Parallel streams (workers={workers}) {'PASSED' if ok else 'FAILED'}")
+            
+            # Truncated ciphertext fails as in aes_modes.Decryptor, not as bad padding
+            errors = []
+            for mode in ("ECB", "CBC"):
+                mode_iv = None if mode == "ECB" else iv
+                ciphertext = aes_modes.encrypt(unaligned[-1], key, mode, mode_iv)
+                for truncated in (ciphertext[:7], ciphertext[:-9]):
+                    try:
+                        stream(aes_parallel.decrypt_stream, truncated, mode, mode_iv, workers)
+                    except ValueError as e:
+                        errors.append(str(e))
+            ok = errors == ["Ciphertext length is not a multiple of 16 bytes"] * 4
+            print(f"Parallel truncated ciphertext (workers={workers}) {'PASSED' if ok else 'FAILED'}")
+    
+    # Without an executor a pool is started for the call
+    data = unaligned[-1]
+    ok = aes_parallel.ctr_crypt(data, key, iv, 2, chunk_size) == aes_modes.encrypt(data, key, "CTR", iv)
+    print(f"Parallel own pool {'PASSED' if ok else 'FAILED'}")
+
+def test_cli():
+    """
+    Round-trip files through the command line (aes.main) for every mode:
+    with --iv-hex, with the random IV stored as a prefix, with
+    --no-padding and with --workers, and check that --workers < 1 is
+    rejected.
+    """
+    print("\nTesting command line...")
+    
+    import contextlib
+    import io
+    import os
+    import tempfile
+    import aes
+    
+    key = os.urandom(16)
+    iv = os.urandom(16)
+    data = os.urandom(1000)
+    aligned = data[:992]
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        def path(name):
+            return os.path.join(tmp, name)
+        
+        def run(command, mode, src, *extra):
+            with open(path("in"), "wb") as f:
+                f.write(src)
+            status = aes.main([command, "--mode", mode, "--key-hex", key.hex(),
+                               "-i", path("in"), "-o", path("out"), "--chunk-size", "256", *extra])
+            with open(path("out"), "rb") as f:
+                return f.read() if status == 0 else None
+        
+        for mode in aes_modes.MODES:
+            ok = True
+            if mode != "ECB":
+                # Explicit IV: bare ciphertext, identical to aes_modes
+                out = run("encrypt", mode, data, "--iv-hex", iv.hex())
+                ok = out == aes_modes.encrypt(data, key, mode, iv)
+                ok = ok and run("decrypt", mode, out, "--iv-hex", iv.hex()) == data
+            # Random IV written as the first 16 bytes of the output
+            out = run("encrypt", mode, data)
+            mode_iv = None if mode == "ECB" else out[:16]
+            body = out if mode == "ECB" else out[16:]
+            ok = ok and body == aes_modes.encrypt(data, key, mode, mode_iv)
+            ok = ok and run("decrypt", mode, out) == data
+            # No padding: block-aligned input, same length out
+            out = run("encrypt", mode, aligned, "--no-padding")
+            ok = ok and len(out) == len(aligned) + (0 if mode == "ECB" else 16)
+            ok = ok and run("decrypt", mode, out, "--no-padding") == aligned
+            # Parallel workers give the same bytes as the serial path
+            if mode != "ECB":
+                serial = run("encrypt", mode, data, "--iv-hex", iv.hex())
+                ok = ok and run("encrypt", mode, data, "--iv-hex", iv.hex(), "--workers", "2") == serial
+                ok = ok and run("decrypt", mode, serial, "--iv-hex", iv.hex(), "--workers", "2") == data
+            else:
+                serial = run("encrypt", mode, data)
+                ok = ok and run("encrypt", mode, data, "--workers", "2") == serial
+                ok = ok and run("decrypt", mode, serial, "--workers", "2") == data
+            print(f"CLI {mode} round-trip {'PASSED' if ok else 'FAILED'}")
+        
+        # CTR never pads, so --no-padding must not send --workers to the serial path
+        import aes_parallel
+        calls = []
+        stream = aes_parallel.encrypt_stream
+        aes_parallel.encrypt_stream = lambda *args: calls.append(args[3]) or stream(*args)
+        try:
+            out = run("encrypt", "CTR", data, "--iv-hex", iv.hex(), "--no-padding", "--workers", "2")
+        finally:
+            aes_parallel.encrypt_stream = stream
+        ok = calls == ["CTR"] and out == aes_modes.encrypt(data, key, "CTR", iv)
+        print(f"CLI parallel CTR with --no-padding {'PASSED' if ok else 'FAILED'}")
+    
+    rejected = True
+    for workers in ("0", "-1"):
+        try:
+            with contextlib.redirect_stderr(io.StringIO()):
+                aes.main(["encrypt", "--key-hex", key.hex(), "--workers", workers])
+            rejected = False
+        except SystemExit as e:
+            rejected = rejected and e.code == 2
+    print(f"CLI --workers validation {'PASSED' if rejected else 'FAILED'}")
+
+def test_mmap_files():
+    """
+    Round-trip files through aes_mmap for every mode (an empty file, a file
+    that is not block-aligned, one large enough for the batch engine), and
+    check in-place ctr_crypt_file against aes_modes CTR.
+    """
+    print("\nTesting memory-mapped file encryption...")
+    
+    import os
+    import tempfile
+    import aes_mmap
+    
+    key, iv = os.urandom(16), os.urandom(16)
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        plain, cipher, back = (os.path.join(tmp, name) for name in ("plain", "cipher", "back"))
+        
+        def read(path):
+            with open(path, "rb") as f:
+                return f.read()
+        
+        for size in (0, 1000, 70003):
+            data = os.urandom(size)
+            with open(plain, "wb") as f:
+                f.write(data)
+            ok = True
+            for mode in aes_modes.MODES:
+                mode_iv = None if mode == "ECB" else iv
+                expected = aes_modes.encrypt(data, key, mode, mode_iv)
+                n = aes_mmap.encrypt_file(plain, cipher, key, mode, mode_iv, chunk_size=4096)
+                ok = ok and n == len(expected) and read(cipher) == expected
+                n = aes_mmap.decrypt_file(cipher, back, key, mode, mode_iv, chunk_size=4096)
+                ok = ok and n == size and read(back) == data
+            
+            # In place: CTR twice gives the original back
+            n = aes_mmap.ctr_crypt_file(plain, key, iv, chunk_size=4096)
+            ok = ok and n == size and read(plain) == aes_modes.encrypt(data, key, "CTR", iv)
+            aes_mmap.ctr_crypt_file(plain, key, iv, chunk_size=4096)
+            ok = ok and read(plain) == data
+            print(f"Memory-mapped files ({size} bytes) {'PASSED' if ok else 'FAILED'}")
+
+def test_gcm():
+    """
+    Run the GCM specification test vectors, check that a tampered tag is
+    rejected, and compare streaming against one-shot GCM on a large input.
+    """
+    print("\nTesting AES-GCM...")
+    
+    import os
+    import aes_gcm
+    
+    for i, (key, iv, plaintext, aad, expected_ciphertext, expected_tag) in enumerate(GCM_TEST_VECTORS):
+        ciphertext, tag = aes_gcm.encrypt(plaintext, key, iv, aad)
+        ok = ciphertext == expected_ciphertext and tag == expected_tag
+        print(f"GCM Test Case {i+1} encryption {'PASSED' if ok else 'FAILED'}")
+        ok = aes_gcm.decrypt(ciphertext, key, iv, tag, aad) == plaintext
+        try:
+            aes_gcm.decrypt(ciphertext, key, iv, bytes(16), aad)
+            ok = False
+        except aes_gcm.InvalidTag:
+            pass
+        print(f"GCM Test Case {i+1} decryption {'PASSED' if ok else 'FAILED'}")
+    
+    # Large enough for the NumPy GHASH lanes, fed in odd-sized pieces
+    key, iv = GCM_TEST_VECTORS[2][0], GCM_TEST_VECTORS[2][1]
+    data = os.urandom(100003)
+    ciphertext, tag = aes_gcm.encrypt(data, key, iv, b'header')
+    cipher = aes_gcm.GCMEncryptor(key, iv)
+    cipher.update_aad(b'head')
+    cipher.update_aad(b'er')
+    streamed = b''.join(cipher.update(data[i:i + 4099]) for i in range(0, len(data), 4099))
+    cipher.finalize()
+    print(f"GCM streaming {'PASSED' if streamed == ciphertext and cipher.tag == tag else 'FAILED'}")
+    
+    # A random IV only from the incremental API, where it can be read back
+    try:
+        aes_gcm.encrypt(data, key, None)
+        ok = False
+    except ValueError:
+        cipher = aes_gcm.GCMEncryptor(key)
+        ciphertext = cipher.update(data)
+        cipher.finalize()
+        ok = aes_gcm.decrypt(ciphertext, key, cipher.iv, cipher.tag) == data
+    print(f"GCM random IV {'PASSED' if ok else 'FAILED'}")
+
+def test_cmac():
+    """
+    Run the RFC 4493 AES-CMAC test vectors and compare the batch API with
+    cmac() on messages of mixed lengths.
+    """
+    print("\nTesting AES-CMAC...")
+    
+    import os
+    import aes_cmac
+    
+    key = bytes.fromhex("2b7e151628aed2a6abf7158809cf4f3c")
+    message = bytes.fromhex("6bc1bee22e409f96e93d7e117393172aae2d8a571e03ac9c9eb76fac45af8e51"
+                            "30c81c46a35ce411e5fbc1191a0a52eff69f2445df4f9b17ad2b417be66c3710")
+    expected = {
+        0: "bb1d6929e95937287fa37d129b756746",
+        16: "070a16b46b4d4144f79bdd9dd04a287c",
+        40: "dfa66747de9ae63030ca32611497c827",
+        64: "51f0bebf7e3b9d92fc49741779363cfe",
+    }
+    subkeys = aes_cmac.cmac_key(key)
+    ok = subkeys.k1_bytes == bytes.fromhex("fbeed618357133667c85e08f7236a8de") and \
+        subkeys.k2_bytes == bytes.fromhex("f7ddac306ae266ccf90bc11ee46d513b")
+    print(f"CMAC subkeys {'PASSED' if ok else 'FAILED'}")
+    for length, tag in expected.items():
+        ok = aes_cmac.cmac(message[:length], key).hex() == tag
+        print(f"CMAC {length}-byte message {'PASSED' if ok else 'FAILED'}")
+    
+    messages = [message[:length] for length in expected] + [os.urandom(i % 50) for i in range(200)]
+    ok = aes_cmac.cmac_many(messages, key) == [aes_cmac.cmac(m, key) for m in messages]
+    print(f"CMAC batch {'PASSED' if ok else 'FAILED'}")
+
+def test_xts():
+    """
+    Run IEEE 1619 XTS-AES-128 test vectors, check ciphertext stealing by
+    round trip and the multi-sector batch path against single sectors.
+    """
+    print("\nTesting XTS-AES...")
+    
+    import os
+    import aes_xts
+    
+    vectors = [
+        # (key, sector, plaintext, ciphertext)
+        (bytes(32), 0, bytes(32),
+         "917cf69ebd68b2ec9b9fe9a3eadda692cd43d2f59598ed858c02c2652fbf922e"),
+        (b'\x11' * 16 + b'\x22' * 16, 0x3333333333, b'\x44' * 32,
+         "c454185e6a16936e39334038acef838bfb186fff7480adc4289382ecd6d394f0"),
+    ]
+    for i, (key, sector, plaintext, expected) in enumerate(vectors):
+        xts = aes_xts.XTSKey(key)
+        ciphertext = xts.encrypt_sector(sector, plaintext)
+        ok = ciphertext.hex() == expected and xts.decrypt_sector(sector, ciphertext) == plaintext
+        print(f"XTS Vector {i+1} {'PASSED' if ok else 'FAILED'}")
+    
+    xts = aes_xts.XTSKey(os.urandom(32))
+    ok = all(xts.decrypt_sector(5, xts.encrypt_sector(5, data)) == data
+             for data in (os.urandom(n) for n in (17, 31, 100, 513)))
+    print(f"XTS ciphertext stealing {'PASSED' if ok else 'FAILED'}")
+    
+    data = os.urandom(512 * 40)
+    ciphertext = xts.encrypt_sectors(100, data)
+    ok = ciphertext == b''.join(xts.encrypt_sector(100 + i, data[512 * i:512 * (i + 1)]) for i in range(40)) and \
+        xts.decrypt_sectors(100, ciphertext) == data
+    print(f"XTS sector batch {'PASSED' if ok else 'FAILED'}")
+
+def test_keystream():
+    """
+    Check the buffered CTR keystream against aes_modes CTR, read in pieces
+    and after seeks forward and backward.
+    """
+    print("\nTesting precomputed CTR keystream...")
+    
+    import os
+    from aes_keystream import CTRKeystream
+    
+    key, iv = os.urandom(16), os.urandom(16)
+    data = os.urandom(300007)
+    expected = aes_modes.encrypt(data, key, "CTR", iv)
+    with CTRKeystream(key, iv, buffer_size=1 << 17) as keystream:
+        ok = b''.join(keystream.xor(data[i:i + 9999]) for i in range(0, len(data), 9999)) == expected
+        for offset in (123456, 7, 299000):
+            keystream.seek(offset)
+            ok = ok and keystream.xor(data[offset:offset + 1000]) == expected[offset:offset + 1000]
+    print(f"Keystream {'PASSED' if ok else 'FAILED'}")
+
+def test_async_streams():
+    """
+    Send several encrypted streams at once over loopback sockets with the
+    asyncio wrappers and check what the server decrypts.
+    """
+    print("\nTesting asyncio streams over loopback...")
+    
+    import asyncio
+    import os
+    import aes_async
+    
+    key = os.urandom(16)
+    payloads = [os.urandom(50000 + 999 * i) for i in range(4)]
+    received = {}
+    
+    async def handle(reader, writer):
+        index = (await reader.readexactly(1))[0]
+        mode = aes_modes.MODES[index % 3]
+        received[index] = await aes_async.DecryptingReader(reader, key, mode).read()
+        writer.close()
+    
+    async def send(index, port):
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(bytes([index]))
+        stream = aes_async.EncryptingWriter(writer, key, aes_modes.MODES[index % 3])
+        for i in range(0, len(payloads[index]), 8192):
+            await stream.write(payloads[index][i:i + 8192])
+        await stream.finish()
+        # Wait for the server to finish reading and close the connection
+        await reader.read()
+        await stream.close()
+    
+    async def run():
+        server = await asyncio.start_server(handle, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        await asyncio.gather(*(send(i, port) for i in range(len(payloads))))
+        server.close()
+        await server.wait_closed()
+    
+    asyncio.run(run())
+    ok = all(received.get(i) == payload for i, payload in enumerate(payloads))
+    print(f"Async streams {'PASSED' if ok else 'FAILED'}")
+
+def test_profiling():
+    """
+    Check the profiling hooks: counters for a reference-engine block and a
+    CBC stream, and the original functions restored afterwards.
+    """
+    print("\nTesting profiling hooks...")
+    
+    import io
+    import aes_core
+    import aes_profiling
+    
+    key, plaintext, expected_ciphertext = TEST_VECTORS[0]
+    original = aes_core.mix_columns_flat
+    with aes_profiling.profiling(aes_profiling.Profiler()) as profiler:
+        ok = encrypt(plaintext, key, engine="reference") == expected_ciphertext
+        dst = io.BytesIO()
+        aes_modes.encrypt_stream(io.BytesIO(bytes(1000)), dst, key, "CBC", bytes(16), chunk_size=256)
+    stats = profiler.as_dict()
+    ok = ok and stats["stages"]["mix_columns"]["calls"] == 9 and stats["stages"]["sub_bytes"]["calls"] == 10
+    ok = ok and stats["bytes_in"]["encrypt"] == 1000 and stats["bytes_out"]["encrypt"] == len(dst.getvalue()) == 1008
+    ok = ok and stats["stages"]["io_read"]["calls"] == 5
+    ok = ok and 'aes_stage_calls_total{stage="pad"} 1' in profiler.to_prometheus()
+    ok = ok and aes_core.mix_columns_flat is original and not aes_profiling.is_enabled()
+    print(f"Profiling {'PASSED' if ok else 'FAILED'}")
+
+def test_lazy_imports():
+    """
+    Check that the cipher, the modes, the CLI and main import without
+    NumPy, matplotlib, the bitsliced engine or multiprocessing, and that
+    aes_precomputed matches freshly built tables.
+    """
+    print("\nTesting import footprint...")
+    
+    import os
+    import subprocess
+    import sys
+    import aes_gf
+    import aes_tables
+    
+    heavy = ("numpy", "matplotlib", "aes_batch", "aes_bitslice", "multiprocessing")
+    code = ("import sys, aes_core, aes_modes, aes, main, aes_visualization\n"
+            f"print(','.join(m for m in {heavy!r} if m in sys.modules))")
+    loaded = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True,
+                            cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    print(f"Lazy imports {'PASSED' if not loaded else 'FAILED (loaded ' + loaded + ')'}")
+    
+    ok = all(getattr(aes_tables, name, None) == table or getattr(aes_gf, name, None) == table
+             for name, table in aes_tables.precomputed_tables().items())
+    print(f"Precomputed tables {'PASSED' if ok else 'FAILED'}")
+
+def test_visualization_export():
+    """
+    Export a traced encryption offscreen as PNG and SVG frames and as an
+    animated GIF, and check the number of frames written.
+    """
+    print("\nTesting visualization export...")
+    
+    try:
+        import matplotlib
+        from PIL import Image
+    except ImportError:
+        print("Visualization export test SKIPPED (matplotlib/Pillow not installed)")
+        return
+    
+    import os
+    import tempfile
+    import aes_visualization
+    from aes_trace import TraceRecorder
+    
+    key, plaintext, expected_ciphertext = TEST_VECTORS[0]
+    trace = TraceRecorder()
+    encrypt(plaintext, key, tracer=trace)
+    frames = len(trace) + 1
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        for fmt in ("png", "svg"):
+            paths = aes_visualization.export_trace(trace, os.path.join(tmp, fmt), fmt, workers=1)
+            ok = len(paths) == frames and all(os.path.getsize(p) > 0 for p in paths)
+            print(f"{fmt.upper()} frames {'PASSED' if ok else 'FAILED'}")
+        
+        path = aes_visualization.generate_encryption_animation(plaintext, key, expected_ciphertext,
+                                                               os.path.join(tmp, "trace.gif"))
+        with Image.open(path) as gif:
+            n_frames = gif.n_frames
+        print(f"GIF animation {'PASSED' if n_frames == frames else 'FAILED'}")
+        
+        try:
+            aes_visualization.export_gif([], [], os.path.join(tmp, "empty.gif"))
+            ok = False
+        except ValueError:
+            ok = not os.path.exists(os.path.join(tmp, "empty.gif"))
+        print(f"Empty GIF rejected {'PASSED' if ok else 'FAILED'}")
+
+def test_avalanche():
+    """
+    Check that the per-round batch snapshots (aes_batch.encrypt_rounds)
+    match the states a TraceRecorder takes after every AddRoundKey, and
+    that a small avalanche run shows the expected diffusion.
+    """
+    print("\nTesting avalanche analysis...")
+    
+    try:
+        import aes_analysis
+        import aes_batch
+    except ImportError:
+        print("Avalanche test SKIPPED (NumPy not installed)")
+        return
+    
+    from aes_key import expand_key
+    from aes_trace import TraceRecorder
+    
+    for i, (key, plaintext, expected_ciphertext) in enumerate(TEST_VECTORS):
+        trace = TraceRecorder()
+        encrypt(plaintext, key, tracer=trace)
+        expected = [step.after for step in trace if step.operation == "AddRoundKey"]
+        round_keys = aes_batch.round_key_array(expand_key(key).ek_bytes)
+        snapshots = [state.tobytes() for state in aes_batch.encrypt_rounds(aes_batch.as_blocks(plaintext), round_keys)]
+        print(f"Round snapshots {i+1} {'PASSED' if snapshots == expected else 'FAILED'}")
+    
+    report = aes_analysis.avalanche(256, seed=1, workers=1)
+    ok = (report.distance_counts[0, 1] == 256 * 128 and report.full_diffusion_round() == 2 and
+          abs(report.mean_distance()[-1] - 64) < 1 and report.satisfies_sac())
+    print(f"Plaintext avalanche {'PASSED' if ok else 'FAILED'}")
+    
+    report = aes_analysis.avalanche(64, "key", 32, seed=1, workers=1)
+    ok = report.flip_counts.shape == (15, 256, 128) and abs(report.mean_distance()[-1] - 64) < 2
+    print(f"Key avalanche {'PASSED' if ok else 'FAILED'}")
 
 def test_round_trip():
     """
@@ -59,31 +717,44 @@ def test_round_trip():
         print(f"\nTest Case {i+1}:")
         print(f"Original: {plaintext}")
         
-        # Pad plaintext if needed
-        if len(plaintext) % 16 != 0:
-            padding_length = 16 - (len(plaintext) % 16)
-            padded_plaintext = plaintext + bytes([padding_length]) * padding_length
-        else:
-            padded_plaintext = plaintext
-        
-        print(f"Padded:   {bytes_to_hex(padded_plaintext)}")
-        
-        # Encrypt
-        ciphertext = encrypt(padded_plaintext, key)
-        print(f"Encrypted: {bytes_to_hex(ciphertext)}")
-        
-        # Decrypt
-        decrypted = decrypt(ciphertext, key)
-        print(f"Decrypted: {bytes_to_hex(decrypted)}")
+        # PKCS#7 padding, applied by the modes layer
+        print(f"Padded:   {bytes_to_hex(aes_modes.pad(plaintext))}")
         
-        # Verify
-        if decrypted == padded_plaintext:
-            print("Round-trip test PASSED")
-        else:
-            print("Round-trip test FAILED")
-            print(f"Original: {bytes_to_hex(padded_plaintext)}")
-            print(f"Result:   {bytes_to_hex(decrypted)}")
+        for mode in aes_modes.MODES:
+            iv = None if mode == "ECB" else bytes(range(16))
+            
+            # Encrypt
+            ciphertext = aes_modes.encrypt(plaintext, key, mode, iv)
+            print(f"{mode} Encrypted: {bytes_to_hex(ciphertext)}")
+            
+            # Decrypt
+            decrypted = aes_modes.decrypt(ciphertext, key, mode, iv)
+            print(f"{mode} Decrypted: {bytes_to_hex(decrypted)}")
+            
+            # Verify
+            if decrypted == plaintext:
+                print(f"{mode} round-trip test PASSED")
+            else:
+                print(f"{mode} round-trip test FAILED")
+                print(f"Original: {bytes_to_hex(plaintext)}")
+                print(f"Result:   {bytes_to_hex(decrypted)}")
 
 if __name__ == "__main__":
     run_test_vectors()
+    test_tracing()
+    test_key_cache()
+    test_batch_engine()
+    test_bitslice_engine()
+    test_parallel()
+    test_cli()
+    test_mmap_files()
+    test_gcm()
+    test_cmac()
+    test_xts()
+    test_keystream()
+    test_async_streams()
+    test_profiling()
+    test_lazy_imports()
+    test_visualization_export()
+    test_avalanche()
     test_round_trip()
\ No newline at end of file
@@ -0,0 +1,302 @@
+#!/usr/bin/env python3
+# AES-128 Encryption/Decryption Implementation
+# Galois/Counter Mode (GCM) authenticated encryption file
+
+import hmac
+import os
+
+from aes_key import AESKey, KeyCache, expand_key
+from aes_modes import ctr_keystream, xor_bytes, batch_engine
+
+IV_SIZE = 12
+TAG_SIZE = 16
+# Reduction constant of GF(2^128) in GCM's reflected bit order
+R = 0xE1 << 120
+# Interleaved accumulators of the NumPy GHASH path, and the smallest number
+# of blocks for which it is used instead of the per-block tables
+GHASH_LANES = 256
+GHASH_LANES_MIN_BLOCKS = 8 * GHASH_LANES
+
+class InvalidTag(ValueError):
+    """Raised when a GCM authentication tag does not match."""
+
+def _mul_tables(h):
+    """
+    8-bit multiplication tables for h: tables[i][b] is h times the block
+    whose only non-zero byte is b at position i, so any block X gives
+    X*h = tables[0][x0] ^ ... ^ tables[15][x15].
+    """
+    # powers[j] = h * x^j; multiplying by x shifts toward the low int bits
+    powers = []
+    for _ in range(128):
+        powers.append(h)
+        h = (h >> 1) ^ R if h & 1 else h >> 1
+    tables = []
+    for i in range(16):
+        table = [0] * 256
+        for k in range(8):
+            table[1 << k] = powers[8 * i + 7 - k]
+        for b in range(3, 256):
+            low = b & -b
+            if b != low:
+                table[b] = table[b ^ low] ^ table[low]
+        tables.append(table)
+    return tables
+
+class GCMKey:
+    """
+    An AES key together with its GHASH subkey H = E(K, 0^128) and the
+    multiplication tables for H, built once per key.
+    """
+    __slots__ = ("aes_key", "h", "tables", "_lane_table")
+
+    def __init__(self, key):
+        self.aes_key = expand_key(key)
+        self.h = int.from_bytes(self.aes_key.encrypt_block(bytes(16)), 'big')
+        self.tables = _mul_tables(self.h)
+        self._lane_table = None
+
+    def _ghash_tables(self, y, data):
+        t0, t1, t2, t3, t4, t5, t6, t7, t8, t9, t10, t11, t12, t13, t14, t15 = self.tables
+        for i in range(0, len(data), 16):
+            b = (y ^ int.from_bytes(data[i:i + 16], 'big')).to_bytes(16, 'big')
+            y = (t0[b[0]] ^ t1[b[1]] ^ t2[b[2]] ^ t3[b[3]] ^ t4[b[4]] ^ t5[b[5]] ^ t6[b[6]] ^ t7[b[7]] ^
+                 t8[b[8]] ^ t9[b[9]] ^ t10[b[10]] ^ t11[b[11]] ^ t12[b[12]] ^ t13[b[13]] ^ t14[b[14]] ^ t15[b[15]])
+        return y
+
+    def lane_table(self):
+        """Byte table of H^GHASH_LANES for aes_batch.ghash_lanes, built on first use."""
+        if self._lane_table is None:
+            g = self._ghash_tables(self.h, bytes(16 * (GHASH_LANES - 1)))
+            self._lane_table = b''.join(v.to_bytes(16, 'big') for table in _mul_tables(g) for v in table)
+        return self._lane_table
+
+    def ghash(self, y, data):
+        """
+        Continue GHASH from y over data (whole 16-byte blocks). Large inputs
+        are folded into interleaved lanes with NumPy, so the per-block
+        Python work only touches GHASH_LANES blocks per call.
+        """
+        blocks = len(data) // 16
+        # Without NumPy GHASH runs on the per-block tables only
+        aes_batch = batch_engine() if blocks >= GHASH_LANES_MIN_BLOCKS else None
+        if aes_batch is not None:
+            data = memoryview(data)
+            split = 16 * (blocks - blocks % GHASH_LANES)
+            lanes = aes_batch.ghash_lanes(y.to_bytes(16, 'big'), data[:split], GHASH_LANES, self.lane_table())
+            y = self._ghash_tables(0, lanes)
+            data = data[split:]
+        return self._ghash_tables(y, data)
+
+    def __repr__(self):
+        return f"GCMKey({self.aes_key!r})"
+
+# GHASH tables cached per key, like the key schedules in aes_key.key_cache
+gcm_key_cache = KeyCache(maxsize=64, factory=GCMKey)
+
+def gcm_key(key):
+    """Return the GCMKey for raw key bytes, an AESKey or a GCMKey."""
+    if isinstance(key, GCMKey):
+        return key
+    if isinstance(key, AESKey):
+        key = key.key
+    return gcm_key_cache.get(key)
+
+class _GHash:
+    """Incremental GHASH that buffers partial blocks between updates."""
+
+    def __init__(self, key):
+        self.key = key
+        self.y = 0
+        self._buffer = b''
+
+    def update(self, data):
+        if self._buffer:
+            need = 16 - len(self._buffer)
+            self._buffer += bytes(data[:need])
+            data = data[need:]
+            if len(self._buffer) < 16:
+                return
+            self.y = self.key.ghash(self.y, self._buffer)
+            self._buffer = b''
+        usable = len(data) - len(data) % 16
+        if usable:
+            self.y = self.key.ghash(self.y, data[:usable])
+        self._buffer = bytes(data[usable:])
+
+    def pad(self):
+        """Zero-pad the buffered partial block, ending the current section."""
+        if self._buffer:
+            self.y = self.key.ghash(self.y, self._buffer + bytes(16 - len(self._buffer)))
+            self._buffer = b''
+
+def _initial_counter(key, iv):
+    if len(iv) == IV_SIZE:
+        return int.from_bytes(iv, 'big') << 32 | 1
+    if not iv:
+        raise ValueError("IV must not be empty")
+    ghash = _GHash(key)
+    ghash.update(iv)
+    ghash.pad()
+    ghash.update((len(iv) * 8).to_bytes(16, 'big'))
+    return ghash.y
+
+class _GCMCipher:
+    """
+    Common state of GCMEncryptor and GCMDecryptor: AAD goes through
+    update_aad() before the first update(); update() returns the output
+    available so far.
+    """
+
+    def __init__(self, key, iv, tag_length):
+        if not 4 <= tag_length <= 16:
+            raise ValueError(f"Tag length must be between 4 and 16 bytes, got {tag_length}")
+        self.key = gcm_key(key)
+        self.iv = bytes(iv)
+        self.tag_length = tag_length
+        j0 = _initial_counter(self.key, self.iv)
+        self._tag_mask = self.key.aes_key.encrypt_block(j0.to_bytes(16, 'big'))
+        self._counter = (j0 & ~0xFFFFFFFF) | ((j0 + 1) & 0xFFFFFFFF)
+        self._keystream = b''
+        self._ghash = _GHash(self.key)
+        self._aad_length = 0
+        self._text_length = 0
+        self._in_aad = True
+        self._finalized = False
+
+    def update_aad(self, data):
+        """Authenticate additional data that is not encrypted."""
+        self._check_open()
+        if not self._in_aad:
+            raise ValueError("update_aad() must be called before update()")
+        self._ghash.update(data)
+        self._aad_length += len(data)
+
+    def _check_open(self):
+        if self._finalized:
+            raise ValueError("finalize() has already been called")
+
+    def _end_aad(self):
+        if self._in_aad:
+            self._ghash.pad()
+            self._in_aad = False
+
+    def _keystream_blocks(self, count):
+        # inc32: only the low 32 bits of the counter block are incremented
+        counter = self._counter
+        low = counter & 0xFFFFFFFF
+        first = min(count, (1 << 32) - low)
+        keystream = ctr_keystream(self.key.aes_key, counter, first)
+        if count > first:
+            keystream += ctr_keystream(self.key.aes_key, counter - low, count - first)
+        self._counter = (counter - low) | ((low + count) & 0xFFFFFFFF)
+        return keystream
+
+    def _ctr(self, data):
+        out = []
+        if self._keystream:
+            n = min(len(self._keystream), len(data))
+            out.append(xor_bytes(data[:n], self._keystream[:n]))
+            self._keystream = self._keystream[n:]
+            data = data[n:]
+        if data:
+            keystream = self._keystream_blocks((len(data) + 15) // 16)
+            out.append(xor_bytes(data, keystream[:len(data)]))
+            self._keystream = keystream[len(data):]
+        return b''.join(out)
+
+    def _compute_tag(self):
+        self._ghash.pad()
+        self._ghash.update((self._aad_length * 8).to_bytes(8, 'big') + (self._text_length * 8).to_bytes(8, 'big'))
+        return xor_bytes(self._ghash.y.to_bytes(16, 'big'), self._tag_mask)[:self.tag_length]
+
+class GCMEncryptor(_GCMCipher):
+    """
+    Incremental GCM encryption. If iv is None a random 12-byte IV is
+    generated; read it back from .iv. The tag is available as .tag after
+    finalize().
+    """
+
+    def __init__(self, key, iv=None, tag_length=TAG_SIZE):
+        if iv is None:
+            iv = os.urandom(IV_SIZE)
+        super().__init__(key, iv, tag_length)
+        self.tag = None
+
+    def update(self, data):
+        """Encrypt data and return the ciphertext."""
+        self._check_open()
+        self._end_aad()
+        out = self._ctr(data)
+        self._ghash.update(out)
+        self._text_length += len(data)
+        return out
+
+    def finalize(self):
+        """Finish the message and compute .tag. Returns b'' (GCM has no padding)."""
+        self._check_open()
+        self._end_aad()
+        self._finalized = True
+        self.tag = self._compute_tag()
+        return b''
+
+class GCMDecryptor(_GCMCipher):
+    """
+    Incremental GCM decryption. update() returns plaintext before the tag
+    has been checked: it must not be used until finalize() has returned
+    without raising InvalidTag. decrypt() only returns verified plaintext.
+    """
+
+    def __init__(self, key, iv, tag=None, tag_length=None):
+        if tag is not None and tag_length is None:
+            tag_length = len(tag)
+        super().__init__(key, iv, TAG_SIZE if tag_length is None else tag_length)
+        self.tag = tag
+
+    def update(self, data):
+        """Decrypt data and return the (not yet authenticated) plaintext."""
+        self._check_open()
+        self._end_aad()
+        self._ghash.update(data)
+        self._text_length += len(data)
+        return self._ctr(data)
+
+    def finalize(self, tag=None):
+        """
+        Check the tag (given here or to the constructor) in constant time.
+        Raises InvalidTag if it does not match. Returns b''.
+        """
+        self._check_open()
+        tag = self.tag if tag is None else tag
+        if tag is None:
+            raise ValueError("No tag to verify")
+        self._end_aad()
+        self._finalized = True
+        if not hmac.compare_digest(self._compute_tag(), bytes(tag)):
+            raise InvalidTag("GCM authentication tag does not match")
+        return b''
+
+def encrypt(data, key, iv, aad=b'', tag_length=TAG_SIZE):
+    """
+    Encrypt and authenticate a whole message. Returns (ciphertext, tag).
+    iv is required: the caller needs it to decrypt. Use GCMEncryptor (and
+    its .iv) to have a random IV generated.
+    """
+    if iv is None:
+        raise ValueError("GCM encrypt() requires an IV; use GCMEncryptor for a random one")
+    cipher = GCMEncryptor(key, iv, tag_length)
+    cipher.update_aad(aad)
+    ciphertext = cipher.update(data)
+    cipher.finalize()
+    return ciphertext, cipher.tag
+
+def decrypt(ciphertext, key, iv, tag, aad=b''):
+    """
+    Verify and decrypt a whole message. Raises InvalidTag, without
+    returning any plaintext, if the tag does not match.
+    """
+    cipher = GCMDecryptor(key, iv, tag)
+    cipher.update_aad(aad)
+    plaintext = cipher.update(ciphertext)
+    cipher.finalize()
+    return plaintext
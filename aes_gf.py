@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+# AES-128 Encryption/Decryption Implementation
+# GF(2^8) arithmetic tables file
+
+# Tables are loaded from aes_precomputed (written by `python aes_tables.py`)
+# or, if it is missing, built once at import time
+
+def xtime(a):
+    """Multiply a byte by x ({02}) modulo x^8 + x^4 + x^3 + x + 1."""
+    a <<= 1
+    if a & 0x100:
+        a ^= 0x11B
+    return a
+
+def _build_log_tables():
+    # {03} generates the multiplicative group of GF(2^8)
+    exp = [0] * 510
+    log = [0] * 256
+    x = 1
+    for i in range(255):
+        exp[i] = x
+        log[x] = i
+        x ^= xtime(x)
+    # Doubled so exp[log[a] + log[b]] needs no modulo
+    exp[255:510] = exp[0:255]
+    return exp, log
+
+try:
+    from aes_precomputed import EXP, LOG
+except ImportError:  # not generated, build the tables here
+    EXP, LOG = _build_log_tables()
+
+def gf_mul(a, b):
+    """Multiply two bytes in GF(2^8) using the log/antilog tables."""
+    if a == 0 or b == 0:
+        return 0
+    return EXP[LOG[a] + LOG[b]]
+
+def gf_inverse(a):
+    """Multiplicative inverse in GF(2^8); 0 maps to 0 as in the S-box."""
+    if a == 0:
+        return 0
+    return EXP[255 - LOG[a]]
+
+def _mul_table(c):
+    return bytes(gf_mul(c, x) for x in range(256))
+
+# Multiplication by the MixColumns / InvMixColumns coefficients
+try:
+    from aes_precomputed import MUL2, MUL3, MUL9, MUL11, MUL13, MUL14
+except ImportError:  # not generated, build the tables here
+    MUL2 = _mul_table(0x02)
+    MUL3 = _mul_table(0x03)
+    MUL9 = _mul_table(0x09)
+    MUL11 = _mul_table(0x0B)
+    MUL13 = _mul_table(0x0D)
+    MUL14 = _mul_table(0x0E)
+
+_mul_tables = {0x02: MUL2, 0x03: MUL3, 0x09: MUL9, 0x0B: MUL11, 0x0D: MUL13, 0x0E: MUL14}
+
+def mul_table(c):
+    """Return the 256-byte table of x -> c*x, building it on first use."""
+    table = _mul_tables.get(c)
+    if table is None:
+        table = _mul_tables[c] = _mul_table(c)
+    return table
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+# AES-128 Encryption/Decryption Implementation
+# Expanded key and key-schedule cache file
+
+import threading
+
+from aes_tables import KEY_ROUNDS, expand_key_words, decryption_key_words, encrypt_block, decrypt_block
+
+class AESKey:
+    """
+    An AES key (16, 24 or 32 bytes: AES-128/192/256) expanded once into
+    flat 32-bit word schedules. ek holds the Nr+1 round keys (4*(Nr+1)
+    words, Nr = 10, 12 or 14) used for encryption, dk the schedule of the
+    equivalent inverse cipher used for decryption.
+    ek_bytes and dk_bytes hold the same schedules as flat 16*(Nr+1)-byte
+    strings, round key r at bytes 16*r .. 16*r+15 in block byte order.
+    """
+    __slots__ = ("key", "ek", "dk", "ek_bytes", "dk_bytes")
+
+    def __init__(self, key):
+        key = bytes(key)
+        if len(key) not in KEY_ROUNDS:
+            raise ValueError(f"AES key must be 16, 24 or 32 bytes, got {len(key)}")
+        self.key = key
+        self.ek = tuple(expand_key_words(key))
+        self.dk = tuple(decryption_key_words(self.ek))
+        self.ek_bytes = b''.join(w.to_bytes(4, 'big') for w in self.ek)
+        self.dk_bytes = b''.join(w.to_bytes(4, 'big') for w in self.dk)
+
+    @property
+    def rounds(self):
+        return len(self.ek) // 4 - 1
+
+    def round_key_matrices(self):
+        """
+        Return the round keys as 4x4 matrices, in the same form as
+        aes_core.generate_round_keys().
+        """
+        matrices = []
+        for r in range(self.rounds + 1):
+            words = self.ek[4*r:4*r + 4]
+            matrices.append([[(w >> (24 - 8*i)) & 0xFF for w in words] for i in range(4)])
+        return matrices
+
+    def encrypt_block(self, block):
+        """Encrypt one 16-byte block."""
+        return encrypt_block(block, self.ek)
+
+    def decrypt_block(self, block):
+        """Decrypt one 16-byte block."""
+        return decrypt_block(block, self.dk)
+
+    def __repr__(self):
+        return f"AESKey(<{len(self.key) * 8}-bit>)"
+
+class KeyCache:
+    """
+    Bounded LRU cache of per-key objects keyed on the raw key bytes:
+    factory(key) is called on a miss (AESKey by default).
+    Thread-safe; keeps hit/miss/eviction counters.
+    """
+
+    def __init__(self, maxsize=256, factory=AESKey):
+        if maxsize < 1:
+            raise ValueError("maxsize must be at least 1")
+        self.maxsize = maxsize
+        self.factory = factory
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # Insertion-ordered: least recently used first
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Return the expanded key for key, expanding it on a miss."""
+        key = bytes(key)
+        with self._lock:
+            aes_key = self._entries.pop(key, None)
+            if aes_key is not None:
+                # Re-insert to mark it most recently used
+                self._entries[key] = aes_key
+                self.hits += 1
+                return aes_key
+            self.misses += 1
+
+        # Expand outside the lock; a concurrent miss on the same key is harmless
+        aes_key = self.factory(key)
+
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = aes_key
+            while len(self._entries) > self.maxsize:
+                del self._entries[next(iter(self._entries))]
+                self.evictions += 1
+        return aes_key
+
+    def info(self):
+        """Return the cache counters as a dict."""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+            }
+
+    def clear(self):
+        """Drop all cached keys and reset the counters."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+# Process-wide cache used by expand_key()
+key_cache = KeyCache()
+
+def expand_key(key):
+    """
+    Return an AESKey for key. AESKey objects are returned unchanged, raw key
+    bytes go through the shared LRU cache.
+    """
+    if isinstance(key, AESKey):
+        return key
+    return key_cache.get(key)
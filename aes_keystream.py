@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+# AES-128 Encryption/Decryption Implementation
+# Precomputed CTR keystream file
+
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from aes_key import expand_key
+from aes_modes import BLOCK_SIZE, COUNTER_MASK, ctr_keystream, xor_bytes, batch_engine
+
+# Keystream is generated in segments of this many bytes...
+DEFAULT_SEGMENT_SIZE = 1 << 16
+# ...and kept up to this many bytes ahead of the read position
+DEFAULT_BUFFER_SIZE = 1 << 20
+
+def _segment_task(aes_key, counter, blocks):
+    # Top-level so it can also run in a worker process
+    return ctr_keystream(aes_key, counter, blocks)
+
+class CTRKeystream:
+    """
+    CTR keystream for one key and initial counter block iv (the same
+    keystream as aes_modes CTR), generated ahead of demand. Segments are
+    computed on an executor, a single background thread by default (pass
+    a ProcessPoolExecutor to use worker processes), and a window of
+    buffer_size bytes is kept in flight ahead of the read position, so
+    read()/xor() usually only slice and XOR ready keystream.
+    seek() moves to any byte offset; segments that are no longer needed
+    are cancelled. Not safe for concurrent use from several threads.
+    """
+
+    def __init__(self, key, iv, buffer_size=DEFAULT_BUFFER_SIZE,
+                 segment_size=DEFAULT_SEGMENT_SIZE, executor=None):
+        if len(iv) != BLOCK_SIZE:
+            raise ValueError(f"IV must be 16 bytes, got {len(iv)}")
+        if segment_size <= 0 or segment_size % BLOCK_SIZE != 0:
+            raise ValueError("segment_size must be a positive multiple of 16")
+        self.aes_key = expand_key(key)
+        self.iv = bytes(iv)
+        self.segment_size = segment_size
+        self.depth = max(1, buffer_size // segment_size)
+        self._counter = int.from_bytes(iv, 'big')
+        self._own_executor = executor is None
+        self._executor = executor or ThreadPoolExecutor(max_workers=1, thread_name_prefix="aes-keystream")
+        self._pending = deque()
+        self._index = None
+        self._segment = None
+        self._pos = 0
+        self._closed = False
+        self._fill(0)
+
+    def _submit(self, index):
+        counter = (self._counter + index * (self.segment_size // 16)) & COUNTER_MASK
+        future = self._executor.submit(_segment_task, self.aes_key, counter, self.segment_size // 16)
+        self._pending.append((index, future))
+
+    def _fill(self, index):
+        # Keep segments index .. index + depth - 1 generated or in flight
+        next_index = self._pending[-1][0] + 1 if self._pending else index
+        while next_index < index + self.depth:
+            self._submit(next_index)
+            next_index += 1
+
+    def _cancel_pending(self):
+        while self._pending:
+            self._pending.popleft()[1].cancel()
+
+    def _realign(self, index):
+        # Drop segments behind index; restart after a backward seek
+        while self._pending and self._pending[0][0] < index:
+            self._pending.popleft()[1].cancel()
+        if self._pending and self._pending[0][0] != index:
+            self._cancel_pending()
+        self._fill(index)
+
+    def _get_segment(self, index):
+        if index == self._index:
+            return self._segment
+        self._realign(index)
+        _, future = self._pending.popleft()
+        self._fill(index + 1)
+        self._index = index
+        self._segment = memoryview(future.result())
+        return self._segment
+
+    def read(self, n):
+        """Return the next n bytes of keystream."""
+        if self._closed:
+            raise ValueError("keystream is closed")
+        size = self.segment_size
+        out = []
+        while n > 0:
+            index, offset = divmod(self._pos, size)
+            take = min(n, size - offset)
+            out.append(self._get_segment(index)[offset:offset + take])
+            self._pos += take
+            n -= take
+        return b''.join(out)
+
+    def xor(self, data):
+        """Encrypt or decrypt data with the next len(data) bytes of keystream."""
+        return xor_bytes(data, self.read(len(data)))
+
+    def xor_into(self, buffer):
+        """Like xor(), but in place on a writable buffer (bytearray, memoryview, mmap)."""
+        keystream = self.read(len(buffer))
+        aes_batch = batch_engine()
+        if aes_batch is not None:
+            aes_batch.xor_into(buffer, buffer, keystream)
+        else:
+            buffer[:] = xor_bytes(buffer, keystream)
+        return buffer
+
+    def seek(self, offset):
+        """Move to byte offset of the keystream (random access)."""
+        if offset < 0:
+            raise ValueError("offset must not be negative")
+        self._pos = offset
+        index = offset // self.segment_size
+        if index != self._index:
+            # Start generating around the new position right away
+            self._realign(index)
+
+    def tell(self):
+        """Current byte offset."""
+        return self._pos
+
+    def close(self):
+        """Cancel pending segments and stop the background thread if owned."""
+        if self._closed:
+            return
+        self._closed = True
+        self._cancel_pending()
+        self._segment = None
+        if self._own_executor:
+            self._executor.shutdown(wait=False)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+# AES-128 Encryption/Decryption Implementation
+# Memory-mapped file encryption file
+
+import mmap
+import os
+
+from aes_key import expand_key
+from aes_modes import (BLOCK_SIZE, MODES, DEFAULT_CHUNK_SIZE, BATCH_MIN_BYTES, COUNTER_MASK,
+                       pad, unpad, xor_bytes, ctr_keystream, batch_engine)
+
+# The input file is mapped read-only and the output file is created at its
+# final size and mapped writable; every chunk is then read from and written
+# to memoryview slices of the two maps, so no per-block bytes objects are
+# made on the NumPy path. CTR can also run in place on a single map.
+
+def _xor_into(out, a, b):
+    aes_batch = batch_engine()
+    if aes_batch is not None:
+        aes_batch.xor_into(out, a, b)
+    else:
+        out[:] = xor_bytes(a, b)
+
+def _ecb_into(aes_key, src, dst, encrypting):
+    aes_batch = batch_engine()
+    if aes_batch is not None and len(src) >= BATCH_MIN_BYTES:
+        if encrypting:
+            aes_batch.encrypt_blocks(src, aes_key, out=dst)
+        else:
+            aes_batch.decrypt_blocks(src, aes_key, out=dst)
+        return
+    crypt_block = aes_key.encrypt_block if encrypting else aes_key.decrypt_block
+    for i in range(0, len(src), 16):
+        dst[i:i + 16] = crypt_block(src[i:i + 16])
+
+def _cbc_encrypt_into(aes_key, src, dst, chain):
+    encrypt_block = aes_key.encrypt_block
+    prev = int.from_bytes(chain, 'big')
+    for i in range(0, len(src), 16):
+        block = encrypt_block((int.from_bytes(src[i:i + 16], 'big') ^ prev).to_bytes(16, 'big'))
+        dst[i:i + 16] = block
+        prev = int.from_bytes(block, 'big')
+    return prev.to_bytes(16, 'big')
+
+def _cbc_decrypt_into(aes_key, src, dst, chain):
+    # src and dst must not overlap: the XOR pass reads the ciphertext again
+    _ecb_into(aes_key, src, dst, False)
+    _xor_into(dst[:16], dst[:16], chain)
+    _xor_into(dst[16:], dst[16:], src[:-16])
+    return bytes(src[-16:])
+
+def _ctr_into(aes_key, src, dst, counter):
+    count = (len(src) + 15) // 16
+    keystream = memoryview(ctr_keystream(aes_key, counter, count))
+    _xor_into(dst, src, keystream[:len(src)])
+    return (counter + count) & COUNTER_MASK
+
+def _transform(aes_key, mode, encrypting, src, dst, chain, chunk_size):
+    """
+    Run the cipher from the buffer src into dst (same length; whole blocks
+    except for CTR) one chunk at a time. Returns the chaining value (CBC
+    IV or CTR counter block) to continue with.
+    """
+    counter = int.from_bytes(chain, 'big') if mode == "CTR" else None
+    for start in range(0, len(src), chunk_size):
+        s = src[start:start + chunk_size]
+        d = dst[start:start + chunk_size]
+        if mode == "ECB":
+            _ecb_into(aes_key, s, d, encrypting)
+        elif mode == "CTR":
+            counter = _ctr_into(aes_key, s, d, counter)
+        elif encrypting:
+            chain = _cbc_encrypt_into(aes_key, s, d, chain)
+        else:
+            chain = _cbc_decrypt_into(aes_key, s, d, chain)
+    return counter.to_bytes(16, 'big') if mode == "CTR" else chain
+
+def _check_args(mode, iv, chunk_size):
+    mode = mode.upper()
+    if mode not in MODES:
+        raise ValueError(f"Unknown mode {mode!r}, expected one of {MODES}")
+    if mode != "ECB":
+        if iv is None:
+            raise ValueError(f"{mode} mode requires a 16-byte IV")
+        if len(iv) != BLOCK_SIZE:
+            raise ValueError(f"IV must be 16 bytes, got {len(iv)}")
+        iv = bytes(iv)
+    if chunk_size <= 0 or chunk_size % BLOCK_SIZE != 0:
+        raise ValueError("chunk_size must be a positive multiple of 16")
+    return mode, iv
+
+def _map(f, length, access):
+    # Empty files cannot be mapped
+    if length == 0:
+        return None
+    return mmap.mmap(f.fileno(), length, access=access)
+
+def _same_file(a, b):
+    return os.path.exists(b) and os.path.samefile(a, b)
+
+def _crypt_file(src_path, dst_path, key, mode, iv, padding, chunk_size, encrypting):
+    mode, iv = _check_args(mode, iv, chunk_size)
+    if _same_file(src_path, dst_path):
+        raise ValueError("Input and output are the same file; use ctr_crypt_file() for in-place CTR")
+    aes_key = expand_key(key)
+    padding = (mode != "CTR") if padding is None else padding
+
+    with open(src_path, "rb") as fin:
+        size = os.fstat(fin.fileno()).st_size
+        full = size if mode == "CTR" else size - size % 16
+        if encrypting:
+            if full != size and not padding:
+                raise ValueError("Data length is not a multiple of 16 bytes and padding is disabled")
+            out_size = full + BLOCK_SIZE if padding else size
+        else:
+            if full != size or (padding and size == 0):
+                raise ValueError("Ciphertext length is not a multiple of 16 bytes")
+            out_size = size
+
+        with open(dst_path, "w+b") as fout:
+            fout.truncate(out_size)
+            src_map = _map(fin, size, mmap.ACCESS_READ)
+            dst_map = _map(fout, out_size, mmap.ACCESS_WRITE)
+            try:
+                src = memoryview(src_map if src_map is not None else b'')
+                dst = memoryview(dst_map if dst_map is not None else bytearray())
+                with src, dst:
+                    chain = _transform(aes_key, mode, encrypting, src[:full], dst[:full], iv, chunk_size)
+                    if encrypting and padding:
+                        # The padded tail is the only block that is copied
+                        tail = pad(src[full:])
+                        _transform(aes_key, mode, True, memoryview(tail), dst[full:], chain, chunk_size)
+                    if not encrypting and padding:
+                        # Check the padding on a copy: a view would keep the map exported if it fails
+                        out_size -= BLOCK_SIZE - len(unpad(bytes(dst[size - BLOCK_SIZE:])))
+            finally:
+                if dst_map is not None:
+                    dst_map.flush()
+                    dst_map.close()
+                if src_map is not None:
+                    src_map.close()
+            if out_size != size and not encrypting:
+                fout.truncate(out_size)
+    return out_size
+
+def encrypt_file(src_path, dst_path, key, mode="CBC", iv=None, padding=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Encrypt the file at src_path into dst_path through memory maps of both
+    files. CBC and CTR need an explicit iv, which is not written to the
+    output. Padding defaults as in aes_modes (PKCS#7 for ECB/CBC, none for
+    CTR). Returns the size of the output file.
+    """
+    return _crypt_file(src_path, dst_path, key, mode, iv, padding, chunk_size, True)
+
+def decrypt_file(src_path, dst_path, key, mode="CBC", iv=None, padding=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Decrypt the file at src_path into dst_path through memory maps.
+    The output is truncated to the unpadded length. Returns its size.
+    """
+    return _crypt_file(src_path, dst_path, key, mode, iv, padding, chunk_size, False)
+
+def ctr_crypt_file(path, key, iv, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Encrypt or decrypt the file at path in place in CTR mode: the keystream
+    is XORed straight into a writable map of the file, so the output takes
+    no extra disk space or memory. Returns the file size.
+    """
+    _, iv = _check_args("CTR", iv, chunk_size)
+    aes_key = expand_key(key)
+    with open(path, "r+b") as f:
+        size = os.fstat(f.fileno()).st_size
+        data_map = _map(f, size, mmap.ACCESS_WRITE)
+        if data_map is None:
+            return 0
+        try:
+            with memoryview(data_map) as data:
+                _transform(aes_key, "CTR", True, data, data, iv, chunk_size)
+            data_map.flush()
+        finally:
+            data_map.close()
+    return size
@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+# AES-128 Encryption/Decryption Implementation
+# Block cipher modes of operation file
+
+import os
+
+from aes_key import expand_key
+
+
+BLOCK_SIZE = 16
+MODES = ("ECB", "CBC", "CTR")
+# Bytes read from a file-like object per update() call when streaming
+DEFAULT_CHUNK_SIZE = 1 << 20
+# Below this many bytes the T-table engine beats the NumPy batch engine's
+# fixed per-call overhead (see aes_benchmark)
+BATCH_MIN_BYTES = 128
+
+COUNTER_MASK = (1 << 128) - 1
+
+# aes_batch (and NumPy with it) is imported on the first call that needs it,
+# so importing this module stays cheap; False means not tried yet
+_batch = False
+
+def batch_engine():
+    """
+    Return the aes_batch module, importing it on first use, or None if
+    NumPy is not installed.
+    """
+    global _batch
+    if _batch is False:
+        try:
+            import aes_batch
+        except ImportError:  # NumPy not installed, fall back to the T-table engine
+            aes_batch = None
+        _batch = aes_batch
+    return _batch
+
+def pad(data, block_size=BLOCK_SIZE):
+    """
+    Add PKCS#7 padding. A full block of padding is added when the data is
+    already a multiple of the block size.
+    """
+    padding_length = block_size - len(data) % block_size
+    return bytes(data) + bytes([padding_length]) * padding_length
+
+def unpad(data, block_size=BLOCK_SIZE):
+    """
+    Remove and check PKCS#7 padding. Raises ValueError on invalid padding.
+    """
+    if not data or len(data) % block_size != 0:
+        raise ValueError("Invalid PKCS#7 padding: bad data length")
+    padding_length = data[-1]
+    if not 1 <= padding_length <= block_size or \
+            data[-padding_length:] != bytes([padding_length]) * padding_length:
+        raise ValueError("Invalid PKCS#7 padding")
+    return bytes(data[:-padding_length])
+
+def xor_bytes(a, b):
+    """XOR two equal-length byte strings."""
+    return (int.from_bytes(a, 'big') ^ int.from_bytes(b, 'big')).to_bytes(len(a), 'big')
+
+def counter_blocks(counter, count):
+    """
+    Return count consecutive 16-byte counter blocks starting at the integer
+    counter (incremented as a 128-bit big-endian number, wrapping).
+    """
+    return b''.join(((counter + i) & COUNTER_MASK).to_bytes(16, 'big') for i in range(count))
+
+def ecb_encrypt_blocks(aes_key, data):
+    """Encrypt whole blocks independently."""
+    aes_batch = batch_engine() if len(data) >= BATCH_MIN_BYTES else None
+    if aes_batch is not None:
+        return aes_batch.encrypt_blocks(data, aes_key)
+    encrypt_block = aes_key.encrypt_block
+    return b''.join(encrypt_block(data[i:i + 16]) for i in range(0, len(data), 16))
+
+def ecb_decrypt_blocks(aes_key, data):
+    """Decrypt whole blocks independently."""
+    aes_batch = batch_engine() if len(data) >= BATCH_MIN_BYTES else None
+    if aes_batch is not None:
+        return aes_batch.decrypt_blocks(data, aes_key)
+    decrypt_block = aes_key.decrypt_block
+    return b''.join(decrypt_block(data[i:i + 16]) for i in range(0, len(data), 16))
+
+def cbc_encrypt_blocks(aes_key, data, iv):
+    """
+    CBC-encrypt whole blocks. Returns (ciphertext, last ciphertext block).
+    """
+    encrypt_block = aes_key.encrypt_block
+    prev = int.from_bytes(iv, 'big')
+    out = []
+    for i in range(0, len(data), 16):
+        block = encrypt_block((int.from_bytes(data[i:i + 16], 'big') ^ prev).to_bytes(16, 'big'))
+        out.append(block)
+        prev = int.from_bytes(block, 'big')
+    return b''.join(out), prev.to_bytes(16, 'big')
+
+def cbc_decrypt_blocks(aes_key, data, iv):
+    """
+    CBC-decrypt whole blocks. Returns (plaintext, last ciphertext block).
+    Unlike encryption this is not serial: all blocks go through the inverse
+    cipher in one batch, then the chaining XOR runs as a single pass.
+    """
+    if not data:
+        return b'', bytes(iv)
+    decrypted = ecb_decrypt_blocks(aes_key, data)
+    # Each plaintext block is D(C_i) XOR C_{i-1}
+    previous = bytes(iv) + bytes(data[:-16])
+    return xor_bytes(decrypted, previous), bytes(data[-16:])
+
+def ctr_keystream(aes_key, counter, count):
+    """Return count blocks of CTR keystream starting at the integer counter."""
+    return ecb_encrypt_blocks(aes_key, counter_blocks(counter, count))
+
+class _ModeCipher:
+    """
+    Common incremental interface: feed data with update(), which returns
+    the output available so far, then call finalize() once for the rest.
+    """
+
+    def __init__(self, key, mode, iv, padding):
+        mode = mode.upper()
+        if mode not in MODES:
+            raise ValueError(f"Unknown mode {mode!r}, expected one of {MODES}")
+        if mode != "ECB":
+            if iv is None:
+                raise ValueError(f"{mode} mode requires a 16-byte IV")
+            if len(iv) != BLOCK_SIZE:
+                raise ValueError(f"IV must be 16 bytes, got {len(iv)}")
+            iv = bytes(iv)
+        self.key = expand_key(key)
+        self.mode = mode
+        self.iv = iv
+        # CTR is a stream mode and is never padded by default
+        self.padding = (mode != "CTR") if padding is None else padding
+        self._buffer = b''
+        self._chain = iv
+        self._counter = int.from_bytes(iv, 'big') if mode == "CTR" else None
+        self._keystream = b''
+        self._finalized = False
+
+    def _check_open(self):
+        if self._finalized:
+            raise ValueError("finalize() has already been called")
+
+    def _ctr_update(self, data):
+        out = []
+        if self._keystream:
+            n = min(len(self._keystream), len(data))
+            out.append(xor_bytes(data[:n], self._keystream[:n]))
+            self._keystream = self._keystream[n:]
+            data = data[n:]
+        if data:
+            count = (len(data) + 15) // 16
+            keystream = ctr_keystream(self.key, self._counter, count)
+            self._counter = (self._counter + count) & COUNTER_MASK
+            out.append(xor_bytes(data, keystream[:len(data)]))
+            self._keystream = keystream[len(data):]
+        return b''.join(out)
+
+class Encryptor(_ModeCipher):
+    """
+    Incremental encryption in ECB, CBC or CTR mode. If iv is None for CBC or
+    CTR a random one is generated; read it back from .iv.
+    """
+
+    def __init__(self, key, mode="CBC", iv=None, padding=None):
+        if iv is None and mode.upper() != "ECB":
+            iv = os.urandom(BLOCK_SIZE)
+        super().__init__(key, mode, iv, padding)
+
+    def update(self, data):
+        """Encrypt data and return every complete output block."""
+        self._check_open()
+        if self.mode == "CTR":
+            return self._ctr_update(data)
+        data = self._buffer + bytes(data)
+        usable = len(data) - len(data) % 16
+        self._buffer = data[usable:]
+        return self._process(data[:usable])
+
+    def _process(self, data):
+        if not data:
+            return b''
+        if self.mode == "ECB":
+            return ecb_encrypt_blocks(self.key, data)
+        out, self._chain = cbc_encrypt_blocks(self.key, data, self._chain)
+        return out
+
+    def finalize(self):
+        """Pad and encrypt the buffered tail, if any."""
+        self._check_open()
+        self._finalized = True
+        if self.mode == "CTR":
+            return b''
+        tail = self._buffer
+        self._buffer = b''
+        if self.padding:
+            tail = pad(tail)
+        elif tail:
+            raise ValueError("Data length is not a multiple of 16 bytes and padding is disabled")
+        return self._process(tail)
+
+class Decryptor(_ModeCipher):
+    """
+    Incremental decryption in ECB, CBC or CTR mode. When padding is enabled
+    the last block is held back until finalize() so it can be unpadded.
+    """
+
+    def __init__(self, key, mode="CBC", iv=None, padding=None):
+        super().__init__(key, mode, iv, padding)
+
+    def update(self, data):
+        """Decrypt data and return every output block that is final."""
+        self._check_open()
+        if self.mode == "CTR":
+            return self._ctr_update(data)
+        data = self._buffer + bytes(data)
+        usable = len(data) - len(data) % 16
+        if self.padding and usable == len(data):
+            # Keep the last full block: it may hold the padding
+            usable -= 16
+        usable = max(usable, 0)
+        self._buffer = data[usable:]
+        return self._process(data[:usable])
+
+    def _process(self, data):
+        if not data:
+            return b''
+        if self.mode == "ECB":
+            return ecb_decrypt_blocks(self.key, data)
+        out, self._chain = cbc_decrypt_blocks(self.key, data, self._chain)
+        return out
+
+    def finalize(self):
+        """Decrypt and unpad the held-back tail."""
+        self._check_open()
+        self._finalized = True
+        if self.mode == "CTR":
+            return b''
+        tail = self._buffer
+        self._buffer = b''
+        if len(tail) % 16 != 0:
+            raise ValueError("Ciphertext length is not a multiple of 16 bytes")
+        out = self._process(tail)
+        return unpad(out) if self.padding else out
+
+def encrypt(data, key, mode="CBC", iv=None, padding=None):
+    """Encrypt a whole byte string in one call."""
+    cipher = Encryptor(key, mode, iv, padding)
+    return cipher.update(data) + cipher.finalize()
+
+def decrypt(data, key, mode="CBC", iv=None, padding=None):
+    """Decrypt a whole byte string in one call."""
+    cipher = Decryptor(key, mode, iv, padding)
+    return cipher.update(data) + cipher.finalize()
+
+# Stream I/O goes through these so aes_profiling can time it on its own
+def _read_chunk(src, size):
+    return src.read(size)
+
+def _write_chunk(dst, data):
+    dst.write(data)
+
+def _pump(cipher, src, dst, chunk_size):
+    total = 0
+    while True:
+        chunk = _read_chunk(src, chunk_size)
+        if not chunk:
+            break
+        out = cipher.update(chunk)
+        _write_chunk(dst, out)
+        total += len(out)
+    out = cipher.finalize()
+    _write_chunk(dst, out)
+    return total + len(out)
+
+def encrypt_stream(src, dst, key, mode="CBC", iv=None, padding=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Encrypt everything read from the file-like object src into dst, holding
+    at most one chunk in memory. CBC and CTR need an explicit iv here since
+    it is not written to dst. Returns the number of bytes written.
+    """
+    if iv is None and mode.upper() != "ECB":
+        raise ValueError(f"{mode} mode requires a 16-byte IV")
+    return _pump(Encryptor(key, mode, iv, padding), src, dst, chunk_size)
+
+def decrypt_stream(src, dst, key, mode="CBC", iv=None, padding=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Decrypt everything read from the file-like object src into dst.
+    Returns the number of bytes written.
+    """
+    return _pump(Decryptor(key, mode, iv, padding), src, dst, chunk_size)
@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+# AES-128 Encryption/Decryption Implementation
+# Process-pool parallel engine file
+
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from aes_key import expand_key
+from aes_modes import (BLOCK_SIZE, pad, unpad, xor_bytes, ecb_encrypt_blocks,
+                       ecb_decrypt_blocks, cbc_decrypt_blocks, ctr_keystream, COUNTER_MASK)
+
+# Bytes handed to a worker per task; must be a multiple of 16
+DEFAULT_CHUNK_SIZE = 1 << 20
+PARALLEL_MODES = ("ECB", "CTR")
+# CBC encryption is serial, but every CBC plaintext block only depends on
+# two ciphertext blocks, so decryption parallelizes
+PARALLEL_DECRYPT_MODES = ("ECB", "CBC", "CTR")
+
+# Worker tasks. They only receive picklable arguments: the expanded key,
+# the chunk and, for CTR, the counter of the chunk's first block or, for
+# CBC, the ciphertext block preceding the chunk.
+
+def _ecb_encrypt_task(aes_key, data):
+    return ecb_encrypt_blocks(aes_key, data)
+
+def _ecb_decrypt_task(aes_key, data):
+    return ecb_decrypt_blocks(aes_key, data)
+
+def _cbc_decrypt_task(aes_key, previous, data):
+    return cbc_decrypt_blocks(aes_key, data, previous)[0]
+
+def _ctr_task(aes_key, counter, data):
+    keystream = ctr_keystream(aes_key, counter, (len(data) + 15) // 16)
+    return xor_bytes(data, keystream[:len(data)])
+
+def _check_chunk_size(chunk_size):
+    if chunk_size <= 0 or chunk_size % BLOCK_SIZE != 0:
+        raise ValueError(f"chunk_size must be a positive multiple of 16, got {chunk_size}")
+
+def _split(data, chunk_size):
+    return [data[i:i + chunk_size] for i in range(0, len(data), chunk_size)]
+
+def _read_chunks(src, chunk_size):
+    """Yield chunk_size-byte chunks from src; only the last may be shorter."""
+    while True:
+        chunk = src.read(chunk_size)
+        if not chunk:
+            return
+        # Pipes and sockets may return short reads; top the chunk up
+        while len(chunk) < chunk_size:
+            more = src.read(chunk_size - len(chunk))
+            if not more:
+                break
+            chunk += more
+        yield chunk
+        if len(chunk) < chunk_size:
+            return
+
+def _whole_blocks(chunks):
+    """Pass ciphertext chunks through, failing on one that ends mid-block."""
+    for chunk in chunks:
+        if len(chunk) % BLOCK_SIZE != 0:
+            raise ValueError("Ciphertext length is not a multiple of 16 bytes")
+        yield chunk
+
+def _mark_last(chunks):
+    """Yield (chunk, is_last) pairs; an empty input yields (b'', True)."""
+    previous = None
+    for chunk in chunks:
+        if previous is not None:
+            yield previous, False
+        previous = chunk
+    yield (b'' if previous is None else previous), True
+
+class _Runner:
+    """
+    Runs tasks either inline (one worker) or on a process pool, yielding
+    results in submission order with a bounded number of tasks in flight.
+    """
+
+    def __init__(self, workers=None, executor=None):
+        self.workers = workers or os.cpu_count() or 1
+        self.executor = executor
+        self._owned = None
+
+    def __enter__(self):
+        if self.executor is None and self.workers > 1:
+            self._owned = self.executor = ProcessPoolExecutor(max_workers=self.workers)
+        return self
+
+    def __exit__(self, *exc):
+        if self._owned is not None:
+            self._owned.shutdown()
+            self.executor = self._owned = None
+
+    def map(self, fn, arg_tuples):
+        if self.executor is None:
+            for args in arg_tuples:
+                yield fn(*args)
+            return
+        pending = deque()
+        window = 2 * self.workers
+        for args in arg_tuples:
+            pending.append(self.executor.submit(fn, *args))
+            if len(pending) >= window:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+def ecb_encrypt(data, key, workers=None, chunk_size=DEFAULT_CHUNK_SIZE, executor=None):
+    """
+    Encrypt block-aligned data in ECB mode across worker processes.
+    An existing executor may be passed in to avoid pool start-up per call.
+    """
+    _check_chunk_size(chunk_size)
+    if len(data) % BLOCK_SIZE != 0:
+        raise ValueError("Data length must be a multiple of 16 bytes")
+    aes_key = expand_key(key)
+    with _Runner(workers, executor) as runner:
+        return b''.join(runner.map(_ecb_encrypt_task, ((aes_key, c) for c in _split(data, chunk_size))))
+
+def ecb_decrypt(data, key, workers=None, chunk_size=DEFAULT_CHUNK_SIZE, executor=None):
+    """Decrypt block-aligned data in ECB mode across worker processes."""
+    _check_chunk_size(chunk_size)
+    if len(data) % BLOCK_SIZE != 0:
+        raise ValueError("Data length must be a multiple of 16 bytes")
+    aes_key = expand_key(key)
+    with _Runner(workers, executor) as runner:
+        return b''.join(runner.map(_ecb_decrypt_task, ((aes_key, c) for c in _split(data, chunk_size))))
+
+def cbc_decrypt(data, key, iv, workers=None, chunk_size=DEFAULT_CHUNK_SIZE, executor=None):
+    """
+    Decrypt block-aligned CBC data across worker processes. Each worker runs
+    the inverse cipher on its whole chunk at once and then applies the
+    chaining XOR, seeded with the last ciphertext block of the previous
+    chunk. Padding is left in place.
+    """
+    _check_chunk_size(chunk_size)
+    if len(data) % BLOCK_SIZE != 0:
+        raise ValueError("Data length must be a multiple of 16 bytes")
+    aes_key = expand_key(key)
+    tasks = ((aes_key, bytes(iv) if i == 0 else data[i - BLOCK_SIZE:i], data[i:i + chunk_size])
+             for i in range(0, len(data), chunk_size))
+    with _Runner(workers, executor) as runner:
+        return b''.join(runner.map(_cbc_decrypt_task, tasks))
+
+def ctr_crypt(data, key, iv, workers=None, chunk_size=DEFAULT_CHUNK_SIZE, executor=None):
+    """
+    Encrypt or decrypt data of any length in CTR mode across worker
+    processes. Each chunk gets the counter of its first block.
+    """
+    _check_chunk_size(chunk_size)
+    aes_key = expand_key(key)
+    counter = int.from_bytes(iv, 'big')
+    tasks = ((aes_key, (counter + i // BLOCK_SIZE) & COUNTER_MASK, data[i:i + chunk_size])
+             for i in range(0, len(data), chunk_size))
+    with _Runner(workers, executor) as runner:
+        return b''.join(runner.map(_ctr_task, tasks))
+
+def _crypt_stream(src, dst, key, mode, iv, encrypting, workers, chunk_size, executor):
+    _check_chunk_size(chunk_size)
+    mode = mode.upper()
+    allowed = PARALLEL_MODES if encrypting else PARALLEL_DECRYPT_MODES
+    if mode not in allowed:
+        raise ValueError(f"Mode {mode!r} cannot be parallelized, expected one of {allowed}")
+    if mode != "ECB" and (iv is None or len(iv) != BLOCK_SIZE):
+        raise ValueError(f"{mode} mode requires a 16-byte IV")
+    aes_key = expand_key(key)
+
+    if mode == "CTR":
+        fn = _ctr_task
+
+        def tasks():
+            counter = int.from_bytes(iv, 'big')
+            for chunk in _read_chunks(src, chunk_size):
+                yield aes_key, counter, chunk
+                counter = (counter + len(chunk) // BLOCK_SIZE) & COUNTER_MASK
+    elif encrypting:
+        fn = _ecb_encrypt_task
+
+        def tasks():
+            for chunk, is_last in _mark_last(_read_chunks(src, chunk_size)):
+                yield aes_key, pad(chunk) if is_last else chunk
+    elif mode == "CBC":
+        fn = _cbc_decrypt_task
+
+        def tasks():
+            previous = bytes(iv)
+            for chunk in _whole_blocks(_read_chunks(src, chunk_size)):
+                yield aes_key, previous, chunk
+                previous = chunk[-BLOCK_SIZE:]
+    else:
+        fn = _ecb_decrypt_task
+
+        def tasks():
+            for chunk in _whole_blocks(_read_chunks(src, chunk_size)):
+                yield aes_key, chunk
+
+    # Padded decryption holds back each result so the final one can be unpadded
+    padded = mode != "CTR" and not encrypting
+    total = 0
+    held = None
+    with _Runner(workers, executor) as runner:
+        for out in runner.map(fn, tasks()):
+            if padded:
+                out, held = held, out
+                if out is None:
+                    continue
+            dst.write(out)
+            total += len(out)
+    if padded:
+        out = unpad(held or b'')
+        dst.write(out)
+        total += len(out)
+    return total
+
+def encrypt_stream(src, dst, key, mode="CTR", iv=None, workers=None,
+                   chunk_size=DEFAULT_CHUNK_SIZE, executor=None):
+    """
+    Parallel counterpart of aes_modes.encrypt_stream for ECB (PKCS#7 padded)
+    and CTR. Output is identical to the serial path. Returns bytes written.
+    """
+    return _crypt_stream(src, dst, key, mode, iv, True, workers, chunk_size, executor)
+
+def decrypt_stream(src, dst, key, mode="CTR", iv=None, workers=None,
+                   chunk_size=DEFAULT_CHUNK_SIZE, executor=None):
+    """
+    Parallel counterpart of aes_modes.decrypt_stream for ECB, CBC (both
+    PKCS#7 padded) and CTR. Returns bytes written.
+    """
+    return _crypt_stream(src, dst, key, mode, iv, False, workers, chunk_size, executor)
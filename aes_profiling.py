@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+# AES-128 Encryption/Decryption Implementation
+# Hot-path profiling hooks file
+#
+#   with aes_profiling.profiling() as profiler:
+#       aes_modes.encrypt_stream(src, dst, key, "CTR", iv)
+#   print(profiler.to_prometheus())
+#
+# enable() replaces the hooked functions below with timed variants and
+# disable() puts the originals back, so nothing is checked or counted
+# while profiling is off.
+
+import importlib
+import threading
+import time
+from contextlib import contextmanager
+
+def _one(args):
+    return 1
+
+def _data_blocks(index):
+    """Blocks in the bytes-like argument args[index]."""
+    return lambda args: len(args[index]) // 16
+
+def _count_arg(index):
+    """Block count given directly as args[index]."""
+    return lambda args: args[index]
+
+def _array_blocks(args):
+    return len(args[0])
+
+# (module, attribute, stage, blocks per call). Only calls made through the
+# module attribute are timed: a name imported elsewhere with `from ... import`
+# keeps pointing at the original. Times are inclusive, so an outer stage
+# (a mode) also contains the inner ones (the block cipher) it calls.
+HOOKS = [
+    # Key expansion
+    ("aes_key", "expand_key_words", "key_expansion", None),
+    ("aes_key", "decryption_key_words", "key_expansion_inverse", None),
+    ("aes_core", "generate_round_keys", "generate_round_keys", None),
+    # Reference engine: whole blocks and single transformations
+    ("aes_core", "encrypt_block_flat", "reference/encrypt_block", _one),
+    ("aes_core", "decrypt_block_flat", "reference/decrypt_block", _one),
+    ("aes_core", "decrypt_block_flat_equivalent", "reference/decrypt_block", _one),
+    ("aes_core", "sub_bytes_flat", "sub_bytes", _one),
+    ("aes_core", "shift_rows_flat", "shift_rows", _one),
+    ("aes_core", "mix_columns_flat", "mix_columns", _one),
+    ("aes_core", "add_round_key_flat", "add_round_key", _one),
+    ("aes_core", "sub_bytes", "sub_bytes", _one),
+    ("aes_core", "shift_rows", "shift_rows", _one),
+    ("aes_core", "mix_columns", "mix_columns", _one),
+    ("aes_core", "add_round_key", "add_round_key", _one),
+    # T-table engine (aes_core.encrypt and AESKey.encrypt_block)
+    ("aes_tables", "encrypt_block", "table/encrypt_block", _one),
+    ("aes_tables", "decrypt_block", "table/decrypt_block", _one),
+    ("aes_key", "encrypt_block", "table/encrypt_block", _one),
+    ("aes_key", "decrypt_block", "table/decrypt_block", _one),
+    # Batch engines
+    ("aes_batch", "encrypt_state", "batch/encrypt", _array_blocks),
+    ("aes_batch", "decrypt_state", "batch/decrypt", _array_blocks),
+    ("aes_bitslice", "encrypt_blocks", "bitslice/encrypt", _data_blocks(0)),
+    ("aes_bitslice", "decrypt_blocks", "bitslice/decrypt", _data_blocks(0)),
+    # Modes, padding and stream I/O
+    ("aes_modes", "ecb_encrypt_blocks", "ecb_encrypt", _data_blocks(1)),
+    ("aes_modes", "ecb_decrypt_blocks", "ecb_decrypt", _data_blocks(1)),
+    ("aes_modes", "cbc_encrypt_blocks", "cbc_encrypt", _data_blocks(1)),
+    ("aes_modes", "cbc_decrypt_blocks", "cbc_decrypt", _data_blocks(1)),
+    ("aes_modes", "ctr_keystream", "ctr_keystream", _count_arg(2)),
+    ("aes_modes", "pad", "pad", None),
+    ("aes_modes", "unpad", "unpad", None),
+    ("aes_modes", "_read_chunk", "io_read", None),
+    ("aes_modes", "_write_chunk", "io_write", None),
+]
+
+# (module, class, method, operation): bytes in and out of the incremental
+# ciphers, counted per operation
+BYTE_HOOKS = [
+    ("aes_modes", "Encryptor", "update", "encrypt"),
+    ("aes_modes", "Encryptor", "finalize", "encrypt"),
+    ("aes_modes", "Decryptor", "update", "decrypt"),
+    ("aes_modes", "Decryptor", "finalize", "decrypt"),
+]
+
+class StageStats:
+    """Cumulative counters of one stage."""
+    __slots__ = ("calls", "ns", "blocks")
+
+    def __init__(self):
+        self.calls = 0
+        self.ns = 0
+        self.blocks = 0
+
+class Profiler:
+    """
+    Per-stage cumulative nanosecond timers, call and block counts, and
+    bytes in/out per operation. Thread-safe; filled in by the hooks that
+    enable() installs.
+    """
+
+    def __init__(self):
+        self.stages = {}
+        self.bytes_in = {}
+        self.bytes_out = {}
+        self._lock = threading.Lock()
+
+    def stage(self, name):
+        """Return the StageStats for name, creating it on first use."""
+        with self._lock:
+            stats = self.stages.get(name)
+            if stats is None:
+                stats = self.stages[name] = StageStats()
+            return stats
+
+    def record(self, stats, ns, blocks):
+        with self._lock:
+            stats.calls += 1
+            stats.ns += ns
+            stats.blocks += blocks
+
+    def count_bytes(self, operation, n_in, n_out):
+        with self._lock:
+            self.bytes_in[operation] = self.bytes_in.get(operation, 0) + n_in
+            self.bytes_out[operation] = self.bytes_out.get(operation, 0) + n_out
+
+    def reset(self):
+        """Zero every counter."""
+        with self._lock:
+            for stats in self.stages.values():
+                stats.calls = stats.ns = stats.blocks = 0
+            self.bytes_in.clear()
+            self.bytes_out.clear()
+
+    def as_dict(self):
+        """Return the counters as a dict (stages that never ran are left out)."""
+        with self._lock:
+            return {
+                "stages": {name: {"calls": s.calls, "ns": s.ns, "blocks": s.blocks}
+                           for name, s in sorted(self.stages.items()) if s.calls},
+                "bytes_in": dict(self.bytes_in),
+                "bytes_out": dict(self.bytes_out),
+            }
+
+    def to_prometheus(self, prefix="aes"):
+        """Return the counters in the Prometheus text exposition format."""
+        data = self.as_dict()
+        lines = []
+
+        def family(name, help_text, samples):
+            lines.append(f"# HELP {prefix}_{name} {help_text}")
+            lines.append(f"# TYPE {prefix}_{name} counter")
+            for labels, value in samples:
+                lines.append(f"{prefix}_{name}{{{labels}}} {value}")
+
+        stages = data["stages"]
+        family("stage_seconds_total", "Cumulative time spent in each stage.",
+               [(f'stage="{name}"', s["ns"] / 1e9) for name, s in stages.items()])
+        family("stage_calls_total", "Calls of each stage.",
+               [(f'stage="{name}"', s["calls"]) for name, s in stages.items()])
+        family("stage_blocks_total", "16-byte blocks processed by each stage.",
+               [(f'stage="{name}"', s["blocks"]) for name, s in stages.items()])
+        family("bytes_in_total", "Bytes passed to the incremental ciphers.",
+               [(f'operation="{op}"', n) for op, n in sorted(data["bytes_in"].items())])
+        family("bytes_out_total", "Bytes returned by the incremental ciphers.",
+               [(f'operation="{op}"', n) for op, n in sorted(data["bytes_out"].items())])
+        return "\n".join(lines) + "\n"
+
+def _timed(fn, profiler, stats, blocks):
+    clock = time.perf_counter_ns
+    record = profiler.record
+    if blocks is None:
+        def timed(*args, **kwargs):
+            start = clock()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                record(stats, clock() - start, 0)
+    else:
+        def timed(*args, **kwargs):
+            start = clock()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                record(stats, clock() - start, blocks(args))
+    timed.__wrapped__ = fn
+    timed.__name__ = fn.__name__
+    timed.__doc__ = fn.__doc__
+    return timed
+
+def _counted(method, profiler, stats, operation):
+    clock = time.perf_counter_ns
+
+    def counted(self, *args):
+        start = clock()
+        out = method(self, *args)
+        profiler.record(stats, clock() - start, 0)
+        profiler.count_bytes(operation, len(args[0]) if args else 0, len(out))
+        return out
+    counted.__wrapped__ = method
+    counted.__name__ = method.__name__
+    counted.__doc__ = method.__doc__
+    return counted
+
+# Default profiler, and the (target, attribute, original) triples to restore
+profiler = Profiler()
+_installed = []
+_install_lock = threading.Lock()
+
+def _import(name):
+    try:
+        return importlib.import_module(name)
+    except ImportError:  # e.g. aes_batch without NumPy: nothing to hook
+        return None
+
+def enable(target=None):
+    """
+    Install the profiling hooks, recording into target (the module-level
+    profiler by default). Returns the profiler in use.
+    """
+    target = profiler if target is None else target
+    with _install_lock:
+        if _installed:
+            raise ValueError("profiling is already enabled")
+        for module_name, attr, stage, blocks in HOOKS:
+            module = _import(module_name)
+            if module is None or not hasattr(module, attr):
+                continue
+            original = getattr(module, attr)
+            _installed.append((module, attr, original))
+            setattr(module, attr, _timed(original, target, target.stage(stage), blocks))
+        for module_name, class_name, method_name, operation in BYTE_HOOKS:
+            cls = getattr(_import(module_name), class_name)
+            original = cls.__dict__[method_name]
+            _installed.append((cls, method_name, original))
+            stats = target.stage(f"{class_name}.{method_name}")
+            setattr(cls, method_name, _counted(original, target, stats, operation))
+    return target
+
+def disable():
+    """Remove the profiling hooks and restore the original functions."""
+    with _install_lock:
+        while _installed:
+            owner, attr, original = _installed.pop()
+            setattr(owner, attr, original)
+
+def is_enabled():
+    return bool(_installed)
+
+@contextmanager
+def profiling(target=None):
+    """Context manager: enable() on entry, disable() on exit. Yields the profiler."""
+    target = enable(target)
+    try:
+        yield target
+    finally:
+        disable()
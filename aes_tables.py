@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+# AES-128 Encryption/Decryption Implementation
+# T-table round engine file
+
+from aes_constants import sbox, inv_sbox, rcon
+from aes_gf import mul_table
+
+def _ror8(word):
+    """Rotate a 32-bit word right by one byte."""
+    return ((word >> 8) | (word << 24)) & 0xFFFFFFFF
+
+def _build_tables(box, coeffs):
+    """
+    Build the four 256-entry round tables for one S-box.
+    Entry x of the first table is the MixColumns column produced by a single
+    non-zero byte box[x]; the other three tables are byte rotations of it.
+    """
+    m0, m1, m2, m3 = (mul_table(c) for c in coeffs)
+    t0 = []
+    for x in range(256):
+        s = box[x]
+        t0.append((m0[s] << 24) | (m1[s] << 16) | (m2[s] << 8) | m3[s])
+    t1 = [_ror8(w) for w in t0]
+    t2 = [_ror8(w) for w in t1]
+    t3 = [_ror8(w) for w in t2]
+    return t0, t1, t2, t3
+
+def _build_encryption_tables():
+    # SubBytes + ShiftRows + MixColumns merged into four lookups per column
+    return _build_tables(sbox, (0x02, 0x01, 0x01, 0x03))
+
+def _build_decryption_tables():
+    # InvSubBytes + InvShiftRows + InvMixColumns for the equivalent inverse cipher
+    return _build_tables(inv_sbox, (0x0E, 0x09, 0x0D, 0x0B))
+
+try:
+    from aes_precomputed import Te0, Te1, Te2, Te3, Td0, Td1, Td2, Td3
+except ImportError:  # not generated, build the tables here
+    Te0, Te1, Te2, Te3 = _build_encryption_tables()
+    Td0, Td1, Td2, Td3 = _build_decryption_tables()
+
+# Number of rounds Nr for each key length in bytes (Nk = 4, 6, 8 words)
+KEY_ROUNDS = {16: 10, 24: 12, 32: 14}
+
+def expand_key_words(key):
+    """
+    Expand a 16, 24 or 32-byte key into the 4*(Nr+1) 32-bit words of the
+    encryption schedule (44, 52 or 60 words).
+    Word 4*r + c is column c of round key r, first row in the high byte.
+    """
+    nr = KEY_ROUNDS.get(len(key))
+    if nr is None:
+        raise ValueError(f"AES key must be 16, 24 or 32 bytes, got {len(key)}")
+    nk = len(key) // 4
+    w = [int.from_bytes(key[4*i:4*i + 4], 'big') for i in range(nk)]
+    for i in range(nk, 4 * (nr + 1)):
+        temp = w[i - 1]
+        if i % nk == 0:
+            # RotWord, SubWord and Rcon
+            temp = ((sbox[(temp >> 16) & 0xFF] << 24) |
+                    (sbox[(temp >> 8) & 0xFF] << 16) |
+                    (sbox[temp & 0xFF] << 8) |
+                    sbox[temp >> 24]) ^ (rcon[i // nk - 1] << 24)
+        elif nk > 6 and i % nk == 4:
+            # AES-256 only: SubWord halfway through each 8-word group
+            temp = ((sbox[temp >> 24] << 24) |
+                    (sbox[(temp >> 16) & 0xFF] << 16) |
+                    (sbox[(temp >> 8) & 0xFF] << 8) |
+                    sbox[temp & 0xFF])
+        w.append(w[i - nk] ^ temp)
+    return w
+
+def inv_mix_column_word(word):
+    """Apply InvMixColumns to a single column word."""
+    return (Td0[sbox[word >> 24]] ^ Td1[sbox[(word >> 16) & 0xFF]] ^
+            Td2[sbox[(word >> 8) & 0xFF]] ^ Td3[sbox[word & 0xFF]])
+
+def decryption_key_words(ek):
+    """
+    Build the decryption schedule for the equivalent inverse cipher from the
+    encryption schedule: round keys in reverse order, with InvMixColumns
+    applied to every round key except the first and the last.
+    """
+    nr = len(ek) // 4 - 1
+    dk = list(ek[4*nr:4*nr + 4])
+    for r in range(nr - 1, 0, -1):
+        dk.extend(inv_mix_column_word(w) for w in ek[4*r:4*r + 4])
+    dk.extend(ek[0:4])
+    return dk
+
+def encrypt_block(block, ek):
+    """
+    Encrypt one 16-byte block with an expanded encryption schedule.
+    """
+    nr = len(ek) // 4 - 1
+    s0 = int.from_bytes(block[0:4], 'big') ^ ek[0]
+    s1 = int.from_bytes(block[4:8], 'big') ^ ek[1]
+    s2 = int.from_bytes(block[8:12], 'big') ^ ek[2]
+    s3 = int.from_bytes(block[12:16], 'big') ^ ek[3]
+
+    k = 4
+    for _ in range(nr - 1):
+        t0 = Te0[s0 >> 24] ^ Te1[(s1 >> 16) & 0xFF] ^ Te2[(s2 >> 8) & 0xFF] ^ Te3[s3 & 0xFF] ^ ek[k]
+        t1 = Te0[s1 >> 24] ^ Te1[(s2 >> 16) & 0xFF] ^ Te2[(s3 >> 8) & 0xFF] ^ Te3[s0 & 0xFF] ^ ek[k + 1]
+        t2 = Te0[s2 >> 24] ^ Te1[(s3 >> 16) & 0xFF] ^ Te2[(s0 >> 8) & 0xFF] ^ Te3[s1 & 0xFF] ^ ek[k + 2]
+        t3 = Te0[s3 >> 24] ^ Te1[(s0 >> 16) & 0xFF] ^ Te2[(s1 >> 8) & 0xFF] ^ Te3[s2 & 0xFF] ^ ek[k + 3]
+        s0, s1, s2, s3 = t0, t1, t2, t3
+        k += 4
+
+    # Final round: SubBytes and ShiftRows only
+    t0 = ((sbox[s0 >> 24] << 24) | (sbox[(s1 >> 16) & 0xFF] << 16) |
+          (sbox[(s2 >> 8) & 0xFF] << 8) | sbox[s3 & 0xFF]) ^ ek[k]
+    t1 = ((sbox[s1 >> 24] << 24) | (sbox[(s2 >> 16) & 0xFF] << 16) |
+          (sbox[(s3 >> 8) & 0xFF] << 8) | sbox[s0 & 0xFF]) ^ ek[k + 1]
+    t2 = ((sbox[s2 >> 24] << 24) | (sbox[(s3 >> 16) & 0xFF] << 16) |
+          (sbox[(s0 >> 8) & 0xFF] << 8) | sbox[s1 & 0xFF]) ^ ek[k + 2]
+    t3 = ((sbox[s3 >> 24] << 24) | (sbox[(s0 >> 16) & 0xFF] << 16) |
+          (sbox[(s1 >> 8) & 0xFF] << 8) | sbox[s2 & 0xFF]) ^ ek[k + 3]
+    return ((t0 << 96) | (t1 << 64) | (t2 << 32) | t3).to_bytes(16, 'big')
+
+def decrypt_block(block, dk):
+    """
+    Decrypt one 16-byte block with a decryption schedule from
+    decryption_key_words() (equivalent inverse cipher).
+    """
+    nr = len(dk) // 4 - 1
+    s0 = int.from_bytes(block[0:4], 'big') ^ dk[0]
+    s1 = int.from_bytes(block[4:8], 'big') ^ dk[1]
+    s2 = int.from_bytes(block[8:12], 'big') ^ dk[2]
+    s3 = int.from_bytes(block[12:16], 'big') ^ dk[3]
+
+    k = 4
+    for _ in range(nr - 1):
+        t0 = Td0[s0 >> 24] ^ Td1[(s3 >> 16) & 0xFF] ^ Td2[(s2 >> 8) & 0xFF] ^ Td3[s1 & 0xFF] ^ dk[k]
+        t1 = Td0[s1 >> 24] ^ Td1[(s0 >> 16) & 0xFF] ^ Td2[(s3 >> 8) & 0xFF] ^ Td3[s2 & 0xFF] ^ dk[k + 1]
+        t2 = Td0[s2 >> 24] ^ Td1[(s1 >> 16) & 0xFF] ^ Td2[(s0 >> 8) & 0xFF] ^ Td3[s3 & 0xFF] ^ dk[k + 2]
+        t3 = Td0[s3 >> 24] ^ Td1[(s2 >> 16) & 0xFF] ^ Td2[(s1 >> 8) & 0xFF] ^ Td3[s0 & 0xFF] ^ dk[k + 3]
+        s0, s1, s2, s3 = t0, t1, t2, t3
+        k += 4
+
+    # Final round: InvSubBytes and InvShiftRows only
+    t0 = ((inv_sbox[s0 >> 24] << 24) | (inv_sbox[(s3 >> 16) & 0xFF] << 16) |
+          (inv_sbox[(s2 >> 8) & 0xFF] << 8) | inv_sbox[s1 & 0xFF]) ^ dk[k]
+    t1 = ((inv_sbox[s1 >> 24] << 24) | (inv_sbox[(s0 >> 16) & 0xFF] << 16) |
+          (inv_sbox[(s3 >> 8) & 0xFF] << 8) | inv_sbox[s2 & 0xFF]) ^ dk[k + 1]
+    t2 = ((inv_sbox[s2 >> 24] << 24) | (inv_sbox[(s1 >> 16) & 0xFF] << 16) |
+          (inv_sbox[(s0 >> 8) & 0xFF] << 8) | inv_sbox[s3 & 0xFF]) ^ dk[k + 2]
+    t3 = ((inv_sbox[s3 >> 24] << 24) | (inv_sbox[(s2 >> 16) & 0xFF] << 16) |
+          (inv_sbox[(s1 >> 8) & 0xFF] << 8) | inv_sbox[s0 & 0xFF]) ^ dk[k + 3]
+    return ((t0 << 96) | (t1 << 64) | (t2 << 32) | t3).to_bytes(16, 'big')
+
+def precomputed_tables():
+    """
+    Build every table stored in aes_precomputed from scratch (not from the
+    module itself): name -> list of ints or bytes.
+    """
+    from aes_gf import _build_log_tables, _mul_table
+    exp, log = _build_log_tables()
+    tables = {"EXP": exp, "LOG": log}
+    for c, name in ((0x02, "MUL2"), (0x03, "MUL3"), (0x09, "MUL9"),
+                    (0x0B, "MUL11"), (0x0D, "MUL13"), (0x0E, "MUL14")):
+        tables[name] = _mul_table(c)
+    for prefix, built in (("Te", _build_encryption_tables()), ("Td", _build_decryption_tables())):
+        for i, table in enumerate(built):
+            tables[f"{prefix}{i}"] = table
+    return tables
+
+def write_precomputed(path="aes_precomputed.py"):
+    """Write the tables as literals to path so imports load them instead of building them."""
+    lines = ["#!/usr/bin/env python3",
+             "# AES-128 Encryption/Decryption Implementation",
+             "# Precomputed tables file (generated by `python aes_tables.py`, do not edit)",
+             ""]
+    for name, table in precomputed_tables().items():
+        if isinstance(table, bytes):
+            lines.append(f"{name} = bytes.fromhex(\n    '{table.hex()}')")
+        else:
+            width = 8 if max(table) > 0xFF else 16
+            rows = [", ".join(f"0x{v:08X}" if width == 8 else str(v) for v in table[i:i + width])
+                    for i in range(0, len(table), width)]
+            lines.append(f"{name} = [\n    " + ",\n    ".join(rows) + ",\n]")
+    with open(path, "w") as f:
+        f.write("\n".join(lines) + "\n")
+
+if __name__ == "__main__":
+    write_precomputed()
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+# AES-128 Encryption/Decryption Implementation
+# Round tracing file
+
+from collections import namedtuple
+
+from aes_utils import bytes_to_matrix, display_state, display_round_key
+
+# One recorded transformation; before/after are 16-byte flat states
+TraceStep = namedtuple("TraceStep", ["round", "operation", "before", "after"])
+
+class RoundTracer:
+    """
+    Interface for objects passed as tracer= to aes_core.encrypt/decrypt.
+    begin() is called once with the flat round-key schedule in use and the
+    kind of run ("encrypt", "decrypt" or "equivalent"); record() is called
+    after every transformation with the flat state before and after it.
+    The states are live buffers: copy them if they must outlive the call.
+    """
+
+    def begin(self, round_keys, kind):
+        pass
+
+    def record(self, round_num, operation, before, after):
+        pass
+
+def _round_title(round_num, nr):
+    if round_num == 0:
+        return "\n--- Vòng ban đầu ---"
+    if round_num == nr:
+        return f"\n--- Vòng cuối ({nr}) ---"
+    return f"\n--- Vòng {round_num} ---"
+
+def _print_round_keys(round_keys, kind):
+    keys = [round_keys[i:i + 16] for i in range(0, len(round_keys), 16)]
+    if kind == "equivalent":
+        print("\nCác khóa vòng giải mã (equivalent inverse cipher):")
+        for i, key in enumerate(keys):
+            print(f"\nKhóa vòng {i}:")
+            display_round_key(key)
+        return
+    print("\nKhóa chính:")
+    display_round_key(keys[0])
+    print("\nCác khóa vòng:")
+    for i in range(1, len(keys)):
+        print(f"\nKhóa vòng {i}:")
+        display_round_key(keys[i])
+
+def _print_step(round_num, operation, before, after, nr, kind, last_round):
+    if round_num != last_round:
+        print(_round_title(round_num, nr))
+    print(f"Trước {operation}:")
+    display_state(before)
+    if round_num == nr and operation == "AddRoundKey":
+        result = "Ciphertext" if kind == "encrypt" else "Plaintext"
+        print(f"Sau {operation} ({result}):")
+    else:
+        print(f"Sau {operation}:")
+    display_state(after)
+
+class PrintTracer(RoundTracer):
+    """
+    Prints every transformation as it happens; this is what verbose=True
+    attaches.
+    """
+
+    def begin(self, round_keys, kind):
+        self._nr = len(round_keys) // 16 - 1
+        self._kind = kind
+        self._last_round = None
+        _print_round_keys(round_keys, kind)
+
+    def record(self, round_num, operation, before, after):
+        _print_step(round_num, operation, before, after, self._nr, self._kind, self._last_round)
+        self._last_round = round_num
+
+class TraceRecorder(RoundTracer):
+    """
+    Records every (round, operation, before, after) of one cipher run into
+    a preallocated buffer. A recorder can be reused: begin() resets it.
+    """
+
+    def __init__(self, capacity=64):
+        self.capacity = capacity
+        self.round_keys = None
+        self.kind = None
+        self._count = 0
+        self._states = bytearray(32 * capacity)
+        self._rounds = [0] * capacity
+        self._operations = [None] * capacity
+
+    def begin(self, round_keys, kind):
+        self.round_keys = bytes(round_keys)
+        self.kind = kind
+        self._count = 0
+
+    def record(self, round_num, operation, before, after):
+        i = self._count
+        if i == self.capacity:
+            # Only reached if capacity was set below the number of steps
+            self._states.extend(bytes(32 * self.capacity))
+            self._rounds.extend([0] * self.capacity)
+            self._operations.extend([None] * self.capacity)
+            self.capacity *= 2
+        offset = 32 * i
+        self._states[offset:offset + 16] = before
+        self._states[offset + 16:offset + 32] = after
+        self._rounds[i] = round_num
+        self._operations[i] = operation
+        self._count = i + 1
+
+    @property
+    def rounds(self):
+        return len(self.round_keys) // 16 - 1 if self.round_keys else 0
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += self._count
+        if not 0 <= i < self._count:
+            raise IndexError("trace step out of range")
+        offset = 32 * i
+        return TraceStep(self._rounds[i], self._operations[i],
+                         bytes(self._states[offset:offset + 16]),
+                         bytes(self._states[offset + 16:offset + 32]))
+
+    def __iter__(self):
+        for i in range(self._count):
+            yield self[i]
+
+    def states(self):
+        """Return the state after every step as 4x4 matrices."""
+        return [bytes_to_matrix(step.after) for step in self]
+
+    def operation_names(self):
+        """Return labels such as 'Round 3 MixColumns' for every step."""
+        return [f"Round {step.round} {step.operation}" for step in self]
+
+    def round_key_matrices(self):
+        """Return the recorded round-key schedule as 4x4 matrices."""
+        return [bytes_to_matrix(self.round_keys[i:i + 16]) for i in range(0, len(self.round_keys), 16)]
+
+def print_trace(trace):
+    """
+    Print a recorded trace in the same format as verbose=True, without
+    running the cipher again.
+    """
+    nr = trace.rounds
+    _print_round_keys(trace.round_keys, trace.kind)
+    last_round = None
+    for step in trace:
+        _print_step(step.round, step.operation, step.before, step.after, nr, trace.kind, last_round)
+        last_round = step.round
@@ -2,17 +2,19 @@
 # AES-128 Encryption/Decryption Implementation
 # Utility functions file
 
-def bytes_to_matrix(data):
+def bytes_to_matrix(data, offset=0):
     """
     Chuyển đổi 16 bytes thành ma trận 4x4 theo thứ tự cột.
-    data: 16 bytes
+    data: 16 bytes, hoặc một buffer bất kỳ (bytes, bytearray, memoryview,
+    mmap) mà khối nằm tại data[offset:offset+16]; đọc trực tiếp từ buffer,
+    không tạo bản sao.
     return: ma trận 4x4
     """
     matrix = [[0 for _ in range(4)] for _ in range(4)]
     
     for i in range(4):
         for j in range(4):
-            matrix[i][j] = data[i + 4*j]
+            matrix[i][j] = data[offset + i + 4*j]
     
     return matrix
 
@@ -30,10 +32,36 @@ def matrix_to_bytes(matrix):
     
     return bytes(data)
 
+def as_matrix(state):
+    """
+    Trả về state dưới dạng ma trận 4x4. Chấp nhận cả ma trận lẫn state dạng
+    phẳng (16 bytes/bytearray theo thứ tự cột).
+    """
+    if isinstance(state, (bytes, bytearray, memoryview)):
+        return bytes_to_matrix(state)
+    return state
+
+def matrix_to_state(matrix, state=None, offset=0):
+    """
+    Ghi ma trận 4x4 vào state dạng phẳng (bytearray 16 bytes theo thứ tự
+    cột). Nếu state được truyền vào thì ghi đè tại chỗ, bắt đầu từ
+    state[offset] (state có thể là bytearray, memoryview hoặc mmap).
+    """
+    if state is None:
+        state = bytearray(16)
+    
+    for i in range(4):
+        for j in range(4):
+            state[offset + i + 4*j] = matrix[i][j]
+    
+    return state
+
 def display_state(state):
     """
     Hiển thị ma trận state theo định dạng dễ đọc.
+    state có thể là ma trận 4x4 hoặc state dạng phẳng 16 bytes.
     """
+    state = as_matrix(state)
     print("-" * 29)
     for i in range(4):
         row = " | ".join(f"{state[i][j]:02X}" for j in range(4))
@@ -43,7 +71,10 @@ def display_state(state):
 def display_round_key(key):
     """
     Hiển thị khóa vòng theo định dạng dễ đọc.
+    key có thể là ma trận 4x4 hoặc khóa vòng dạng phẳng 16 bytes.
     """
+    key = as_matrix(key)
+    
     # Hiển thị ma trận
     display_state(key)
     
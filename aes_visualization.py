@@ -2,15 +2,23 @@
 # AES-128 Encryption/Decryption Implementation
 # Visualization helpers
 
-import matplotlib.pyplot as plt
-import numpy as np
-from matplotlib.patches import Rectangle
-from aes_utils import bytes_to_matrix, bytes_to_hex
+import os
+
+from aes_utils import bytes_to_matrix, bytes_to_hex, matrix_to_bytes, as_matrix
+
+def _pyplot():
+    """
+    Import matplotlib.pyplot on first use: matplotlib takes hundreds of
+    milliseconds to import, which callers that never plot should not pay.
+    """
+    import matplotlib.pyplot as plt
+    return plt
 
 def visualize_state_transformation(state_before, state_after, title, operation_name):
     """
     Visualize the transformation of a state matrix from before to after an operation.
     """
+    plt = _pyplot()
     fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(12, 6))
     
     # Create heatmaps for before and after states
@@ -48,6 +56,7 @@ def visualize_round_keys(round_keys):
     num_cols = 3  # Number of columns in the grid
     num_rows = (num_keys + num_cols - 1) // num_cols  # Ceiling division
     
+    plt = _pyplot()
     fig, axes = plt.subplots(num_rows, num_cols, figsize=(15, 5 * num_rows))
     axes = axes.flatten()  # Flatten to make indexing easier
     
@@ -73,13 +82,27 @@ def visualize_round_keys(round_keys):
     plt.tight_layout()
     plt.show()
 
-def visualize_encryption_process(plaintext, key, encrypted_states, operation_names):
+def visualize_encryption_process(plaintext, key, encrypted_states=None, operation_names=None, trace=None):
     """
     Visualize the entire encryption process with all state transformations.
+    The states come from encrypted_states/operation_names if given, else from
+    a recorded trace (aes_trace.TraceRecorder). Without either, the block is
+    encrypted once with a recorder attached.
     """
+    if encrypted_states is None:
+        if trace is None:
+            from aes_core import encrypt
+            from aes_trace import TraceRecorder
+            
+            trace = TraceRecorder()
+            encrypt(plaintext, key, tracer=trace)
+        encrypted_states = trace.states()
+        operation_names = trace.operation_names()
+    
     num_states = len(encrypted_states)
     
     # Create a figure with multiple rows
+    plt = _pyplot()
     fig, axes = plt.subplots(num_states, 1, figsize=(8, 3 * num_states))
     
     # If there's only one state, axes won't be an array
@@ -103,19 +126,287 @@ def visualize_encryption_process(plaintext, key, encrypted_states, operation_nam
     plt.tight_layout()
     plt.show()
 
-def generate_encryption_animation(plaintext, key, ciphertext):
+# Offscreen export: one Agg figure per process, reused for every frame
+
+def _render_cell_color(value):
+    # Dark cells of the 'Blues' map get white labels
+    return "white" if value > 160 else "black"
+
+class StateRenderer:
+    """
+    Offscreen renderer for 4x4 state matrices on the Agg backend (no
+    pyplot, no window, works headless). The figure, the image, a single
+    colorbar and the 16 cell labels are created once; each frame only
+    updates the image data, the label texts and the title. The color scale
+    is fixed at 0-255 so every frame shares the same colorbar.
+    Raster frames are blitted: the static parts (axes, colorbar) are drawn
+    once and only the changing artists are redrawn on top of them.
+    """
+
+    def __init__(self, figsize=(4.8, 4), dpi=100, cmap='Blues'):
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        
+        self.figure = Figure(figsize=figsize, dpi=dpi, layout="constrained")
+        self.canvas = FigureCanvasAgg(self.figure)
+        ax = self.figure.add_subplot()
+        self._image = ax.imshow([[0] * 4 for _ in range(4)], cmap=cmap, vmin=0, vmax=255)
+        ax.set_xticks([])
+        ax.set_yticks([])
+        self.figure.colorbar(self._image, ax=ax, label='Byte Value', fraction=0.046, pad=0.04)
+        self._labels = [[ax.text(c, r, "", ha="center", va="center") for c in range(4)] for r in range(4)]
+        # Placeholder so the layout leaves room for the per-frame titles
+        self._title = ax.set_title("Round 0: AddRoundKey")
+        # The spines go on top of the blitted image again
+        self._dynamic = ([self._image, self._title] + [label for row in self._labels for label in row] +
+                         list(ax.spines.values()))
+        self._set_animated(True)
+        self._background = None
+
+    def _set_animated(self, animated):
+        # Animated artists are left out of a full draw, so they can be blitted
+        for artist in self._dynamic:
+            artist.set_animated(animated)
+
+    def update(self, state, title=""):
+        """Show state (4x4 matrix or 16 bytes) with the given title."""
+        matrix = as_matrix(state)
+        self._image.set_data(matrix)
+        for r in range(4):
+            for c in range(4):
+                label = self._labels[r][c]
+                label.set_text(f"{matrix[r][c]:02X}")
+                label.set_color(_render_cell_color(matrix[r][c]))
+        self._title.set_text(title)
+
+    def save(self, state, path, title="", fmt=None):
+        """Render state to an image file (format from fmt or the extension)."""
+        fmt = (fmt or os.path.splitext(path)[1][1:] or "png").lower()
+        if fmt in ("png", "gif", "jpg", "jpeg", "bmp", "tiff", "webp"):
+            options = {"compress_level": 1} if fmt == "png" else {}
+            self.image(state, title).save(path, format="JPEG" if fmt == "jpg" else fmt.upper(), **options)
+            return path
+        # Vector formats are drawn in full
+        self.update(state, title)
+        self._set_animated(False)
+        try:
+            self.figure.savefig(path, format=fmt)
+        finally:
+            self._set_animated(True)
+        return path
+
+    def image(self, state, title=""):
+        """Render state and return the frame as a PIL image."""
+        from PIL import Image
+        
+        if self._background is None:
+            self.canvas.draw()
+            self._background = self.canvas.copy_from_bbox(self.figure.bbox)
+        self.update(state, title)
+        self.canvas.restore_region(self._background)
+        for artist in self._dynamic:
+            self.figure.draw_artist(artist)
+        return Image.frombuffer("RGBA", self.canvas.get_width_height(), bytes(self.canvas.buffer_rgba()),
+                                "raw", "RGBA", 0, 1).convert("RGB")
+
+# The renderer of this process, created on first use
+_renderer = None
+
+def _get_renderer():
+    global _renderer
+    if _renderer is None:
+        _renderer = StateRenderer()
+    return _renderer
+
+def trace_frames(trace):
+    """
+    States and titles of a recorded trace (aes_trace.TraceRecorder): the
+    input block, then the state after every step, as 16-byte states.
+    """
+    steps = list(trace)
+    if not steps:
+        return [], []
+    states = [steps[0].before] + [step.after for step in steps]
+    titles = ["Input"] + [f"Round {step.round}: {step.operation}" for step in steps]
+    return states, titles
+
+def _render_files(states, titles, paths, fmt):
+    renderer = _get_renderer()
+    for state, title, path in zip(states, titles, paths):
+        renderer.save(state, path, title, fmt)
+    return paths
+
+def _split(items, parts):
+    size = -(-len(items) // parts)
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+def _workers(workers, tasks):
+    workers = workers or os.cpu_count() or 1
+    return min(workers, tasks)
+
+def export_frames(states, titles, directory, fmt="png", prefix="frame", workers=None):
     """
-    Generate an animation showing the encryption process step by step.
-    This is a placeholder - actual animation would require more complex code.
+    Render every state to directory/<prefix>_NNN.<fmt> (png, svg, ...).
+    With more than one worker (default: one per CPU) the frames are split
+    into contiguous runs rendered in separate processes. Returns the paths.
     """
+    os.makedirs(directory, exist_ok=True)
+    states = [matrix_to_bytes(s) if not isinstance(s, (bytes, bytearray)) else bytes(s) for s in states]
+    paths = [os.path.join(directory, f"{prefix}_{i:03d}.{fmt}") for i in range(len(states))]
+    workers = _workers(workers, len(states))
+    if workers <= 1:
+        return _render_files(states, titles, paths, fmt)
+    from concurrent.futures import ProcessPoolExecutor
+    
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        list(executor.map(_render_files, _split(states, workers), _split(list(titles), workers),
+                          _split(paths, workers), [fmt] * workers))
+    return paths
+
+def export_gif(states, titles, path, duration=500, loop=0):
+    """Render the states as the frames of one animated GIF (duration in ms per frame)."""
+    if not states:
+        raise ValueError("Cannot write a GIF without any frames")
+    renderer = _get_renderer()
+    frames = [renderer.image(state, title) for state, title in zip(states, titles)]
+    frames[0].save(path, save_all=True, append_images=frames[1:], duration=duration, loop=loop)
+    return path
+
+def export_trace(trace, path, fmt=None, workers=None, duration=500):
+    """
+    Export a recorded trace: an animated GIF if path ends in .gif (or
+    fmt="gif"), otherwise one PNG/SVG file per step in the directory path.
+    """
+    states, titles = trace_frames(trace)
+    if fmt is None:
+        fmt = "gif" if path.lower().endswith(".gif") else "png"
+    if fmt == "gif":
+        return export_gif(states, titles, path, duration)
+    return export_frames(states, titles, path, fmt, workers=workers)
+
+def _render_block(block, key, target, fmt, duration):
     from aes_core import encrypt
+    from aes_trace import TraceRecorder
+    
+    trace = TraceRecorder()
+    encrypt(block, key, tracer=trace)
+    states, titles = trace_frames(trace)
+    if fmt == "gif":
+        return export_gif(states, titles, target, duration)
+    return _render_files(states, titles, [os.path.join(target, f"frame_{i:03d}.{fmt}") for i in range(len(states))], fmt)
+
+def export_blocks(data, key, directory, fmt="gif", workers=None, duration=500):
+    """
+    Trace the encryption of every 16-byte block of data and render it:
+    directory/block_NNNN.gif per block, or a directory of frames per block
+    for png/svg. Blocks are rendered in parallel processes (default: one
+    per CPU). Returns the GIF paths or the per-block frame directories.
+    """
+    from aes_key import expand_key
+    
+    if len(data) % 16 != 0:
+        raise ValueError(f"Data length must be a multiple of 16 bytes, got {len(data)}")
+    key = expand_key(key).key
+    os.makedirs(directory, exist_ok=True)
+    blocks = [bytes(data[i:i + 16]) for i in range(0, len(data), 16)]
+    targets = []
+    for i in range(len(blocks)):
+        target = os.path.join(directory, f"block_{i:04d}")
+        if fmt == "gif":
+            target += ".gif"
+        else:
+            os.makedirs(target, exist_ok=True)
+        targets.append(target)
+    
+    args = (blocks, [key] * len(blocks), targets, [fmt] * len(blocks), [duration] * len(blocks))
+    workers = _workers(workers, len(blocks))
+    if workers <= 1:
+        list(map(_render_block, *args))
+    else:
+        from concurrent.futures import ProcessPoolExecutor
+        
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            list(executor.map(_render_block, *args))
+    return targets
+
+def generate_encryption_animation(plaintext, key, ciphertext=None, path="aes_encryption.gif", duration=500):
+    """
+    Render the encryption of one block, step by step, as an animated GIF
+    at path (offscreen, see export_trace). If ciphertext is given it must
+    match the result. Returns the path.
+    """
+    from aes_core import encrypt
+    from aes_trace import TraceRecorder
+    
+    trace = TraceRecorder()
+    result = encrypt(plaintext, key, tracer=trace)
+    if ciphertext is not None and result != ciphertext:
+        raise ValueError(f"Ciphertext mismatch: expected {bytes_to_hex(ciphertext)}, got {bytes_to_hex(result)}")
+    return export_trace(trace, path, "gif", duration=duration)
+
+# Diffusion analysis plots (aes_analysis.AvalancheReport)
+
+def _figure(path, figsize):
+    # Offscreen Agg figure when saving to a file, a pyplot window otherwise
+    if path is None:
+        return _pyplot().figure(figsize=figsize, layout="constrained")
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    
+    figure = Figure(figsize=figsize, layout="constrained")
+    FigureCanvasAgg(figure)
+    return figure
+
+def plot_avalanche(report, path=None, rounds=None):
+    """
+    Plot an avalanche report: the bit flip probability matrix after each of
+    rounds (default: 1, 2, 3 and the last), the mean number of flipped bits
+    per round, and the Hamming distance and changed-byte distributions of
+    the ciphertexts against those of random pairs. Saved to path (any
+    matplotlib format) if given, shown in a window otherwise.
+    """
+    from aes_analysis import expected_distance, expected_changed_bytes
+    
+    if rounds is None:
+        rounds = sorted({r for r in (1, 2, 3) if r < report.rounds} | {report.rounds})
+    figure = _figure(path, (3.2 * max(len(rounds), 3), 7))
+    top, bottom = figure.subfigures(2, 1)
+    top.suptitle(f"Avalanche of {report.target} bit flips, AES-{8 * report.key_size}, "
+                 f"{report.samples:,} samples")
+    
+    axes = top.subplots(1, len(rounds), squeeze=False)[0]
+    for ax, r in zip(axes, rounds):
+        image = ax.imshow(report.probabilities(r), cmap='coolwarm', vmin=0, vmax=1,
+                          aspect='auto', interpolation='nearest')
+        ax.set_title(f"Round {r}: max |p-1/2| = {report.sac_deviation(r):.3f}", fontsize=9)
+        ax.set_xlabel("Output bit")
+    axes[0].set_ylabel(f"Flipped {report.target} bit")
+    top.colorbar(image, ax=list(axes), label='P(output bit flips)')
+    
+    ax_rounds, ax_distance, ax_bytes = bottom.subplots(1, 3)
+    ax_rounds.plot(range(report.rounds + 1), report.mean_distance(), marker='o')
+    ax_rounds.axhline(64, color='gray', linestyle='--', label='random (64)')
+    ax_rounds.set_xlabel("Round")
+    ax_rounds.set_ylabel("Mean bits flipped")
+    ax_rounds.legend()
     
-    print("Animation placeholder: This would generate a step-by-step animation")
-    print(f"Plaintext: {bytes_to_hex(plaintext)}")
-    print(f"Key: {bytes_to_hex(key)}")
+    distance = report.distance_counts[-1]
+    ax_distance.bar(range(129), distance / distance.sum(), width=1.0, label='observed')
+    ax_distance.plot(range(129), expected_distance(), color='black', label='Binomial(128, 1/2)')
+    ax_distance.set_xlim(32, 96)
+    ax_distance.set_xlabel("Ciphertext bits changed")
+    ax_distance.legend()
     
-    # Encrypt with verbose=True to see the steps
-    result = encrypt(plaintext, key, verbose=True)
+    changed = report.byte_counts[-1]
+    ax_bytes.bar(range(17), changed / changed.sum(), label='observed')
+    ax_bytes.plot(range(17), expected_changed_bytes(), color='black', marker='.', label='random')
+    ax_bytes.set_yscale('log')
+    ax_bytes.set_ylim(1e-6, 1.5)
+    ax_bytes.set_xlabel("Ciphertext bytes changed")
+    ax_bytes.legend()
     
-    print(f"Ciphertext: {bytes_to_hex(result)}")
-    print("An actual animation would require additional libraries like matplotlib animation or a GUI framework.")
\ No newline at end of file
+    if path is None:
+        _pyplot().show()
+        return None
+    figure.savefig(path)
+    return path
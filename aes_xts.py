@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+# AES-128 Encryption/Decryption Implementation
+# XTS mode for sector-addressed storage file
+
+from aes_key import expand_key
+from aes_modes import BATCH_MIN_BYTES, batch_engine
+
+SECTOR_SIZE = 512
+# Blocks per vectorized pass of encrypt_sectors()/decrypt_sectors()
+DEFAULT_CHUNK_BLOCKS = 1 << 16
+
+_MASK = (1 << 128) - 1
+
+def _mul_alpha(t):
+    """Multiply a tweak (little-endian int) by alpha in GF(2^128) (IEEE 1619)."""
+    t <<= 1
+    if t >> 128:
+        t = (t & _MASK) ^ 0x87
+    return t
+
+class XTSKey:
+    """
+    XTS-AES (IEEE 1619) for a disk image made of fixed-size sectors.
+    key is the data key followed by the tweak key: 32 bytes for
+    XTS-AES-128, 64 bytes for XTS-AES-256. Every sector
+    is encrypted on its own with its number as the tweak, so any sector can
+    be read or rewritten without touching the others.
+    """
+    __slots__ = ("data_key", "tweak_key", "sector_size")
+
+    def __init__(self, key, sector_size=SECTOR_SIZE):
+        key = bytes(key)
+        if len(key) not in (32, 64):
+            raise ValueError(f"XTS-AES key must be 32 or 64 bytes, got {len(key)}")
+        if sector_size < 16:
+            raise ValueError("sector_size must be at least 16 bytes")
+        half = len(key) // 2
+        self.data_key = expand_key(key[:half])
+        self.tweak_key = expand_key(key[half:])
+        self.sector_size = sector_size
+
+    def _initial_tweak(self, n):
+        return self.tweak_key.encrypt_block(n.to_bytes(16, 'little'))
+
+    def _block(self, block, t, encrypting):
+        crypt_block = self.data_key.encrypt_block if encrypting else self.data_key.decrypt_block
+        x = crypt_block((int.from_bytes(block, 'little') ^ t).to_bytes(16, 'little'))
+        return (int.from_bytes(x, 'little') ^ t).to_bytes(16, 'little')
+
+    def _blocks(self, data, t0, encrypting):
+        """XTS whole blocks from tweak t0 (bytes). Returns (output, next tweak int)."""
+        count = len(data) // 16
+        aes_batch = batch_engine() if len(data) >= BATCH_MIN_BYTES else None
+        if aes_batch is not None:
+            tweaks = aes_batch.xts_tweaks(aes_batch.as_blocks(t0), count)
+            out = aes_batch.xts_blocks(data, self.data_key, tweaks, not encrypting)
+            return out, _mul_alpha(int.from_bytes(tweaks[0, -1].tobytes(), 'little'))
+        t = int.from_bytes(t0, 'little')
+        out = []
+        for i in range(0, 16 * count, 16):
+            out.append(self._block(data[i:i + 16], t, encrypting))
+            t = _mul_alpha(t)
+        return b''.join(out), t
+
+    def _crypt_sector(self, n, data, encrypting):
+        length = len(data)
+        if length < 16:
+            raise ValueError(f"XTS data unit must be at least 16 bytes, got {length}")
+        t0 = self._initial_tweak(n)
+        partial = length % 16
+        if not partial:
+            return self._blocks(data, t0, encrypting)[0]
+
+        # Ciphertext stealing: the last full block and the partial one
+        full = length - partial - 16
+        head, t = self._blocks(data[:full], t0, encrypting)
+        t_next = _mul_alpha(t)
+        last, tail = bytes(data[full:full + 16]), bytes(data[full + 16:])
+        if encrypting:
+            cc = self._block(last, t, True)
+            return head + self._block(tail + cc[partial:], t_next, True) + cc[:partial]
+        pp = self._block(last, t_next, False)
+        return head + self._block(tail + pp[partial:], t, False) + pp[:partial]
+
+    def encrypt_sector(self, n, data):
+        """
+        Encrypt the data unit of sector n. data is normally sector_size
+        bytes; any length from 16 bytes up works (ciphertext stealing).
+        """
+        return self._crypt_sector(n, data, True)
+
+    def decrypt_sector(self, n, data):
+        """Decrypt the data unit of sector n."""
+        return self._crypt_sector(n, data, False)
+
+    def _crypt_sectors(self, first, data, encrypting):
+        size = self.sector_size
+        if len(data) % size != 0:
+            raise ValueError(f"Data length must be a multiple of the sector size {size}, got {len(data)}")
+        count = len(data) // size
+        aes_batch = batch_engine() if len(data) >= BATCH_MIN_BYTES and size % 16 == 0 else None
+        if aes_batch is None:
+            return b''.join(self._crypt_sector(first + i, data[i * size:(i + 1) * size], encrypting)
+                            for i in range(count))
+        # Many sectors per pass: all tweaks of a chunk in one vectorized step
+        per_sector = size // 16
+        step = max(1, DEFAULT_CHUNK_BLOCKS // per_sector)
+        data = memoryview(data)
+        out = []
+        for start in range(0, count, step):
+            sectors = range(first + start, first + min(start + step, count))
+            numbers = b''.join(n.to_bytes(16, 'little') for n in sectors)
+            initial = aes_batch.as_blocks(aes_batch.encrypt_blocks(numbers, self.tweak_key))
+            tweaks = aes_batch.xts_tweaks(initial, per_sector)
+            chunk = data[start * size:(start + len(sectors)) * size]
+            out.append(aes_batch.xts_blocks(chunk, self.data_key, tweaks, not encrypting))
+        return b''.join(out)
+
+    def encrypt_sectors(self, first, data):
+        """Encrypt consecutive whole sectors starting at sector number first."""
+        return self._crypt_sectors(first, data, True)
+
+    def decrypt_sectors(self, first, data):
+        """Decrypt consecutive whole sectors starting at sector number first."""
+        return self._crypt_sectors(first, data, False)
+
+    def __repr__(self):
+        return f"XTSKey(<{len(self.data_key.key) * 16}-bit>, sector_size={self.sector_size})"
+
+def read_sectors(f, xts_key, first, count):
+    """Read and decrypt count sectors starting at first from the image file f."""
+    f.seek(first * xts_key.sector_size)
+    data = f.read(count * xts_key.sector_size)
+    if len(data) != count * xts_key.sector_size:
+        raise ValueError("Image is too short for the requested sectors")
+    return xts_key.decrypt_sectors(first, data)
+
+def write_sectors(f, xts_key, first, data):
+    """Encrypt whole sectors and write them at sector first of the image file f."""
+    f.seek(first * xts_key.sector_size)
+    f.write(xts_key.encrypt_sectors(first, data))
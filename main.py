@@ -3,7 +3,10 @@
 # Main application file
 
 import os
-from aes_core import encrypt, decrypt, generate_round_keys
+from aes_core import encrypt, decrypt
+from aes_key import expand_key
+from aes_modes import pad, unpad
+from aes_trace import TraceRecorder, print_trace
 from aes_utils import bytes_to_matrix, matrix_to_bytes, display_state, hex_to_bytes, bytes_to_hex
 
 def clear_screen():
@@ -62,10 +65,9 @@ def get_input_data(mode):
             # Convert string to bytes
             data_bytes = data_str.encode('utf-8')
             
-            # For encryption, we need to ensure the input is a multiple of 16 bytes
-            if mode == "encrypt" and len(data_bytes) % 16 != 0:
-                padding_length = 16 - (len(data_bytes) % 16)
-                data_bytes += bytes([padding_length]) * padding_length
+            # For encryption, apply PKCS#7 padding to a multiple of 16 bytes
+            if mode == "encrypt":
+                data_bytes = pad(data_bytes)
                 print(f"\n{input_type} đã được pad thành: {bytes_to_hex(data_bytes)}")
                 print(f"({len(data_bytes)} bytes - đủ bội số của 16 bytes cho AES)")
             
@@ -104,20 +106,23 @@ def main():
             key = get_key()
             plaintext = get_input_data("encrypt")
             
-            # Process each 16-byte block separately
+            # Expand the key once for all blocks
+            aes_key = expand_key(key)
+            recorder = TraceRecorder()
+            
+            # Process each 16-byte block separately, viewing it in place
+            data = memoryview(plaintext)
             for block_num in range(0, len(plaintext), 16):
-                block = plaintext[block_num:block_num+16]
+                block = data[block_num:block_num+16]
                 print(f"\n=== Xử lý block {block_num//16 + 1}/{len(plaintext)//16} ===")
                 
-                # Generate round keys
-                round_keys = generate_round_keys(key)
-                
                 # Display the original block
                 print("\nPlaintext block:")
-                display_state(bytes_to_matrix(block))
+                display_state(bytes_to_matrix(plaintext, block_num))
                 
-                # Encrypt and show detailed process
-                ciphertext_block = encrypt(block, key, verbose=True)
+                # Encrypt, recording every step, and show the detailed process
+                ciphertext_block = encrypt(block, aes_key, tracer=recorder)
+                print_trace(recorder)
                 
                 print(f"\nKết quả mã hóa block {block_num//16 + 1}: {bytes_to_hex(ciphertext_block)}")
             
@@ -134,20 +139,26 @@ def main():
                 input("\nNhấn Enter để tiếp tục...")
                 continue
             
-            # Process each 16-byte block separately
+            # Expand the key once for all blocks
+            aes_key = expand_key(key)
+            recorder = TraceRecorder()
+            
+            decrypted = bytearray()
+            
+            # Process each 16-byte block separately, viewing it in place
+            data = memoryview(ciphertext)
             for block_num in range(0, len(ciphertext), 16):
-                block = ciphertext[block_num:block_num+16]
+                block = data[block_num:block_num+16]
                 print(f"\n=== Xử lý block {block_num//16 + 1}/{len(ciphertext)//16} ===")
                 
-                # Generate round keys
-                round_keys = generate_round_keys(key)
-                
                 # Display the original block
                 print("\nCiphertext block:")
-                display_state(bytes_to_matrix(block))
+                display_state(bytes_to_matrix(ciphertext, block_num))
                 
-                # Decrypt and show detailed process
-                plaintext_block = decrypt(block, key, verbose=True)
+                # Decrypt, recording every step, and show the detailed process
+                plaintext_block = decrypt(block, aes_key, tracer=recorder)
+                print_trace(recorder)
+                decrypted += plaintext_block
                 
                 print(f"\nKết quả giải mã block {block_num//16 + 1}: {bytes_to_hex(plaintext_block)}")
                 
@@ -158,6 +169,13 @@ def main():
                 except UnicodeDecodeError:
                     pass
             
+            # Remove PKCS#7 padding from the full plaintext if present
+            try:
+                unpadded = unpad(decrypted)
+                print(f"\nPlaintext sau khi bỏ padding: {bytes_to_hex(unpadded)}")
+            except ValueError:
+                pass
+            
             input("\nNhấn Enter để tiếp tục...")
             
         elif choice == '3':